@@ -0,0 +1,46 @@
+"""
+Compare the time spent encoding a slide segment in each encode mode.
+
+Usage: python benchmark/encode_modes.py [--duration SECONDS] [--resolution WxH]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import fitz
+from slide_to_video.slide_engine import parse_resolution
+from slide_to_video.video_engine import ENCODE_MODES, VideoEngine
+
+
+def create_slide_image(path, resolution):
+    width, height = parse_resolution(resolution)
+    pdf_document = fitz.open()
+    page = pdf_document.new_page(width=width, height=height)
+    page.insert_text((width / 10, height / 5), "Benchmark slide", fontsize=height / 10)
+    page.get_pixmap().save(path)
+    pdf_document.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=90.0)
+    parser.add_argument("--resolution", default="1920x1080")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_path = os.path.join(temp_dir, "slide.png")
+        create_slide_image(image_path, args.resolution)
+        for encode_mode in ENCODE_MODES:
+            video_path = os.path.join(temp_dir, f"{encode_mode}.mp4")
+            start = time.perf_counter()
+            VideoEngine(encode_mode=encode_mode).generate_video_from_image(
+                image_path, video_path, args.duration
+            )
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(video_path)
+            print(f"{encode_mode:>10}: {elapsed:.2f}s, {size / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Compare the time spent rendering a deck slide by slide and in a single pass.
+
+Usage: python benchmark/render_modes.py [--slides N] [--duration SECONDS] [--encode-mode MODE]
+"""
+
+import argparse
+import concurrent.futures
+import math
+import os
+import struct
+import tempfile
+import time
+import wave
+import fitz
+from slide_to_video.audio import concat_wavs
+from slide_to_video.video_engine import ENCODE_MODES, VideoEngine
+
+
+def create_deck(output_dir, slides, duration):
+    image_paths = []
+    audio_paths = []
+    pdf_document = fitz.open()
+    for i in range(slides):
+        page = pdf_document.new_page(width=1920, height=1080)
+        page.insert_text((192, 216), f"Benchmark slide {i + 1}", fontsize=108)
+        image_path = os.path.join(output_dir, f"slide_{i + 1}.png")
+        page.get_pixmap().save(image_path)
+        image_paths.append(image_path)
+
+        audio_path = os.path.join(output_dir, f"sub_paragraph_{i + 1}.wav")
+        with wave.open(audio_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(24000)
+            f.writeframes(
+                b"".join(
+                    struct.pack("<h", int(3000 * math.sin(j / 10)))
+                    for j in range(int(24000 * duration))
+                )
+            )
+        audio_paths.append(audio_path)
+    pdf_document.close()
+    return image_paths, audio_paths
+
+
+def render_segments(video_engine, image_paths, audio_paths, delay, output_dir):
+    video_paths = [path.replace(".wav", ".mp4") for path in audio_paths]
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(
+                video_engine.render_segment,
+                image_path,
+                audio_path,
+                video_path,
+                lead=delay / 2 if i else 0,
+                tail=delay / 2,
+            )
+            for i, (image_path, audio_path, video_path) in enumerate(
+                zip(image_paths, audio_paths, video_paths)
+            )
+        ]
+        for future in futures:
+            future.result()
+    video_engine.concatenate_videos(
+        video_paths, os.path.join(output_dir, "segments.mp4")
+    )
+
+
+def render_single_pass(video_engine, image_paths, audio_paths, delay, output_dir):
+    audio_path = os.path.join(output_dir, "output.wav")
+    durations = concat_wavs(
+        [
+            (path, delay / 2 if i else 0, delay / 2)
+            for i, path in enumerate(audio_paths)
+        ],
+        audio_path,
+    )
+    video_engine.render_deck(
+        image_paths, durations, audio_path, os.path.join(output_dir, "single.mp4")
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slides", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--delay", type=float, default=2.0)
+    parser.add_argument("--encode-mode", choices=ENCODE_MODES, default="still")
+    args = parser.parse_args()
+
+    video_engine = VideoEngine(encode_mode=args.encode_mode)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        image_paths, audio_paths = create_deck(temp_dir, args.slides, args.duration)
+        results = {}
+        for name, render in [
+            ("segments", render_segments),
+            ("single_pass", render_single_pass),
+        ]:
+            start = time.perf_counter()
+            render(video_engine, image_paths, audio_paths, args.delay, temp_dir)
+            results[name] = time.perf_counter() - start
+        for name, elapsed in results.items():
+            print(f"{name:>12}: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure the startup time of the CLI and of the package imports, in fresh processes.
+
+Exits with an error if a heavy dependency is imported before it is used, or if a
+measure exceeds --max-seconds, so that it can guard against startup regressions.
+
+Usage: python benchmark/startup.py [--runs N] [--max-seconds SECONDS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Dependencies only imported by the code paths that use them.
+HEAVY_MODULES = ["fitz", "docx", "ffmpeg", "requests", "torch", "TTS", "yaml"]
+COMMANDS = {
+    "import slide_to_video.lib": "import slide_to_video.lib",
+    "list engines": (
+        "from slide_to_video.tts_engine import get_all_engine_names\n"
+        "get_all_engine_names()"
+    ),
+    "slide-to-video --help": "import script\nscript.main()",
+}
+# Reports the heavy modules imported by a command, even if it exits early.
+REPORT_MODULES = f"""
+import atexit, sys
+atexit.register(
+    lambda: print(",".join(sorted(set(sys.modules) & {set(HEAVY_MODULES)!r})),
+    file=sys.stderr)
+)
+"""
+
+
+def run(code, env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", REPORT_MODULES + code, "--help"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    lines = result.stderr.splitlines()
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return elapsed, lines[-1] if lines else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    src_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+    env = {**os.environ, "PYTHONPATH": os.path.normpath(src_dir)}
+    baseline = statistics.median(run("", env)[0] for _ in range(args.runs))
+    print(f"{'python':>25}: {baseline:.3f}s")
+
+    failed = False
+    for name, code in COMMANDS.items():
+        try:
+            results = [run(code, env) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:>25}: failed\n{e}")
+            failed = True
+            continue
+        median = statistics.median(elapsed for elapsed, _ in results)
+        imported = results[0][1]
+        print(
+            f"{name:>25}: {median:.3f}s (+{median - baseline:.3f}s), "
+            f"heavy imports: {imported or 'none'}"
+        )
+        if imported or (args.max_seconds and median > args.max_seconds):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
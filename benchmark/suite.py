@@ -0,0 +1,350 @@
+"""
+Measure the throughput of each stage of a build on a synthetic deck, and write the
+results to JSON so that runs can be compared.
+
+The stages are rasterizing the deck, splitting the script, encoding, muxing,
+rendering videos (with the lead and tail silence of each slide) and concatenating
+them, syncing a project after a slide is inserted, and whole builds, cold and cached. Speech is synthesized by an offline
+stand-in (see `synthetic.py`), so results only depend on this package and ffmpeg.
+
+Usage: python benchmark/suite.py [--slides N] [--output results.json]
+           [--compare baseline.json] [--tolerance 0.25] [--stages a,b]
+
+With --compare, the stages slower than the baseline by more than the tolerance are
+reported as regressions and the command exits with an error.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import fitz
+from synthetic import create_deck, create_script, write_tone
+from slide_to_video.lib import slide_to_video
+from slide_to_video.project import DEFAULT_CONFIG, Project, ProjectConfig
+from slide_to_video.script_engine import ScriptEngine
+from slide_to_video.slide_engine import SlideEngine, parse_resolution
+from slide_to_video.video_engine import ENCODE_MODES, VideoEngine
+
+# Seconds of audio of each slide in the video benchmarks.
+SLIDE_DURATION = 8.0
+# Videos encoded by the video benchmarks, which are slow per item.
+MAX_VIDEOS = 10
+# Differences below this many seconds are noise, not regressions.
+MIN_REGRESSION_SECONDS = 0.01
+
+
+class Context(object):
+    def __init__(self, args, work_dir):
+        self.args = args
+        self.work_dir = work_dir
+        self.resolution = parse_resolution(args.resolution)
+        self.video_engine = VideoEngine(encode_mode=args.encode_mode)
+        self.deck = os.path.join(work_dir, "deck.pdf")
+        self.script = os.path.join(work_dir, "script.txt")
+        create_deck(self.deck, args.slides, *self.resolution)
+        create_script(self.script, args.slides, args.sentences)
+        self.videos = min(args.slides, MAX_VIDEOS)
+        self.images = None
+        self.audio = None
+        self.segments = None
+
+    def path(self, *parts):
+        path = os.path.join(self.work_dir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def config(self, output_dir, **config):
+        return ProjectConfig(
+            {
+                **DEFAULT_CONFIG,
+                "model": "offline",
+                "slide": self.deck,
+                "script": self.script,
+                "output_dir": output_dir,
+                "resolution": self.args.resolution,
+                "encode_mode": self.args.encode_mode,
+                "offline_latency": self.args.latency,
+                "audio_cache": False,
+                **config,
+            }
+        )
+
+    def slide_images(self):
+        if self.images is None:
+            self.images = SlideEngine().pdf_to_images(
+                self.deck, os.path.dirname(self.path("images", "x")), self.resolution
+            )
+        return self.images
+
+    def slide_audio(self):
+        if self.audio is None:
+            self.audio = [self.path("audio", f"{i}.wav") for i in range(self.videos)]
+            for path in self.audio:
+                write_tone(path, SLIDE_DURATION)
+        return self.audio
+
+    def slide_videos(self):
+        if self.segments is None:
+            self.segments = [
+                self.path("segments", f"{i}.mp4") for i in range(self.videos)
+            ]
+            for image, audio, video in zip(
+                self.slide_images(), self.slide_audio(), self.segments
+            ):
+                self.video_engine.render_segment(image, audio, video)
+        return self.segments
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_pdf_to_images(ctx: Context, run: int):
+    output_dir = os.path.dirname(ctx.path(f"pdf_to_images_{run}", "x"))
+    seconds = timed(SlideEngine().pdf_to_images, ctx.deck, output_dir, ctx.resolution)
+    return seconds, ctx.args.slides
+
+
+def bench_split_script(ctx: Context, run: int):
+    output_dir = os.path.dirname(ctx.path(f"split_script_{run}", "x"))
+    return timed(ScriptEngine().split_script, ctx.script, output_dir), ctx.args.slides
+
+
+def bench_encode(ctx: Context, run: int):
+    seconds = 0.0
+    for i, image in enumerate(ctx.slide_images()[: ctx.videos]):
+        video = ctx.path(f"encode_{run}", f"{i}.mp4")
+        seconds += timed(
+            ctx.video_engine.generate_video_from_image, image, video, SLIDE_DURATION
+        )
+    return seconds, ctx.videos
+
+
+def bench_mux(ctx: Context, run: int):
+    seconds = 0.0
+    for i, (image, audio) in enumerate(zip(ctx.slide_images(), ctx.slide_audio())):
+        video = ctx.path(f"mux_{run}", f"{i}.silent.mp4")
+        ctx.video_engine.generate_video_from_image(image, video, SLIDE_DURATION)
+        output = ctx.path(f"mux_{run}", f"{i}.mp4")
+        seconds += timed(ctx.video_engine.add_audio_to_video, video, audio, output)
+    return seconds, ctx.videos
+
+
+def bench_render(ctx: Context, run: int):
+    seconds = 0.0
+    for i, (image, audio) in enumerate(zip(ctx.slide_images(), ctx.slide_audio())):
+        video = ctx.path(f"render_{run}", f"{i}.mp4")
+        seconds += timed(
+            ctx.video_engine.render_segment, image, audio, video, lead=1.0, tail=1.0
+        )
+    return seconds, ctx.videos
+
+
+def bench_concat(ctx: Context, run: int):
+    # As many videos as slides, cycling through the rendered segments.
+    segments = ctx.slide_videos()
+    videos = [segments[i % len(segments)] for i in range(ctx.args.slides)]
+    output = ctx.path(f"concat_{run}", "output.mp4")
+    return timed(ctx.video_engine.concatenate_videos, videos, output), ctx.args.slides
+
+
+def insert_slide(ctx: Context, deck, script):
+    """
+    Insert a slide in the middle of the deck and of the script.
+    """
+    middle = ctx.args.slides // 2
+    with fitz.open(ctx.deck) as pdf_document:
+        width, height = ctx.resolution
+        page = pdf_document.new_page(pno=middle, width=width, height=height)
+        page.insert_text((width / 10, height / 6), "Inserted", fontsize=height / 12)
+        pdf_document.save(deck)
+    with open(ctx.script, "r") as f:
+        paragraphs = f.read().split("\nNEWSLIDE\n")
+    paragraphs.insert(middle, "An inserted slide.")
+    with open(script, "w") as f:
+        f.write("\nNEWSLIDE\n".join(paragraphs))
+
+
+def bench_sync_project(ctx: Context, run: int):
+    # The project is built from inputs at fixed paths, which are then edited.
+    sync_dir = os.path.dirname(ctx.path("sync", "x"))
+    deck = os.path.join(sync_dir, "deck.pdf")
+    script = os.path.join(sync_dir, "script.txt")
+    output_dir = os.path.join(sync_dir, "output")
+    built_dir = os.path.join(sync_dir, "built")
+    shutil.copyfile(ctx.deck, deck)
+    shutil.copyfile(ctx.script, script)
+    if not os.path.exists(built_dir):
+        slide_to_video(project_config=ctx.config(output_dir, slide=deck, script=script))
+        shutil.copytree(output_dir, built_dir)
+    shutil.rmtree(output_dir)
+    shutil.copytree(built_dir, output_dir)
+    insert_slide(ctx, deck, script)
+
+    start = time.perf_counter()
+    project = Project(
+        name="project",
+        config=ctx.config(output_dir, slide=deck, script=script),
+    )
+    seconds = time.perf_counter() - start
+    project.close()
+    return seconds, ctx.args.slides + 1
+
+
+def bench_build(ctx: Context, run: int):
+    output_dir = os.path.dirname(ctx.path(f"build_{run}", "x"))
+    return timed(slide_to_video, project_config=ctx.config(output_dir)), ctx.args.slides
+
+
+def bench_rebuild(ctx: Context, run: int):
+    output_dir = os.path.dirname(ctx.path("rebuild", "x"))
+    if run == 0:
+        slide_to_video(project_config=ctx.config(output_dir))
+    return timed(slide_to_video, project_config=ctx.config(output_dir)), ctx.args.slides
+
+
+STAGES = {
+    "pdf_to_images": bench_pdf_to_images,
+    "split_script": bench_split_script,
+    "encode": bench_encode,
+    "mux": bench_mux,
+    "render": bench_render,
+    "concat": bench_concat,
+    "sync_project": bench_sync_project,
+    "build": bench_build,
+    "rebuild": bench_rebuild,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(args, stages):
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = Context(args, work_dir)
+        for name in stages:
+            runs = []
+            for run in range(args.repeat):
+                # The progress of the pipeline is not part of the results.
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, items = STAGES[name](ctx, run)
+                runs.append(seconds)
+            median = statistics.median(runs)
+            results[name] = {
+                "seconds": median,
+                "min_seconds": min(runs),
+                "runs": runs,
+                "items": items,
+                "items_per_second": items / median if median else None,
+            }
+            print(
+                f"{name:>14}: {median:8.3f}s for {items} items "
+                f"({median / items * 1000:.1f}ms per item)"
+            )
+    return results
+
+
+def compare(results, baseline, tolerance) -> list:
+    """
+    :return: The names of the stages slower than in `baseline` beyond `tolerance`.
+    """
+    if baseline["parameters"] != results["parameters"]:
+        print("Warning: the baseline was run with other parameters")
+    regressions = []
+    for name, result in results["stages"].items():
+        previous = baseline["stages"].get(name)
+        if not previous:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        flag = ""
+        slower = result["seconds"] - previous["seconds"]
+        if ratio > 1 + tolerance and slower > MIN_REGRESSION_SECONDS:
+            regressions.append(name)
+            flag = " REGRESSION"
+        print(
+            f"{name:>14}: {previous['seconds']:8.3f}s -> {result['seconds']:8.3f}s "
+            f"({ratio - 1:+.0%}){flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--slides", type=int, default=10)
+    parser.add_argument("--sentences", type=int, default=3, help="Per slide")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--encode-mode", choices=ENCODE_MODES, default="still")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per synthesis call"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", default=None, help="Results of a previous run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    stages = args.stages.split(",")
+    for name in stages:
+        if name not in STAGES:
+            parser.error(f"Unknown stage {name}, expected one of {', '.join(STAGES)}")
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    results = {
+        "metadata": {
+            "started_at": started_at,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "slides": args.slides,
+            "sentences": args.sentences,
+            "resolution": args.resolution,
+            "encode_mode": args.encode_mode,
+            "latency": args.latency,
+            "repeat": args.repeat,
+        },
+        "stages": run_stages(args, stages),
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Synthetic inputs for the benchmarks: decks and scripts of any size, and an offline
+TTS engine that writes a tone as long as the text would take to read.
+"""
+
+import math
+import random
+import struct
+import time
+import wave
+import fitz
+from slide_to_video.tts_engine import TTSEngine
+from slide_to_video.tts_engine.registery import register_engine
+
+SAMPLE_RATE = 24000
+# Roughly the pace of speech.
+SECONDS_PER_CHARACTER = 0.06
+WORDS = (
+    "slide video script voice render audio frame deck page sentence model engine "
+    "cache output segment stream pipeline encode synthesize text speech lecture "
+    "course student example result figure table chart summary question answer"
+).split()
+
+
+def create_deck(path, slides: int, width: int = 1920, height: int = 1080, seed=0):
+    """
+    Write a PDF deck of `slides` pages, each with a title, a few lines of text and a
+    shape, so that no two pages look alike.
+    """
+    rng = random.Random(seed)
+    pdf_document = fitz.open()
+    for i in range(slides):
+        page = pdf_document.new_page(width=width, height=height)
+        page.insert_text(
+            (width / 10, height / 6), f"Slide {i + 1}", fontsize=height / 12
+        )
+        for line in range(4):
+            text = " ".join(rng.choice(WORDS) for _ in range(8))
+            page.insert_text(
+                (width / 10, height / 3 + line * height / 10),
+                text,
+                fontsize=height / 24,
+            )
+        x = rng.uniform(0.5, 0.8) * width
+        y = rng.uniform(0.5, 0.8) * height
+        page.draw_rect(
+            fitz.Rect(x, y, x + width / 8, y + height / 8),
+            color=(rng.random(), rng.random(), rng.random()),
+            fill=(rng.random(), rng.random(), rng.random()),
+        )
+    pdf_document.save(path)
+    pdf_document.close()
+
+
+def create_script(path, slides: int, sentences: int = 3, seed=0):
+    """
+    Write a script of `slides` slides of `sentences` sentences each.
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    for _ in range(slides):
+        paragraph = []
+        for _ in range(sentences):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 14))]
+            paragraph.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(paragraph))
+    with open(path, "w") as f:
+        f.write("\nNEWSLIDE\n".join(paragraphs))
+
+
+def write_tone(path, duration: float):
+    """
+    Write a mono 16-bit WAV file of a 440 Hz tone lasting `duration` seconds.
+    """
+    period = [
+        struct.pack("<h", int(3000 * math.sin(2 * math.pi * i * 440 / SAMPLE_RATE)))
+        for i in range(SAMPLE_RATE // 440)
+    ]
+    period = b"".join(period)
+    frames = int(SAMPLE_RATE * duration)
+    data = period * (frames // (len(period) // 2) + 1)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(data[: frames * 2])
+
+
+class OfflineEngine(TTSEngine):
+    """
+    Stands in for a TTS engine without a model or a network: the audio is a tone as
+    long as the text would take to read, after `offline_latency` seconds per call.
+    """
+
+    name = "offline"
+    config_keys = ["speech_speed", "language", "offline_latency"]
+
+    def __init__(self, config: dict):
+        super().__init__(**config)
+        self.latency = float(config.get("offline_latency", 0))
+
+    def synthesize(self, text: str, output_path: str, format: str = "wav"):
+        if self.latency:
+            time.sleep(self.latency)
+        write_tone(output_path, 0.2 + SECONDS_PER_CHARACTER * len(text) / self.speed)
+
+    def parallizable(self) -> bool:
+        return True
+
+    def voice_fingerprint(self) -> str:
+        return "offline"
+
+
+register_engine("offline", OfflineEngine)
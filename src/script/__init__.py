@@ -1,9 +1,6 @@
 import typer
 from typing import Optional
-import yaml
 import click
-from slide_to_video.lib import slide_to_video
-from slide_to_video.project import ProjectConfig
 from slide_to_video.tts_engine.registery import get_all_engine_names
 
 
@@ -30,6 +27,54 @@ def generate(
     delay: Optional[float] = typer.Option(
         None, help="Delay between each slide in seconds. Default value: 2.0."
     ),
+    tts_workers: Optional[int] = typer.Option(
+        None,
+        help="Number of processes synthesizing speech with the local model, each loading the model once. Default value: 1.",
+    ),
+    resolution: Optional[str] = typer.Option(
+        None,
+        help="Maximum resolution of the video, e.g. 1280x720. Default value: 1920x1080.",
+    ),
+    encode_mode: Optional[str] = typer.Option(
+        None,
+        case_sensitive=False,
+        click_type=click.Choice(["standard", "still"]),
+        help="How slides are encoded. 'still' encodes as few frames as possible per slide. Default value: standard.",
+    ),
+    render_mode: Optional[str] = typer.Option(
+        None,
+        case_sensitive=False,
+        click_type=click.Choice(["segments", "single_pass"]),
+        help="'segments' renders each slide separately and concatenates them. 'single_pass' renders the whole deck at once. Default value: segments.",
+    ),
+    assembly: Optional[str] = typer.Option(
+        None,
+        case_sensitive=False,
+        click_type=click.Choice(["concat", "incremental"]),
+        help="How slide videos are joined. 'incremental' rewrites only the parts of the output that changed. Default value: concat.",
+    ),
+    streaming: Optional[str] = typer.Option(
+        None,
+        help="Comma-separated streaming formats to output along with the video, among 'hls' and 'dash'. Segments never span two slides.",
+    ),
+    synthesis_unit: Optional[str] = typer.Option(
+        None,
+        case_sensitive=False,
+        click_type=click.Choice(["slide", "sentence"]),
+        help="'sentence' synthesizes each sentence on its own, so that editing a sentence only synthesizes it again. 'slide' synthesizes the script of a slide at once. Default value: sentence.",
+    ),
+    preview: Optional[bool] = typer.Option(
+        None,
+        help="Render a quick low-resolution preview in the 'preview' directory of the output directory. The synthesized audio is shared with the final render.",
+    ),
+    watch: Optional[bool] = typer.Option(
+        None,
+        help="Keep running, and build again whenever the slide, the script or the script dictionary changes. The speech model stays loaded between builds.",
+    ),
+    force_reset: Optional[str] = typer.Option(
+        None,
+        help='Comma-separated numbers of the slides to build again, e.g. "3,5". Slides are numbered from 1.',
+    ),
     script_dict: Optional[str] = typer.Option(
         None,
         help='Dictionary to replace the script. Each line should follow the format "original_text: new_text"',
@@ -63,8 +108,15 @@ def generate(
     config: Optional[str] = typer.Option(None, help="Path to yaml config file"),
     ctx: typer.Context = typer.Option(None),
 ):
+    # The pipeline is only imported once the arguments are parsed, so that e.g.
+    # --help returns quickly.
+    from slide_to_video.lib import slide_to_video
+    from slide_to_video.project import DEFAULT_CONFIG, ProjectConfig
+
     # Load the project config
     if config:
+        import yaml
+
         with open(config, "r") as f:
             raw_config = yaml.safe_load(f)
     else:
@@ -72,13 +124,8 @@ def generate(
     for key, value in ctx.params.items():
         if value is not None:
             raw_config[key] = value
-        elif key not in raw_config:
-            if key == "speech_speed":
-                raw_config[key] = 1.0
-            elif key == "delay":
-                raw_config[key] = 2.0
-            elif key == "language":
-                raw_config[key] = "en"
+        elif key not in raw_config and key in DEFAULT_CONFIG:
+            raw_config[key] = DEFAULT_CONFIG[key]
 
     project_config = ProjectConfig(raw_config)
     slide_to_video(project_config=project_config)
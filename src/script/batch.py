@@ -0,0 +1,24 @@
+import typer
+from slide_to_video.batch import DEFAULT_BATCH_JOBS, load_manifest, run_batch
+
+
+app = typer.Typer()
+
+
+@app.command()
+def run(
+    manifest: str = typer.Argument(
+        ..., help="Path to the yaml manifest of the projects"
+    ),
+    jobs: int = typer.Option(
+        DEFAULT_BATCH_JOBS,
+        help="Number of decks built at once. The CPUs are shared between them.",
+    ),
+):
+    results = run_batch(load_manifest(manifest), jobs=jobs)
+    if any(result["status"] == "failed" for result in results):
+        raise typer.Exit(code=1)
+
+
+def main():
+    app()
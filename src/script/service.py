@@ -0,0 +1,33 @@
+import typer
+from slide_to_video.service import DEFAULT_HOST, DEFAULT_PORT, serve
+
+
+app = typer.Typer()
+
+
+@app.command()
+def run(
+    host: str = typer.Option(DEFAULT_HOST, help="Address to listen on"),
+    port: int = typer.Option(DEFAULT_PORT, help="Port to listen on"),
+    workers: int = typer.Option(
+        1,
+        help="Number of jobs running at once. The CPUs are shared between them.",
+    ),
+    max_idle_engines: int = typer.Option(
+        2, help="Number of idle speech engines kept loaded for the next jobs."
+    ),
+    output_root: str = typer.Option(
+        ".", help="Directory the output directories of the jobs must be in."
+    ),
+):
+    serve(
+        host,
+        port,
+        workers=workers,
+        max_idle_engines=max_idle_engines,
+        output_root=output_root,
+    )
+
+
+def main():
+    app()
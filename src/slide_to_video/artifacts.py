@@ -0,0 +1,50 @@
+"""
+The artifacts built for a project, and what each of them depends on.
+
+An artifact is identified by a key over its inputs, and is only built again when
+its key changes (see `ProjectState.artifact_current`). The config keys reach the
+artifacts through these inputs:
+
+- image: the fingerprint of the page, and `resolution`.
+- audio: the text of the script after `script_dict` replacements, the engine
+  parameters (`model`, `voice`, `language`, `speech_speed`) and the gap between
+  sentences (`synthesis_unit`, `sentence_gap`).
+- video: the image, the audio, the silence around the slide (`delay` and the
+  `#delay` of the script) and the encoding (`encode_mode`, `framerate`,
+  `assembly`).
+- output: the videos of all the slides, `render_mode` and `assembly`.
+
+So changing `delay` only renders the slide videos again, and changing
+`script_dict` only synthesizes the slides whose text changed.
+"""
+
+from typing import List
+from .utils import md5sum_of_json
+
+
+class Artifact(object):
+    """
+    :param kind: The kind of the artifact, as recorded in the project state.
+    :param inputs: The names of the inputs the artifact is built from.
+    """
+
+    def __init__(self, kind: str, inputs: List[str]):
+        self.kind = kind
+        self.inputs = inputs
+
+    def key(self, **inputs) -> str:
+        """
+        Identify the artifact built from `inputs`, which must all be JSON values.
+        """
+        if sorted(inputs) != sorted(self.inputs):
+            raise ValueError(
+                f"The {self.kind} artifact depends on {self.inputs}, "
+                f"got {sorted(inputs)}"
+            )
+        return md5sum_of_json({"kind": self.kind, "inputs": inputs})
+
+
+IMAGE = Artifact("image", ["page", "resolution"])
+AUDIO = Artifact("audio", ["script", "engine", "sentence_gap"])
+VIDEO = Artifact("video", ["image", "audio", "delays", "encoding"])
+OUTPUT = Artifact("output", ["videos", "render_mode", "assembly"])
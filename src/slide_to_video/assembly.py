@@ -0,0 +1,694 @@
+"""
+Incremental assembly of fragmented MP4 slide segments into the final video.
+
+The final video is a fragmented MP4 made of the init segment (ftyp and moov) of the
+first slide segment followed by one slot per slide segment. A slot holds the
+fragments (moof and mdat boxes) of the segment, shifted to the start time of the
+slide, plus a free box reserving some room for the segment to grow. An index of the
+slots is kept next to the video, so that a rebuild only writes the slots of the
+segments that changed and patches the decode times of the fragments that moved.
+"""
+
+import hashlib
+import os
+import struct
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"mvex"}
+FRAGMENT_BOXES = {b"moof", b"mdat"}
+# Room reserved in each slot for the segment to grow, as a fraction of its size.
+SLOT_SLACK = 0.1
+MIN_SLOT_SLACK = 4096
+# Sequence numbers of the fragments of the n-th slot start at n * SEQUENCE_STRIDE.
+SEQUENCE_STRIDE = 100000
+# Boxes are read from segments as bytes and patched in place as bytearrays.
+Buffer = Union[bytes, bytearray]
+
+TRUN_DATA_OFFSET = 0x1
+TRUN_FIRST_SAMPLE_FLAGS = 0x4
+TRUN_SAMPLE_DURATION = 0x100
+TRUN_SAMPLE_SIZE = 0x200
+TRUN_SAMPLE_FLAGS = 0x400
+TRUN_SAMPLE_CTS = 0x800
+TFHD_BASE_DATA_OFFSET = 0x1
+TFHD_SAMPLE_DESCRIPTION_INDEX = 0x2
+TFHD_DEFAULT_SAMPLE_DURATION = 0x8
+
+
+class IncompatibleSegmentError(Exception):
+    pass
+
+
+@dataclass
+class Box:
+    type: bytes
+    offset: int
+    size: int
+    header_size: int
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+    @property
+    def payload(self) -> int:
+        return self.offset + self.header_size
+
+
+def iter_boxes(
+    data: Buffer, start: int = 0, end: Optional[int] = None
+) -> Iterator[Box]:
+    end = len(data) if end is None else end
+    while start + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, start)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, start + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - start
+        if size < header_size:
+            raise ValueError(f"Invalid {box_type!r} box at offset {start}")
+        yield Box(box_type, start, size, header_size)
+        start += size
+
+
+def child_boxes(data: Buffer, box: Box, box_type: bytes) -> List[Box]:
+    return [
+        child
+        for child in iter_boxes(data, box.payload, box.end)
+        if child.type == box_type
+    ]
+
+
+def full_box_version(data: Buffer, box: Box) -> Tuple[int, int]:
+    version_flags = struct.unpack_from(">I", data, box.payload)[0]
+    return version_flags >> 24, version_flags & 0xFFFFFF
+
+
+class BitReader(object):
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def read(self, bits: int) -> int:
+        value = 0
+        for _ in range(bits):
+            byte = self.data[self.position // 8]
+            value = (value << 1) | ((byte >> (7 - self.position % 8)) & 1)
+            self.position += 1
+        return value
+
+    def read_ue(self) -> int:
+        leading_zeros = 0
+        while self.read(1) == 0:
+            leading_zeros += 1
+        return (1 << leading_zeros) - 1 + self.read(leading_zeros)
+
+
+def normalize_sps(nal: bytes) -> bytes:
+    """
+    Clear the VUI timing information of an H.264 SPS.
+
+    Still slides are encoded at a frame rate that depends on their duration, which
+    only changes the timing information of the SPS. It does not affect decoding, so
+    such segments can share the init segment of the first one.
+    """
+    # Remove the emulation prevention bytes.
+    rbsp = bytearray()
+    zeros = 0
+    for byte in nal[1:]:
+        if zeros >= 2 and byte == 3:
+            zeros = 0
+            continue
+        rbsp.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    try:
+        reader = BitReader(bytes(rbsp))
+        profile_idc = reader.read(8)
+        reader.read(16)  # constraint flags and level_idc
+        reader.read_ue()  # seq_parameter_set_id
+        if profile_idc in (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134):
+            if reader.read_ue() == 3:  # chroma_format_idc
+                reader.read(1)
+            reader.read_ue()
+            reader.read_ue()
+            reader.read(1)
+            if reader.read(1):  # seq_scaling_matrix_present_flag
+                return nal
+        reader.read_ue()  # log2_max_frame_num_minus4
+        pic_order_cnt_type = reader.read_ue()
+        if pic_order_cnt_type == 0:
+            reader.read_ue()
+        elif pic_order_cnt_type == 1:
+            return nal
+        reader.read_ue()  # max_num_ref_frames
+        reader.read(1)
+        reader.read_ue()  # pic_width_in_mbs_minus1
+        reader.read_ue()  # pic_height_in_map_units_minus1
+        if not reader.read(1):  # frame_mbs_only_flag
+            reader.read(1)
+        reader.read(1)
+        if reader.read(1):  # frame_cropping_flag
+            for _ in range(4):
+                reader.read_ue()
+        if not reader.read(1):  # vui_parameters_present_flag
+            return nal
+        if reader.read(1):  # aspect_ratio_info_present_flag
+            if reader.read(8) == 255:
+                reader.read(32)
+        if reader.read(1):  # overscan_info_present_flag
+            reader.read(1)
+        if reader.read(1):  # video_signal_type_present_flag
+            reader.read(4)
+            if reader.read(1):
+                reader.read(24)
+        if reader.read(1):  # chroma_loc_info_present_flag
+            reader.read_ue()
+            reader.read_ue()
+        if not reader.read(1):  # timing_info_present_flag
+            return nal
+        start = reader.position
+        reader.read(65)  # num_units_in_tick, time_scale and fixed_frame_rate_flag
+    except IndexError:
+        return nal
+    for position in range(start, reader.position):
+        rbsp[position // 8] &= ~(1 << (7 - position % 8)) & 0xFF
+    return nal[:1] + bytes(rbsp)
+
+
+def normalize_sample_description(data: bytes, stsd: Box) -> bytes:
+    """
+    A canonical form of the sample descriptions, with the SPS of H.264 tracks
+    normalized by `normalize_sps`.
+    """
+    result = []
+    for entry in iter_boxes(data, stsd.payload + 8, stsd.end):
+        if entry.type not in (b"avc1", b"avc3"):
+            result.append(data[entry.offset : entry.end])
+            continue
+        # The fields of the visual sample entry, followed by boxes.
+        result.append(entry.type + data[entry.payload : entry.payload + 78])
+        for child in iter_boxes(data, entry.payload + 78, entry.end):
+            if child.type != b"avcC":
+                result.append(data[child.offset : child.end])
+                continue
+            position = child.payload + 5
+            result.append(data[child.payload : position])
+            sps_count = data[position] & 0x1F
+            position += 1
+            for _ in range(sps_count):
+                length = struct.unpack_from(">H", data, position)[0]
+                result.append(normalize_sps(data[position + 2 : position + 2 + length]))
+                position += 2 + length
+            result.append(data[position : child.end])
+    return b"".join(result)
+
+
+@dataclass
+class Track:
+    id: int
+    timescale: int
+    default_sample_duration: int
+    signature: bytes
+
+
+@dataclass
+class Segment:
+    init: bytes
+    tracks: Dict[int, Track]
+    # The moof and mdat boxes of the segment, in order.
+    fragments: bytes
+    # The duration of the longest track.
+    duration: Fraction
+
+    @property
+    def timescales(self) -> Dict[int, int]:
+        return {track_id: track.timescale for track_id, track in self.tracks.items()}
+
+    @property
+    def signature(self) -> str:
+        """
+        What must be identical for segments to share the same init segment.
+        """
+        hash_md5 = hashlib.md5()
+        for track_id in sorted(self.tracks):
+            hash_md5.update(self.tracks[track_id].signature)
+        return hash_md5.hexdigest()
+
+
+def parse_tracks(data: bytes, moov: Box) -> Dict[int, Track]:
+    defaults = {}
+    for mvex in child_boxes(data, moov, b"mvex"):
+        for trex in child_boxes(data, mvex, b"trex"):
+            track_id, _, default_sample_duration = struct.unpack_from(
+                ">III", data, trex.payload + 4
+            )
+            defaults[track_id] = (default_sample_duration, data[trex.offset : trex.end])
+
+    tracks = {}
+    for trak in child_boxes(data, moov, b"trak"):
+        tkhd = child_boxes(data, trak, b"tkhd")[0]
+        version, _ = full_box_version(data, tkhd)
+        track_id = struct.unpack_from(
+            ">I", data, tkhd.payload + (20 if version == 1 else 12)
+        )[0]
+        mdia = child_boxes(data, trak, b"mdia")[0]
+        mdhd = child_boxes(data, mdia, b"mdhd")[0]
+        version, _ = full_box_version(data, mdhd)
+        timescale = struct.unpack_from(
+            ">I", data, mdhd.payload + (20 if version == 1 else 12)
+        )[0]
+        minf = child_boxes(data, mdia, b"minf")[0]
+        stbl = child_boxes(data, minf, b"stbl")[0]
+        stsd = child_boxes(data, stbl, b"stsd")[0]
+        default_sample_duration, trex = defaults.get(track_id, (0, b""))
+        tracks[track_id] = Track(
+            id=track_id,
+            timescale=timescale,
+            default_sample_duration=default_sample_duration,
+            signature=struct.pack(">II", track_id, timescale)
+            + normalize_sample_description(data, stsd)
+            + trex,
+        )
+    return tracks
+
+
+def parse_trun_duration(data: bytes, trun: Box, default_sample_duration: int) -> int:
+    _, flags = full_box_version(data, trun)
+    sample_count = struct.unpack_from(">I", data, trun.payload + 4)[0]
+    if not flags & TRUN_SAMPLE_DURATION:
+        return sample_count * default_sample_duration
+    position = trun.payload + 8
+    if flags & TRUN_DATA_OFFSET:
+        position += 4
+    if flags & TRUN_FIRST_SAMPLE_FLAGS:
+        position += 4
+    sample_size = 4 * bin(
+        flags
+        & (
+            TRUN_SAMPLE_DURATION
+            | TRUN_SAMPLE_SIZE
+            | TRUN_SAMPLE_FLAGS
+            | TRUN_SAMPLE_CTS
+        )
+    ).count("1")
+    duration = 0
+    for i in range(sample_count):
+        duration += struct.unpack_from(">I", data, position + i * sample_size)[0]
+    return duration
+
+
+def iter_tfdts(data: Buffer, moof: Box) -> Iterator[Tuple[Box, Box, int]]:
+    """
+    Yield the traf box, its tfdt box and the track ID of each track fragment.
+    """
+    for traf in child_boxes(data, moof, b"traf"):
+        tfhd = child_boxes(data, traf, b"tfhd")[0]
+        track_id = struct.unpack_from(">I", data, tfhd.payload + 4)[0]
+        tfdts = child_boxes(data, traf, b"tfdt")
+        if not tfdts:
+            raise IncompatibleSegmentError("Fragment without decode time")
+        yield traf, tfdts[0], track_id
+
+
+def read_tfdt(data: Buffer, tfdt: Box) -> int:
+    version, _ = full_box_version(data, tfdt)
+    if version == 1:
+        return struct.unpack_from(">Q", data, tfdt.payload + 4)[0]
+    return struct.unpack_from(">I", data, tfdt.payload + 4)[0]
+
+
+def write_tfdt(data: bytearray, tfdt: Box, value: int):
+    version, _ = full_box_version(data, tfdt)
+    if version == 1:
+        struct.pack_into(">Q", data, tfdt.payload + 4, value)
+    elif value < 1 << 32:
+        struct.pack_into(">I", data, tfdt.payload + 4, value)
+    else:
+        raise IncompatibleSegmentError("Decode time does not fit in a version 0 tfdt")
+
+
+def parse_segment(path) -> Segment:
+    with open(path, "rb") as f:
+        data = f.read()
+
+    init = b""
+    fragments = []
+    tracks: Dict[int, Track] = {}
+    track_ends: Dict[int, int] = {}
+    for box in iter_boxes(data):
+        if box.type in (b"ftyp", b"moov"):
+            init += data[box.offset : box.end]
+            if box.type == b"moov":
+                tracks = parse_tracks(data, box)
+        elif box.type in FRAGMENT_BOXES:
+            fragments.append(data[box.offset : box.end])
+        if box.type != b"moof":
+            continue
+        for traf, tfdt, track_id in iter_tfdts(data, box):
+            default_sample_duration = tracks[track_id].default_sample_duration
+            for tfhd in child_boxes(data, traf, b"tfhd"):
+                _, flags = full_box_version(data, tfhd)
+                if flags & TFHD_DEFAULT_SAMPLE_DURATION:
+                    position = tfhd.payload + 8
+                    if flags & TFHD_BASE_DATA_OFFSET:
+                        position += 8
+                    if flags & TFHD_SAMPLE_DESCRIPTION_INDEX:
+                        position += 4
+                    default_sample_duration = struct.unpack_from(">I", data, position)[
+                        0
+                    ]
+            end = read_tfdt(data, tfdt)
+            for trun in child_boxes(data, traf, b"trun"):
+                end += parse_trun_duration(data, trun, default_sample_duration)
+            track_ends[track_id] = max(track_ends.get(track_id, 0), end)
+
+    if not init or not fragments:
+        raise IncompatibleSegmentError(f"{path} is not a fragmented MP4 file")
+    duration = max(
+        Fraction(end, tracks[track_id].timescale)
+        for track_id, end in track_ends.items()
+    )
+    return Segment(init, tracks, b"".join(fragments), duration)
+
+
+def shift_fragments(
+    fragments: bytes,
+    timescales: Dict[int, int],
+    shift: Fraction,
+    sequence_number: Optional[int] = None,
+    unshift: Fraction = Fraction(0),
+) -> bytes:
+    """
+    Shift the decode times of the fragments by `shift` - `unshift` seconds and
+    renumber them from `sequence_number`.
+    """
+    data = bytearray(fragments)
+    for box in iter_boxes(data):
+        if box.type != b"moof":
+            continue
+        for _, tfdt, track_id in iter_tfdts(data, box):
+            timescale = timescales[track_id]
+            value = (
+                read_tfdt(data, tfdt)
+                + round(shift * timescale)
+                - round(unshift * timescale)
+            )
+            write_tfdt(data, tfdt, value)
+        if sequence_number is not None:
+            mfhd = child_boxes(data, box, b"mfhd")[0]
+            struct.pack_into(">I", data, mfhd.payload + 4, sequence_number)
+            sequence_number += 1
+    return bytes(data)
+
+
+def free_box(size: int) -> bytes:
+    assert size == 0 or size >= 8
+    if not size:
+        return b""
+    return struct.pack(">I4s", size, b"free") + b"\x00" * (size - 8)
+
+
+def clear_edit_durations(init: bytes) -> bytes:
+    """
+    Set the duration of the edits of each track to 0, meaning they cover all the
+    fragments, since the init segment comes from the first slide segment only.
+    """
+    data = bytearray(init)
+
+    def visit(start, end):
+        for box in iter_boxes(data, start, end):
+            if box.type in CONTAINER_BOXES:
+                visit(box.payload, box.end)
+            elif box.type == b"elst":
+                version, _ = full_box_version(data, box)
+                entry_count = struct.unpack_from(">I", data, box.payload + 4)[0]
+                entry_size = 20 if version == 1 else 12
+                for i in range(entry_count):
+                    position = box.payload + 8 + i * entry_size
+                    if version == 1:
+                        struct.pack_into(">Q", data, position, 0)
+                    else:
+                        struct.pack_into(">I", data, position, 0)
+
+    visit(0, len(data))
+    return bytes(data)
+
+
+@dataclass
+class Slot:
+    path: str
+    size: int
+    mtime_ns: int
+    offset: int
+    slot_size: int
+    duration: Fraction
+
+    def to_yaml(self):
+        return {
+            "path": self.path,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "offset": self.offset,
+            "slot_size": self.slot_size,
+            "duration": str(self.duration),
+        }
+
+    @staticmethod
+    def from_yaml(data) -> "Slot":
+        return Slot(
+            path=data["path"],
+            size=data["size"],
+            mtime_ns=data["mtime_ns"],
+            offset=data["offset"],
+            slot_size=data["slot_size"],
+            duration=Fraction(data["duration"]),
+        )
+
+
+@dataclass
+class AssemblyIndex:
+    output_size: int = 0
+    output_mtime_ns: int = 0
+    signature: str = ""
+    tracks: Dict[int, int] = field(default_factory=dict)
+    slots: List[Slot] = field(default_factory=list)
+
+    def to_yaml(self):
+        return {
+            "output_size": self.output_size,
+            "output_mtime_ns": self.output_mtime_ns,
+            "signature": self.signature,
+            "tracks": dict(self.tracks),
+            "slots": [slot.to_yaml() for slot in self.slots],
+        }
+
+    @staticmethod
+    def from_yaml(data) -> "AssemblyIndex":
+        return AssemblyIndex(
+            output_size=data["output_size"],
+            output_mtime_ns=data["output_mtime_ns"],
+            signature=data["signature"],
+            tracks=dict(data["tracks"]),
+            slots=[Slot.from_yaml(slot) for slot in data["slots"]],
+        )
+
+
+class SegmentAssembler(object):
+    """
+    Assemble fragmented MP4 segments into one video, rewriting only what changed.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        # Bytes written to the output by the last call to `assemble`.
+        self.bytes_written = 0
+
+    def load_index(self) -> Optional[AssemblyIndex]:
+        import yaml
+
+        if not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path, "r") as f:
+            return AssemblyIndex.from_yaml(yaml.safe_load(f))
+
+    def save_index(self, index: AssemblyIndex, output_path):
+        import yaml
+
+        stat = os.stat(output_path)
+        index.output_size = stat.st_size
+        index.output_mtime_ns = stat.st_mtime_ns
+        with open(self.index_path, "w") as f:
+            yaml.dump(index.to_yaml(), f, sort_keys=False)
+
+    def assemble(self, video_paths: List[str], output_path: str):
+        self.bytes_written = 0
+        index = self.load_index()
+        if not self.can_update(index, video_paths, output_path):
+            index = None
+
+        if index is None:
+            print(f"Assembling {len(video_paths)} segments into {output_path}")
+            index = self.write(video_paths, output_path)
+        else:
+            self.update(index, video_paths, output_path)
+        self.save_index(index, output_path)
+        print(f"Wrote {self.bytes_written} bytes to {output_path}")
+
+    def can_update(
+        self, index: Optional[AssemblyIndex], video_paths: List[str], output_path
+    ) -> bool:
+        if index is None or len(index.slots) != len(video_paths):
+            return False
+        if not os.path.exists(output_path):
+            return False
+        stat = os.stat(output_path)
+        # The output was modified by something else.
+        return (stat.st_size, stat.st_mtime_ns) == (
+            index.output_size,
+            index.output_mtime_ns,
+        )
+
+    def write(self, video_paths: List[str], output_path: str) -> AssemblyIndex:
+        first = parse_segment(video_paths[0])
+        init = clear_edit_durations(first.init)
+        index = AssemblyIndex(
+            signature=first.signature,
+            tracks=first.timescales,
+        )
+        with open(output_path, "wb") as f:
+            f.write(init)
+            self.bytes_written += len(init)
+            self.write_slots(f, index, video_paths, 0, len(init), first)
+        return index
+
+    def write_slots(
+        self,
+        f,
+        index: AssemblyIndex,
+        video_paths: List[str],
+        start: int,
+        offset: int,
+        first: Optional[Segment] = None,
+    ):
+        """
+        Write the slots of the segments from `start` on at `offset`, and truncate the
+        output after them.
+        """
+        del index.slots[start:]
+        position = sum((slot.duration for slot in index.slots), Fraction(0))
+        f.seek(offset)
+        for i in range(start, len(video_paths)):
+            segment = first if i == 0 and first else parse_segment(video_paths[i])
+            self.check_compatible(index, segment, video_paths[i])
+            fragments = shift_fragments(
+                segment.fragments,
+                segment.timescales,
+                position,
+                sequence_number=i * SEQUENCE_STRIDE + 1,
+            )
+            slot_size = len(fragments) + max(
+                int(len(fragments) * SLOT_SLACK), MIN_SLOT_SLACK
+            )
+            f.write(fragments + free_box(slot_size - len(fragments)))
+            self.bytes_written += slot_size
+            stat = os.stat(video_paths[i])
+            index.slots.append(
+                Slot(
+                    path=video_paths[i],
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    offset=offset,
+                    slot_size=slot_size,
+                    duration=segment.duration,
+                )
+            )
+            offset += slot_size
+            position += segment.duration
+        f.truncate(offset)
+
+    def check_compatible(self, index: AssemblyIndex, segment: Segment, path):
+        if segment.signature != index.signature:
+            raise IncompatibleSegmentError(
+                f"{path} is not encoded like the other segments"
+            )
+
+    def update(self, index: AssemblyIndex, video_paths: List[str], output_path: str):
+        changed = []
+        for i, (slot, video_path) in enumerate(zip(index.slots, video_paths)):
+            stat = os.stat(video_path)
+            if (slot.path, slot.size, slot.mtime_ns) != (
+                video_path,
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                changed.append(i)
+        print(
+            f"Updating {len(changed)} of {len(video_paths)} segments in {output_path}"
+        )
+
+        with open(output_path, "r+b") as f:
+            old_position = Fraction(0)
+            new_position = Fraction(0)
+            for i, slot in enumerate(index.slots):
+                old_duration = slot.duration
+                if i in changed:
+                    segment = parse_segment(video_paths[i])
+                    self.check_compatible(index, segment, video_paths[i])
+                    fragments = shift_fragments(
+                        segment.fragments,
+                        segment.timescales,
+                        new_position,
+                        sequence_number=i * SEQUENCE_STRIDE + 1,
+                    )
+                    free_size = slot.slot_size - len(fragments)
+                    if free_size != 0 and free_size < 8:
+                        # The segment outgrew its slot: rewrite everything after it.
+                        self.write_slots(f, index, video_paths, i, slot.offset)
+                        return
+                    f.seek(slot.offset)
+                    f.write(fragments + free_box(free_size))
+                    self.bytes_written += slot.slot_size
+                    stat = os.stat(video_paths[i])
+                    slot.path = video_paths[i]
+                    slot.size = stat.st_size
+                    slot.mtime_ns = stat.st_mtime_ns
+                    slot.duration = segment.duration
+                elif old_position != new_position:
+                    self.move_slot(f, slot, index.tracks, old_position, new_position)
+                old_position += old_duration
+                new_position += slot.duration
+
+    def move_slot(
+        self,
+        f,
+        slot: Slot,
+        timescales: Dict[int, int],
+        old_position: Fraction,
+        new_position: Fraction,
+    ):
+        """
+        Patch the decode times of the fragments of an unchanged slot, reading and
+        writing only its moof boxes.
+        """
+        offset = slot.offset
+        end = slot.offset + slot.slot_size
+        while offset < end:
+            f.seek(offset)
+            size, box_type = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0]
+            if box_type == b"moof":
+                f.seek(offset)
+                moof = f.read(size)
+                moof = shift_fragments(
+                    moof, timescales, new_position, unshift=old_position
+                )
+                f.seek(offset)
+                f.write(moof)
+                self.bytes_written += size
+            offset += size
@@ -0,0 +1,163 @@
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import List, Tuple
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+COPY_CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class WavInfo:
+    fmt_chunk: bytes
+    channels: int
+    sample_rate: int
+    block_align: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.block_align
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    @property
+    def silence(self) -> bytes:
+        """
+        The bytes of one frame of silence in the native sample format.
+        """
+        fmt_tag = struct.unpack_from("<H", self.fmt_chunk)[0]
+        if fmt_tag == WAVE_FORMAT_EXTENSIBLE and len(self.fmt_chunk) >= 26:
+            fmt_tag = struct.unpack_from("<H", self.fmt_chunk, 24)[0]
+        # 8-bit PCM is unsigned, every other format is signed or floating point.
+        if fmt_tag == WAVE_FORMAT_PCM and self.bits_per_sample == 8:
+            return b"\x80" * self.block_align
+        return b"\x00" * self.block_align
+
+
+def read_wav_info(path) -> WavInfo:
+    """
+    Read the format and the location of the samples of a WAV file from its header,
+    without reading the samples.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff, _, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt_chunk = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"No data chunk in WAV file: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                fmt_chunk = f.read(chunk_size)
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt_chunk is None:
+                    raise ValueError(f"No fmt chunk before data in WAV file: {path}")
+                data_offset = f.tell()
+                # Streamed WAV files may not have the data size filled in.
+                data_size = min(chunk_size, file_size - data_offset)
+                channels, sample_rate, _, block_align, bits_per_sample = (
+                    struct.unpack_from("<HIIHH", fmt_chunk, 2)
+                )
+                return WavInfo(
+                    fmt_chunk=fmt_chunk,
+                    channels=channels,
+                    sample_rate=sample_rate,
+                    block_align=block_align,
+                    bits_per_sample=bits_per_sample,
+                    data_offset=data_offset,
+                    data_size=data_size,
+                )
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def wav_duration(path) -> float:
+    return read_wav_info(path).duration
+
+
+def write_wav_header(f, info: WavInfo, data_size: int):
+    fmt_size = len(info.fmt_chunk)
+    riff_size = 4 + 8 + fmt_size + fmt_size % 2 + 8 + data_size + data_size % 2
+    f.write(struct.pack("<4sI4s", b"RIFF", riff_size, b"WAVE"))
+    f.write(struct.pack("<4sI", b"fmt ", fmt_size))
+    f.write(info.fmt_chunk + b"\x00" * (fmt_size % 2))
+    f.write(struct.pack("<4sI", b"data", data_size))
+
+
+def write_silence(f, info: WavInfo, frames: int):
+    silence = info.silence
+    chunk_frames = COPY_CHUNK_SIZE // len(silence)
+    while frames > 0:
+        count = min(frames, chunk_frames)
+        f.write(silence * count)
+        frames -= count
+
+
+def copy_samples(f, path, info: WavInfo):
+    with open(path, "rb") as source:
+        source.seek(info.data_offset)
+        remaining = info.data_size - info.data_size % info.block_align
+        while remaining > 0:
+            chunk = source.read(min(remaining, COPY_CHUNK_SIZE))
+            if not chunk:
+                break
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def concat_wavs(inputs: List[Tuple[str, float, float]], output_path) -> List[float]:
+    """
+    Concatenate WAV files, each with `lead` and `tail` seconds of silence around it.
+
+    :param inputs: (path, lead, tail) of each file. All the files must share the same format.
+    :return: The duration in seconds of each padded file in the output.
+    """
+    infos = [read_wav_info(path) for path, _, _ in inputs]
+    info = infos[0]
+    for path, other in zip([path for path, _, _ in inputs], infos):
+        if other.fmt_chunk != info.fmt_chunk:
+            raise ValueError(f"{path} has a different format than {inputs[0][0]}")
+
+    frames = []
+    for (_, lead, tail), other in zip(inputs, infos):
+        frames.append(
+            (
+                round(lead * info.sample_rate),
+                other.frames,
+                round(tail * info.sample_rate),
+            )
+        )
+    data_size = sum(sum(counts) for counts in frames) * info.block_align
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.NamedTemporaryFile(
+        dir=output_dir, suffix=".wav", delete=False
+    ) as temp_file:
+        temp_file_name = temp_file.name
+        try:
+            write_wav_header(temp_file, info, data_size)
+            for (path, _, _), other, (lead_frames, _, tail_frames) in zip(
+                inputs, infos, frames
+            ):
+                write_silence(temp_file, info, lead_frames)
+                copy_samples(temp_file, path, other)
+                write_silence(temp_file, info, tail_frames)
+            # Chunks are word aligned.
+            temp_file.write(b"\x00" * (data_size % 2))
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file_name)
+            raise
+    os.replace(temp_file_name, output_path)
+    return [sum(counts) / info.sample_rate for counts in frames]
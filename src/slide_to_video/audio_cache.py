@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+
+DEFAULT_MAX_SIZE_MB = 2048
+
+
+def default_cache_dir(name: str = "audio") -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "slide-to-video", name)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def audio_key(engine_key: dict, text: str) -> str:
+    """
+    Identify the audio synthesized from `text` by an engine with `engine_key`.
+    """
+    payload = json.dumps(
+        {"engine": engine_key, "text": normalize_text(text)}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache(object):
+    """
+    Content-addressed on-disk store of synthesized audio, shared across projects.
+
+    Entries are keyed by the engine parameters that affect the generated audio
+    (see `TTSEngine.cache_key`) and the normalized text. The least recently used
+    entries are evicted once the store grows beyond `max_size` bytes.
+    """
+
+    def __init__(
+        self, cache_dir: Optional[str] = None, max_size_mb: float = DEFAULT_MAX_SIZE_MB
+    ):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.total_size = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def from_config(config: dict) -> Optional["AudioCache"]:
+        if not config.get("audio_cache", True):
+            return None
+        return AudioCache(
+            config.get("audio_cache_dir"),
+            config.get("audio_cache_max_mb", DEFAULT_MAX_SIZE_MB),
+        )
+
+    def key(self, engine_key: dict, text: str) -> str:
+        return audio_key(engine_key, text)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.wav")
+
+    def get(self, key: str, output_path: str) -> bool:
+        """
+        Copy the cached audio for `key` to `output_path`.
+
+        :return: Whether the entry was found.
+        """
+        path = self.entry_path(key)
+        try:
+            shutil.copyfile(path, output_path)
+            # The mtime doubles as the last access time for LRU eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, audio_path: str):
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry.
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), suffix=".tmp", delete=False
+        ) as temp_file:
+            temp_file_name = temp_file.name
+        try:
+            shutil.copyfile(audio_path, temp_file_name)
+            with self.lock:
+                # An entry written again replaces the previous one.
+                try:
+                    replaced_size = os.path.getsize(path)
+                except FileNotFoundError:
+                    replaced_size = 0
+                os.replace(temp_file_name, path)
+                if self.total_size is None:
+                    self.total_size = sum(size for _, size, _ in self.entries())
+                else:
+                    self.total_size += os.path.getsize(path) - replaced_size
+                if self.total_size > self.max_size:
+                    self.evict()
+        finally:
+            if os.path.exists(temp_file_name):
+                os.remove(temp_file_name)
+
+    def entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith(".wav"):
+                    continue
+                path = os.path.join(root, file)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime_ns
+
+    def evict(self):
+        # Must be called with `self.lock` held.
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            self.evictions += 1
+        self.total_size = total_size
+
+    def stats(self) -> str:
+        return f"Audio cache: {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
@@ -0,0 +1,198 @@
+"""
+Render many decks in one run, e.g. all the lectures of a course.
+
+The projects are listed in a yaml manifest:
+
+    defaults:
+      model: local
+      voice: voice.wav
+    projects:
+      - slide: lecture1.pdf
+        script: lecture1.txt
+        output_dir: output/lecture1
+      - slide: lecture2.pdf
+        script: lecture2.txt
+        output_dir: output/lecture2
+        delay: 1.0
+
+Each project takes the keys of the config file, and `defaults` applies to all of
+them. Several decks are built at once, so that e.g. the syntheses of a deck run
+while another deck is being assembled. The projects share a single engine per
+engine config and a single audio cache.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import yaml
+from .audio_cache import AudioCache
+from .lib import slide_to_video
+from .project import DEFAULT_CONFIG, ProjectConfig
+from .tts_engine import TTSEngine, create_engine, engine_config_key
+
+# The number of decks built at once.
+DEFAULT_BATCH_JOBS = 2
+
+
+def load_manifest(path) -> List[ProjectConfig]:
+    """
+    :raises ValueError: If a project is invalid, or several projects write to the
+        same output directory.
+    """
+    with open(path, "r") as f:
+        manifest = yaml.safe_load(f) or {}
+    defaults = manifest.get("defaults") or {}
+    configs = []
+    output_dirs = set()
+    for entry in manifest.get("projects") or []:
+        config = ProjectConfig({**DEFAULT_CONFIG, **defaults, **entry})
+        if config.get("watch"):
+            raise ValueError("Batch projects cannot watch their inputs")
+        output_dir = os.path.abspath(config["output_dir"])
+        if output_dir in output_dirs:
+            raise ValueError(f"Several projects write to {config['output_dir']}")
+        output_dirs.add(output_dir)
+        configs.append(config)
+    return configs
+
+
+class SharedEngine(TTSEngine):
+    """
+    An engine used by several projects built at once. The calls to an engine that
+    is not parallelizable are serialized, so that the projects take turns on it.
+    """
+
+    def __init__(self, engine: TTSEngine):
+        self.engine = engine
+        self.name = engine.name
+        self.version = engine.version
+        self.speed = engine.speed
+        self.language = engine.language
+        self.lock = threading.Lock()
+
+    def serialized(self):
+        if self.engine.parallizable():
+            return contextlib.nullcontext()
+        return self.lock
+
+    def synthesize(self, text: str, output_path: str, format: str = "wav"):
+        with self.serialized():
+            self.engine.synthesize(text, output_path, format)
+
+    def synthesize_batch(
+        self,
+        texts: List[str],
+        output_paths: List[str],
+        *,
+        format: str = "wav",
+        max_workers: Optional[int] = None,
+    ):
+        with self.serialized():
+            self.engine.synthesize_batch(
+                texts, output_paths, format=format, max_workers=max_workers
+            )
+
+    def parallizable(self) -> bool:
+        return self.engine.parallizable()
+
+    def max_workers(self) -> Optional[int]:
+        return self.engine.max_workers()
+
+    def voice_fingerprint(self) -> str:
+        return self.engine.voice_fingerprint()
+
+    def cache_key(self) -> dict:
+        return self.engine.cache_key()
+
+    def close(self):
+        self.engine.close()
+
+
+class BatchRunner(object):
+    """
+    Build the projects of a batch, `jobs` decks at once. The CPUs are shared between
+    the decks built at once, unless their config sets the number of workers of each
+    stage.
+    """
+
+    def __init__(self, configs: List[ProjectConfig], *, jobs: int = DEFAULT_BATCH_JOBS):
+        self.configs = configs
+        self.jobs = max(1, min(jobs, len(configs)))
+        self.engines: Dict[str, SharedEngine] = {}
+        self.audio_caches: Dict[Tuple, Optional[AudioCache]] = {}
+        self.lock = threading.Lock()
+
+    def engine(self, config: ProjectConfig) -> SharedEngine:
+        key = engine_config_key(config["model"], config)
+        # Engines are created by the first project using them, one at a time.
+        with self.lock:
+            if key not in self.engines:
+                print(f"Loading the {config['model']} engine")
+                self.engines[key] = SharedEngine(create_engine(config["model"], config))
+            return self.engines[key]
+
+    def audio_cache(self, config: ProjectConfig) -> Optional[AudioCache]:
+        key = (
+            config.get("audio_cache", True),
+            config.get("audio_cache_dir"),
+            config.get("audio_cache_max_mb"),
+        )
+        with self.lock:
+            if key not in self.audio_caches:
+                self.audio_caches[key] = AudioCache.from_config(config)
+            return self.audio_caches[key]
+
+    def build(self, config: ProjectConfig) -> dict:
+        start = time.perf_counter()
+        result = {"output_dir": config["output_dir"], "status": "done"}
+        try:
+            slide_to_video(
+                project_config=config,
+                tts_engine=self.engine(config),
+                audio_cache=self.audio_cache(config),
+            )
+        except Exception as e:
+            # The other projects are still built.
+            print(f"Building {config['output_dir']} failed: {e!r}")
+            result["status"] = "failed"
+            result["error"] = repr(e)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def run(self) -> List[dict]:
+        """
+        :return: The status and build time of each project, in order.
+        """
+        cpu_share = max(1, (os.cpu_count() or 1) // self.jobs)
+        configs = []
+        for project_config in self.configs:
+            config = ProjectConfig(project_config)
+            config.force_reset = project_config.force_reset
+            for key in ["rasterize_workers", "render_workers"]:
+                config.setdefault(key, cpu_share)
+            configs.append(config)
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = list(executor.map(self.build, configs))
+        finally:
+            for engine in self.engines.values():
+                engine.close()
+        failed = sum(result["status"] == "failed" for result in results)
+        print(
+            f"Built {len(results) - failed} of {len(results)} projects "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+        return results
+
+
+def run_batch(
+    configs: List[ProjectConfig], *, jobs: int = DEFAULT_BATCH_JOBS
+) -> List[dict]:
+    if not configs:
+        return []
+    return BatchRunner(configs, jobs=jobs).run()
@@ -1,35 +1,122 @@
 import os
+import shutil
+import time
+from typing import Dict, Optional
 
 
-from .project import Project, ProjectConfig
+from .audio_cache import AudioCache
+from .project import Project, ProjectConfig, PREVIEW_DIR
+from .tts_engine import TTSEngine, create_engine
+from .watch import FileWatcher, DEFAULT_WATCH_INTERVAL, DEFAULT_WATCH_DEBOUNCE
+
+
+def load_script_dict(path) -> Dict[str, str]:
+    replace_dict = {}
+    with open(path, "r") as f:
+        lines = f.readlines()
+        for line in lines:
+            original_text, new_text = line.strip().split(":")
+            replace_dict[original_text.strip()] = new_text.strip()
+    return replace_dict
+
+
+def resolve_config(project_config: ProjectConfig) -> ProjectConfig:
+    """
+    The config to build with, with the files it refers to loaded.
+    """
+    config = ProjectConfig(project_config)
+    config.force_reset = project_config.force_reset
+    if "script_dict" in config:
+        config["script_dict"] = load_script_dict(config["script_dict"])
+    if config.get("preview"):
+        config = config.for_preview()
+        os.makedirs(config["output_dir"], exist_ok=True)
+    return config
+
+
+def build_project(
+    project_config: ProjectConfig,
+    tts_engine: Optional[TTSEngine] = None,
+    audio_cache: Optional[AudioCache] = None,
+):
+    project = Project(
+        name="project",
+        config=project_config,
+        tts_engine=tts_engine,
+        audio_cache=audio_cache,
+    )
+    try:
+        project.build()
+        project.save()
+    finally:
+        project.close()
+
+
+def watch_project(project_config: ProjectConfig):
+    """
+    Build the project, then build it again whenever the slide, the script or the
+    script dictionary changes, with the same engine so that its model stays loaded.
+    """
+    paths = [project_config["slide"], project_config["script"]]
+    if "script_dict" in project_config:
+        paths.append(project_config["script_dict"])
+    watcher = FileWatcher(
+        paths,
+        interval=project_config.get("watch_interval", DEFAULT_WATCH_INTERVAL),
+        debounce=project_config.get("watch_debounce", DEFAULT_WATCH_DEBOUNCE),
+    )
+    config = resolve_config(project_config)
+    tts_engine = create_engine(config["model"], config)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                build_project(config, tts_engine)
+                print(f"Built in {time.perf_counter() - start:.2f}s.")
+            except Exception as e:
+                # e.g. a file saved halfway: the next change is built again.
+                print(f"Build failed: {e!r}")
+            print(f"Watching {', '.join(paths)} for changes. Press Ctrl-C to stop.")
+            changed = watcher.wait()
+            print(f"Changed: {', '.join(changed)}")
+            config = resolve_config(project_config)
+            # Slides are only forced to be built again by the first build.
+            config.force_reset = set()
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        tts_engine.close()
+
+
+def is_project_dir(output_dir: str) -> bool:
+    """
+    Whether `output_dir` holds a project, which is updated instead of being replaced.
+    """
+    project_files = [
+        f"{output_dir}/project.db",
+        f"{output_dir}/project.yaml",
+        f"{output_dir}/{PREVIEW_DIR}/project.db",
+    ]
+    return any(os.path.exists(project_file) for project_file in project_files)
 
 
 def slide_to_video(
     *,
     project_config: ProjectConfig,
+    tts_engine: Optional[TTSEngine] = None,
+    audio_cache: Optional[AudioCache] = None,
 ):
+    """
+    :param tts_engine: The engine to synthesize with, if already created.
+    :param audio_cache: The audio cache to use, if shared with other projects.
+    """
     # Create the output directory if it does not exist
     output_dir = project_config["output_dir"]
-    if os.path.exists(output_dir):
-        project_file = f"{output_dir}/project.yaml"
-        if not os.path.exists(project_file):
-            # remove the directory
-            os.system(f"rm -rf {output_dir}")
+    if os.path.exists(output_dir) and not is_project_dir(output_dir):
+        shutil.rmtree(output_dir)
     os.makedirs(output_dir, exist_ok=True)
 
-    if "script_dict" in project_config:
-        replace_dict = {}
-        script_dict = project_config["script_dict"]
-        with open(script_dict, "r") as f:
-            lines = f.readlines()
-            for line in lines:
-                original_text, new_text = line.strip().split(":")
-                replace_dict[original_text.strip()] = new_text.strip()
-        project_config["script_dict"] = replace_dict
-
-    project = Project(
-        name="project",
-        config=project_config,
-    )
-    project.build()
-    project.save()
+    if project_config.get("watch"):
+        watch_project(project_config)
+    else:
+        build_project(resolve_config(project_config), tts_engine, audio_cache)
@@ -0,0 +1,163 @@
+"""
+A build pipeline: items flow through stages connected by bounded queues, and each
+stage runs its own number of workers. An item enters a stage as soon as it leaves
+the previous one, so stages overlap and the wall time of a build approaches the
+time of its slowest stage rather than the sum of all of them.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+# Marks the end of the items of a queue.
+DONE = object()
+
+
+class Stage(object):
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        *,
+        workers: int = 1,
+        queue_size: Optional[int] = None,
+        batch_size: int = 1,
+        batched: Optional[bool] = None,
+    ):
+        """
+        :param func: Called on each item. Its result is passed to the next stage.
+        :param workers: Number of items, or batches, processed concurrently by the stage.
+        :param queue_size: Number of items waiting for the stage, after which the
+            previous stage blocks. Twice the number of workers by default, and at
+            least `batch_size`.
+        :param batch_size: The number of waiting items passed to `func` at once, if
+            the stage is batched.
+        :param batched: Whether `func` is called on a list of up to `batch_size`
+            items, as many as are waiting, and returns a list of results, even if
+            `batch_size` is 1. By default, only if `batch_size` is greater than 1.
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batched = self.batch_size > 1 if batched is None else batched
+        self.queue = queue.Queue(
+            maxsize=queue_size or max(2 * self.workers, self.batch_size)
+        )
+        # Seconds spent in `func`, summed over all workers.
+        self.busy_time = 0.0
+        self.running_workers = self.workers
+        self.lock = threading.Lock()
+
+
+class Pipeline(object):
+    def __init__(self, stages: List[Stage]):
+        assert stages
+        self.stages = stages
+        self.error: Optional[BaseException] = None
+        self.results = []
+        self.lock = threading.Lock()
+
+    def run(self, items: Iterable) -> List:
+        """
+        Run items through all the stages.
+
+        If a stage raises, the remaining items are drained without being processed
+        and the first exception is raised again.
+
+        :return: The results of the last stage, in completion order.
+        """
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self.feed, args=(items,), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            for _ in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self.work, args=(stage, next_stage), daemon=True
+                    )
+                )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if self.error:
+            raise self.error
+        busy = ", ".join(
+            f"{stage.name} {stage.busy_time:.2f}s" for stage in self.stages
+        )
+        print(f"Pipeline finished in {elapsed:.2f}s ({busy})")
+        return self.results
+
+    def feed(self, items: Iterable):
+        first = self.stages[0]
+        try:
+            for item in items:
+                if self.error:
+                    break
+                first.queue.put(item)
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            for _ in range(first.workers):
+                first.queue.put(DONE)
+
+    def next_batch(self, stage: Stage) -> Tuple[List, bool]:
+        """
+        Wait for an item, then take the items already waiting, up to the batch size.
+
+        :return: The items, and whether the end of the queue was reached.
+        """
+        items = []
+        item = stage.queue.get()
+        while item is not DONE:
+            items.append(item)
+            if len(items) >= stage.batch_size:
+                return items, False
+            try:
+                item = stage.queue.get_nowait()
+            except queue.Empty:
+                return items, False
+        return items, True
+
+    def work(self, stage: Stage, next_stage: Optional[Stage]):
+        done = False
+        while not done:
+            items, done = self.next_batch(stage)
+            if not items or self.error:
+                # Drain the queue so that the previous stage does not block.
+                continue
+            start = time.perf_counter()
+            try:
+                if stage.batched:
+                    results = stage.func(items)
+                else:
+                    results = [stage.func(items[0])]
+            except BaseException as e:
+                self.fail(e)
+                continue
+            finally:
+                with stage.lock:
+                    stage.busy_time += time.perf_counter() - start
+            for result in results:
+                if next_stage:
+                    next_stage.queue.put(result)
+                else:
+                    with self.lock:
+                        self.results.append(result)
+
+        with stage.lock:
+            stage.running_workers -= 1
+            last = stage.running_workers == 0
+        # The last worker of a stage ends the next one.
+        if last and next_stage:
+            for _ in range(next_stage.workers):
+                next_stage.queue.put(DONE)
+
+    def fail(self, error: BaseException):
+        with self.lock:
+            if self.error is None:
+                self.error = error
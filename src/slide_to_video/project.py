@@ -1,14 +1,61 @@
 from __future__ import annotations
+import difflib
 import enum
-from multiprocessing import Manager
-
-from .utils import md5sum_of_file, exists, get_audio_duration
-import yaml
-from .slide_engine import SlideEngine
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from .utils import digest_of_file, file_stat, exists
+from .slide_engine import (
+    SlideEngine,
+    PageRenderer,
+    DEFAULT_RESOLUTION,
+    parse_resolution,
+)
 from .script_engine import ScriptEngine
 from .tts_engine import TTSEngine, create_engine
 from .video_engine import VideoEngine
-import concurrent.futures
+from .audio_cache import AudioCache, audio_key
+from .audio import concat_wavs
+from .assembly import SegmentAssembler, IncompatibleSegmentError
+from .streaming import (
+    StreamPublisher,
+    parse_streaming_formats,
+    DEFAULT_SEGMENT_DURATION,
+)
+from .pipeline import Pipeline, Stage
+from .state import ProjectState, DECK
+from .artifacts import IMAGE, AUDIO, VIDEO, OUTPUT
+
+
+# The values of the required settings that have a default.
+DEFAULT_CONFIG = {"speech_speed": 1.0, "delay": 2.0, "language": "en"}
+RENDER_MODES = ["segments", "single_pass"]
+SYNTHESIS_UNITS = ["slide", "sentence"]
+DEFAULT_SENTENCE_GAP = 0.4
+ASSEMBLY_MODES = ["concat", "incremental"]
+# The directory of the preview, in the output directory.
+PREVIEW_DIR = "preview"
+# The settings of the preview, which override the config.
+PREVIEW_PROFILE = {
+    "resolution": "640x360",
+    "framerate": 10,
+    "encode_preset": "ultrafast",
+}
+
+
+def parse_slide_numbers(value) -> Set[int]:
+    """
+    Parse 1-based slide numbers given as e.g. "3,5" or [3, 5].
+    """
+    if not value:
+        return set()
+    if isinstance(value, int):
+        value = [value]
+    elif isinstance(value, str):
+        value = value.split(",")
+    return {int(number) for number in value}
 
 
 class TargetVoice:
@@ -26,14 +73,34 @@ class ItemType(enum.Enum):
 
 class Item:
     def __init__(
-        self, *, path, type, extra=None, md5sum=None, cached=False, force_reset=False
+        self,
+        *,
+        path,
+        type,
+        extra=None,
+        md5sum=None,
+        cached=False,
+        force_reset=False,
+        stat=None,
+        previous: Optional[Item] = None,
     ):
+        """
+        :param md5sum: The digest of the content of the item, computed if not set.
+        :param stat: The stat of the file when its digest was computed.
+        :param previous: The item of the previous run, whose digest is reused if the
+            file was not modified since.
+        """
         self.path = path
         self.type = type
         self.cached = cached
         if not md5sum:
-            md5sum = md5sum_of_file(path)
+            stat = file_stat(path)
+            if previous and previous.path == path and previous.stat == stat:
+                md5sum = previous.md5sum
+            else:
+                md5sum = digest_of_file(path)
         self.md5sum = md5sum
+        self.stat = stat
         if extra:
             extra = dict(extra)
         self.extra = extra
@@ -64,6 +131,7 @@ class Item:
             md5sum=data["md5sum"],
             force_reset=data.get("force_reset", False),
             extra=data.get("extra", None),
+            stat=data.get("stat", None),
         )
 
     def to_yaml(self):
@@ -76,6 +144,8 @@ class Item:
         }
         if self.extra:
             result["extra"] = self.extra
+        if self.stat:
+            result["stat"] = self.stat
         return result
 
 
@@ -89,59 +159,198 @@ class Task(object):
         output_dir,
         tts_engine: TTSEngine,
         delay: float,
-        lock=None,
+        audio_cache: Optional[AudioCache] = None,
+        video_engine: Optional[VideoEngine] = None,
+        sentence_gap: Optional[float] = None,
+        sentence_dir: Optional[str] = None,
     ):
+        """
+        :param sentence_gap: If set, each sentence of the script is synthesized on its
+            own, and the sentences are joined with `sentence_gap` seconds of silence.
+        :param sentence_dir: The directory of the sentence files, by default in
+            `output_dir`.
+        """
         self.id = id
         self.slide = slide
         self.script = script
         self.output_dir = output_dir
         self.tts_engine = tts_engine
-        self.lock = lock
         self.delay = delay
+        self.audio_cache = audio_cache
+        self.video_engine = video_engine or VideoEngine()
+        self.sentence_gap = sentence_gap
+        self.sentence_dir = sentence_dir or f"{self.output_dir}/sentences"
+        self.audio_file = f"{self.output_dir}/sub_paragraph_{self.id}.wav"
+        self.video_file = f"{self.output_dir}/sub_paragraph_{self.id}.mp4"
+        # Whether to synthesize the audio again, instead of reusing the sentence files
+        # and the audio cache.
+        self.force_synthesis = False
+
+    def audio_input_key(self) -> str:
+        return AUDIO.key(
+            script=self.script.md5sum,
+            engine=self.tts_engine.cache_key(),
+            sentence_gap=self.sentence_gap,
+        )
 
-    def build(self):
-        video_file = f"{self.output_dir}/sub_paragraph_without_sound_{self.id}.mp4"
-        audio_file = f"{self.output_dir}/sub_paragraph_{self.id}.wav"
-        final_video_file = f"{self.output_dir}/sub_paragraph_{self.id}.mp4"
+    def video_input_key(self) -> str:
+        return VIDEO.key(
+            image=self.slide.md5sum,
+            audio=self.audio_input_key(),
+            delays=self.delays(),
+            encoding=self.video_engine.cache_key(),
+        )
 
-        if self.script.cached and self.slide.cached:
+    def audio_units(self) -> List[Tuple[str, str]]:
+        """
+        The texts synthesized for the slide, and the files they are synthesized to.
+
+        Sentence files are named after the engine parameters and the text of the
+        sentence, so that unchanged sentences are not synthesized again.
+        """
+        sentences = []
+        if self.sentence_gap is not None:
+            sentences = ScriptEngine().split_sentences(self.script.content)
+        if not sentences:
+            return [(self.script.content, self.audio_file)]
+        engine_key = self.tts_engine.cache_key()
+        return [
+            (sentence, f"{self.sentence_dir}/{audio_key(engine_key, sentence)}.wav")
+            for sentence in sentences
+        ]
+
+    def restore_audio(self, text, audio_file) -> bool:
+        if audio_file != self.audio_file and exists(audio_file):
+            return True
+        if not self.audio_cache:
+            return False
+        key = self.audio_cache.key(self.tts_engine.cache_key(), text)
+        if self.audio_cache.get(key, audio_file):
+            print(f"Reusing cached audio for {self.script.path}")
+            return True
+        return False
+
+    def store_audio(self, text, audio_file):
+        if self.audio_cache:
+            key = self.audio_cache.key(self.tts_engine.cache_key(), text)
+            self.audio_cache.put(key, audio_file)
+
+    def join_sentences(self):
+        units = self.audio_units()
+        if len(units) == 1 and units[0][1] == self.audio_file:
             return
+        # The script is only split into sentences when the gap is set.
+        gap = self.sentence_gap or 0.0
+        concat_wavs(
+            [
+                (path, 0.0, gap if i + 1 < len(units) else 0.0)
+                for i, (_, path) in enumerate(units)
+            ],
+            self.audio_file,
+        )
 
-        if not self.script.cached:
-            if self.lock:
-                self.lock.acquire()
-            self.tts_engine.synthesize(self.script.content, audio_file)
-            if self.lock:
-                self.lock.release()
-        video_engine = VideoEngine()
-        if self.id != 1:
-            video_engine.add_silence(audio_file, self.delay / 2, direction="start")
+    def delays(self):
+        """
+        The seconds of silence before and after the audio of the slide.
+        """
+        start_delay = self.delay / 2 if self.id != 1 else 0
         end_delay = self.delay / 2
         if self.script.extra:
             end_delay = self.script.extra.get("delay", end_delay)
-        video_engine.add_silence(audio_file, end_delay, direction="end")
+        return start_delay, end_delay
 
-        duration = get_audio_duration(audio_file)
+    def build_audio(self):
+        Task.build_audio_batch([self])
 
-        if not self.slide.cached or self.script.cached:
-            video_engine.generate_video_from_image(
-                self.slide.path, video_file, duration
-            )
-            video_engine.add_audio_to_video(video_file, audio_file, final_video_file)
+    @staticmethod
+    def build_audio_batch(tasks: List[Task], max_workers: Optional[int] = None):
+        """
+        Synthesize the audio of several tasks with a single call to the engine.
+        """
+        tasks = [task for task in tasks if not task.script.cached]
+        # The text and the task of each file to synthesize.
+        pending: Dict[str, Tuple[str, Task]] = {}
+        for task in tasks:
+            for text, audio_file in task.audio_units():
+                if audio_file in pending or (
+                    not task.force_synthesis and task.restore_audio(text, audio_file)
+                ):
+                    continue
+                pending[audio_file] = (text, task)
+
+        if pending:
+            os.makedirs(tasks[0].sentence_dir, exist_ok=True)
+            # Files are synthesized under a temporary name, so that an interrupted
+            # build never leaves a partial sentence behind.
+            temp_files = {
+                audio_file: f"{os.path.splitext(audio_file)[0]}.partial.wav"
+                for audio_file in pending
+            }
+            try:
+                tasks[0].tts_engine.synthesize_batch(
+                    [text for text, _ in pending.values()],
+                    list(temp_files.values()),
+                    max_workers=max_workers,
+                )
+                for audio_file, temp_file in temp_files.items():
+                    os.replace(temp_file, audio_file)
+            finally:
+                for temp_file in temp_files.values():
+                    if exists(temp_file):
+                        os.remove(temp_file)
+            for audio_file, (text, task) in pending.items():
+                task.store_audio(text, audio_file)
+
+        for task in tasks:
+            task.join_sentences()
+
+    def build_video(self):
+        if self.script.cached and self.slide.cached:
+            return
+
+        # The audio file is left as synthesized; the delays are added while rendering.
+        start_delay, end_delay = self.delays()
+        self.video_engine.render_segment(
+            self.slide.path,
+            self.audio_file,
+            self.video_file,
+            lead=start_delay,
+            tail=end_delay,
+        )
+
+    def build(self):
+        self.build_audio()
+        self.build_video()
 
 
 class ProjectConfig(dict):
     def __init__(self, config):
         super().__init__()
-        skip_keywords = ["config"]
+        skip_keywords = ["config", "force_reset"]
         for key, value in config.items():
             if key not in skip_keywords:
                 self[key] = value
+        # The 1-based numbers of the slides to build again. Only applies to this run.
+        self.force_reset = parse_slide_numbers(config.get("force_reset"))
         self.validate()
 
     def as_dict(self):
         return dict(self)
 
+    def for_preview(self) -> ProjectConfig:
+        """
+        The config of a quick preview of the project, built in its own directory
+        from the audio of the project.
+        """
+        config = ProjectConfig({**self, **PREVIEW_PROFILE})
+        config["output_dir"] = os.path.join(self["output_dir"], PREVIEW_DIR)
+        # Sentence files are named after their content, so they can be shared.
+        config["sentence_dir"] = self.get("sentence_dir") or os.path.join(
+            self["output_dir"], "sentences"
+        )
+        config.force_reset = self.force_reset
+        return config
+
     def validate(self):
         required_fields = [
             "model",
@@ -164,8 +373,19 @@ class Project:
         name,
         config: ProjectConfig,
         from_file=False,
+        tts_engine: Optional[TTSEngine] = None,
+        audio_cache: Optional[AudioCache] = None,
     ):
+        """
+        :param tts_engine: The engine to synthesize with, e.g. to keep its model loaded
+            across builds. It is not closed by the project. By default, the engine of
+            the config is created for each build.
+        :param audio_cache: The audio cache to use, e.g. one shared with other
+            projects. By default, the cache of the config is used.
+        """
         self.name = name
+        self.tts_engine = tts_engine
+        self.audio_cache = audio_cache
         self.slide = config["slide"]
         self.script = config["script"]
         self.output_dir = config["output_dir"]
@@ -173,13 +393,34 @@ class Project:
         self.slide_items = []
         self.script_items = []
         self.speech_speed = config["speech_speed"]
+        # The 0-based numbers of the pages to render during the build.
+        self.pages_to_render: List[int] = []
+        # The fingerprints of the pages, and the stat of the deck they were computed
+        # from.
+        self.slide_fingerprints: Optional[dict] = None
+        self._state: Optional[ProjectState] = None
 
         if not from_file:
-            self.calculate_items()
-            project_file = f"{self.output_dir}/project.yaml"
-            previous_project = self.load_project_file(project_file)
+            self._state = ProjectState(f"{self.output_dir}/project.db")
+            previous_project = self.load_previous_project()
+            self.calculate_items(previous_project)
+            previous_slides = []
             if previous_project:
-                self.sync_project(previous_project)
+                previous_slides = self.sync_project(previous_project)
+            # The pages are rendered by the build pipeline.
+            self.pages_to_render = self.changed_pages(previous_slides)
+
+    @property
+    def state(self) -> ProjectState:
+        """
+        The persistent state of the project. Projects loaded from a file have none.
+        """
+        assert self._state is not None, "The project has no state"
+        return self._state
+
+    @state.setter
+    def state(self, state: ProjectState):
+        self._state = state
 
     def all_reset(self):
         for item in self.slide_items:
@@ -187,88 +428,229 @@ class Project:
         for item in self.script_items:
             item.reset()
 
-    def sync_project(self, previous_project: Project):
-        if (
-            self.config.as_dict() != previous_project.config.as_dict()
-            or self.speech_speed != previous_project.speech_speed
-            or len(self.slide_items) != len(previous_project.slide_items)
-        ):
-            self.all_reset()
-            return
+    def sync_project(self, previous_project: Project) -> List[Optional[Item]]:
+        """
+        Match the slides with the slides of the previous run, and move the files of
+        the slides that moved. Which artifacts are built again is decided by the
+        build, from the inputs of each artifact.
+
+        :return: The slide item of the previous run matching each slide, if any.
+        """
+        previous_indexes = self.align(previous_project)
+        self.relink(previous_indexes)
+        return [
+            previous_project.slide_items[j] if j is not None else None
+            for j in previous_indexes
+        ]
 
-        for i in range(len(self.slide_items)):
-            self.slide_items[i].force_reset = previous_project.slide_items[
-                i
-            ].force_reset
-            self.script_items[i].force_reset = previous_project.script_items[
-                i
-            ].force_reset
-            if (
-                self.slide_items[i] == previous_project.slide_items[i]
-                and not previous_project.slide_items[i].force_reset
-            ):
-                self.slide_items[i].cached = True
-            if (
-                self.script_items[i] == previous_project.script_items[i]
-                and not previous_project.script_items[i].force_reset
+    def align(self, previous_project: Project) -> List[Optional[int]]:
+        """
+        Match the slides with the slides of the previous run by content, so that e.g.
+        inserting a slide does not invalidate the slides after it.
+
+        :return: The 0-based number of the previous slide matching each slide, if any.
+        """
+
+        def keys(slide_items: List[Item], script_items: List[Item]):
+            # The slides that were not built match nothing.
+            return [
+                (slide.md5sum, script.md5sum, json.dumps(script.extra, sort_keys=True))
+                if slide and script
+                else None
+                for slide, script in zip(slide_items, script_items)
+            ]
+
+        matcher = difflib.SequenceMatcher(
+            None,
+            keys(previous_project.slide_items, previous_project.script_items),
+            keys(self.slide_items, self.script_items),
+            autojunk=False,
+        )
+        previous_indexes: List[Optional[int]] = [None] * len(self.slide_items)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag in ["equal", "replace"]:
+                # Replaced slides are still compared item by item, e.g. a slide whose
+                # script was edited keeps its image.
+                for k in range(min(i2 - i1, j2 - j1)):
+                    previous_indexes[j1 + k] = i1 + k
+        return previous_indexes
+
+    def slide_files(self, index: int) -> List[str]:
+        """
+        The files built for a slide, by 0-based number.
+        """
+        return [
+            f"{self.output_dir}/slide_{index + 1}.png",
+            f"{self.output_dir}/sub_paragraph_{index + 1}.wav",
+            f"{self.output_dir}/sub_paragraph_{index + 1}.mp4",
+        ]
+
+    def relink(self, previous_indexes: List[Optional[int]]):
+        """
+        Rename the files built for the slides that moved in the deck, along with their
+        artifacts.
+        """
+        moves = {
+            previous: index
+            for index, previous in enumerate(previous_indexes)
+            if previous is not None and previous != index
+        }
+        if not moves:
+            return
+        renamed = {}
+        for previous, index in moves.items():
+            for previous_path, path in zip(
+                self.slide_files(previous), self.slide_files(index)
             ):
-                self.script_items[i].cached = True
+                if exists(previous_path):
+                    renamed[previous_path] = path
+        # Renamed in two steps, since a slide may move to the files of another slide
+        # that moves too.
+        for previous_path in renamed:
+            os.replace(previous_path, f"{previous_path}.relink")
+        for previous_path, path in renamed.items():
+            os.replace(f"{previous_path}.relink", path)
+        self.state.move_artifacts(moves, renamed)
+        print(f"Relinked {len(moves)} slides that moved in the deck.")
+
+    def image_input_key(self, slide_item: Item) -> str:
+        return IMAGE.key(
+            page=slide_item.md5sum,
+            resolution=list(
+                parse_resolution(self.config.get("resolution", DEFAULT_RESOLUTION))
+            ),
+        )
+
+    def changed_pages(self, previous_slides: List[Optional[Item]]) -> List[int]:
+        """
+        The 0-based numbers of the pages whose fingerprint changed since they were
+        last rendered.
+        """
+        pages = []
+        for page_num, item in enumerate(self.slide_items):
+            previous = (
+                previous_slides[page_num] if page_num < len(previous_slides) else None
+            )
+            unchanged = (
+                previous is not None
+                and previous.md5sum == item.md5sum
+                and not previous.force_reset
+                and exists(item.path)
+            ) or self.state.artifact_current(
+                page_num, IMAGE.kind, self.image_input_key(item)
+            )
+            if not unchanged or page_num + 1 in self.config.force_reset:
+                pages.append(page_num)
+        return pages
+
+    def page_fingerprints(self, previous_project: Optional[Project]) -> List[str]:
+        """
+        Fingerprint the pages of the deck, unless the deck file was not modified since
+        the previous run.
+        """
+        resolution = list(
+            parse_resolution(self.config.get("resolution", DEFAULT_RESOLUTION))
+        )
+        stat = file_stat(self.slide)
+        previous = previous_project.slide_fingerprints if previous_project else None
+        if (
+            previous
+            and previous["path"] == self.slide
+            and previous["stat"] == stat
+            and previous["resolution"] == resolution
+        ):
+            fingerprints = previous["fingerprints"]
+        else:
+            fingerprints = SlideEngine().page_fingerprints(self.slide, resolution)
+        self.slide_fingerprints = {
+            "path": self.slide,
+            "stat": stat,
+            "resolution": resolution,
+            "fingerprints": fingerprints,
+        }
+        return fingerprints
 
-    def calculate_items(self):
+    def calculate_items(self, previous_project: Optional[Project] = None):
         slide_engine = SlideEngine()
-        images = slide_engine.slide_to_images(self.slide, self.output_dir)
-        sorted_images = sorted(images)
+        fingerprints = self.page_fingerprints(previous_project)
+        images = slide_engine.image_paths(self.slide, self.output_dir)
+        # The md5sum of a slide item is the fingerprint of its page, so unchanged
+        # pages never need to be rendered or hashed.
         self.slide_items = [
-            Item(path=image, type=ItemType.SLIDE) for image in sorted_images
+            Item(path=image, type=ItemType.SLIDE, md5sum=fingerprint)
+            for image, fingerprint in zip(images, fingerprints)
         ]
+        previous_scripts = previous_project.script_items if previous_project else []
         self.script_items = [
-            Item(path=script.path, type=ItemType.SCRIPT, extra=script.config)
-            for script in ScriptEngine().split_script(
-                self.script,
-                self.output_dir,
-                script_dict=self.config.get("script_dict", None),
+            Item(
+                path=script.path,
+                type=ItemType.SCRIPT,
+                extra=script.config,
+                previous=previous_scripts[i] if i < len(previous_scripts) else None,
+            )
+            for i, script in enumerate(
+                ScriptEngine().split_script(
+                    self.script,
+                    self.output_dir,
+                    script_dict=self.config.get("script_dict", None),
+                )
             )
         ]
 
         assert len(self.slide_items) == len(self.script_items)
 
-    def load_project_file(self, project_file):
-        if exists(project_file):
-            with open(project_file, "r") as f:
-                project_data = yaml.safe_load(f)
-
-                slide = project_data.get("slide")
-                script = project_data.get("script")
-                output_dir = project_data.get("output_dir")
-                config = project_data.get("config")
-                speech_speed = project_data.get("speech_speed")
-                slide_items = []
-                for slide_item in project_data.get("slide_items"):
-                    slide_items.append(Item.from_yaml(slide_item))
-                script_items = []
-                for script_item in project_data.get("script_items"):
-                    script_items.append(Item.from_yaml(script_item))
-
-                config["slide"] = slide
-                config["script"] = script
-                config["output_dir"] = output_dir
-                config["speech_speed"] = speech_speed
-                project_config = ProjectConfig(config)
-
-                project = Project(
-                    name=self.name,
-                    config=project_config,
-                    from_file=True,
-                )
+    def load_previous_project(self) -> Optional[Project]:
+        project_data = self.state.load_project()
+        if project_data is None and self.state.migrate_from_yaml(
+            f"{self.output_dir}/project.yaml"
+        ):
+            project_data = self.state.load_project()
+        if project_data is None:
+            return None
+
+        slide = project_data.get("slide")
+        script = project_data.get("script")
+        output_dir = project_data.get("output_dir")
+        config = project_data["config"]
+        speech_speed = project_data.get("speech_speed")
+        # The items of the slides that were not built are None.
+        slide_items = []
+        for slide_item in project_data["slide_items"]:
+            slide_items.append(Item.from_yaml(slide_item) if slide_item else None)
+        script_items = []
+        for script_item in project_data["script_items"]:
+            script_items.append(Item.from_yaml(script_item) if script_item else None)
+
+        config["slide"] = slide
+        config["script"] = script
+        config["output_dir"] = output_dir
+        config["speech_speed"] = speech_speed
+        project_config = ProjectConfig(config)
+
+        project = Project(
+            name=self.name,
+            config=project_config,
+            from_file=True,
+        )
 
-                project.slide_items = slide_items
-                project.script_items = script_items
+        project.slide_items = slide_items
+        project.script_items = script_items
+        project.slide_fingerprints = project_data.get("slide_fingerprints")
 
-                return project
+        return project
 
-        return None
+    def to_yaml(self, built_only=False):
+        """
+        :param built_only: Leave out the items of the slides that are not cached,
+            i.e. that are still to be built.
+        """
+
+        def items_to_yaml(items: List[Item]):
+            return [
+                item.to_yaml() if not built_only or built else None
+                for item, built in zip(items, self.built_slides())
+            ]
 
-    def to_yaml(self):
         # Create a yaml representation of the project
         return {
             "name": self.name,
@@ -277,16 +659,23 @@ class Project:
             "output_dir": self.output_dir,
             "speech_speed": self.speech_speed,
             "config": self.config.as_dict(),
-            "slide_items": [slide_item.to_yaml() for slide_item in self.slide_items],
-            "script_items": [
-                script_item.to_yaml() for script_item in self.script_items
-            ],
+            "slide_fingerprints": self.slide_fingerprints,
+            "slide_items": items_to_yaml(self.slide_items),
+            "script_items": items_to_yaml(self.script_items),
         }
 
+    def built_slides(self) -> List[bool]:
+        return [
+            slide_item.cached and script_item.cached
+            for slide_item, script_item in zip(self.slide_items, self.script_items)
+        ]
+
     def save(self):
-        project_file = f"{self.output_dir}/project.yaml"
-        with open(project_file, "w") as f:
-            yaml.dump(self.to_yaml(), f, sort_keys=False)
+        self.state.save_project(self.to_yaml())
+
+    def close(self):
+        if self._state:
+            self._state.close()
 
     def get_images(self, filter_cached=False):
         if filter_cached:
@@ -298,44 +687,256 @@ class Project:
             return [item.content for item in self.script_items if not item.cached]
         return [item.content for item in self.script_items]
 
-    def build(self):
-        model = self.config.get("model")
-        assert model
-        tts_engine = create_engine(model, self.config)
-        lock = None
-        if not tts_engine.parallizable():
-            manager = Manager()
-            lock = manager.Lock()
-        futures = []
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            tasks = []
-            for i in range(len(self.slide_items)):
-                task = Task(
-                    id=i + 1,
-                    slide=self.slide_items[i],
-                    script=self.script_items[i],
-                    output_dir=self.output_dir,
-                    tts_engine=tts_engine,
-                    lock=lock,
-                    delay=self.config["delay"],
-                )
-                tasks.append(task)
-                futures.append(executor.submit(task.build))
-
-        for future in futures:
-            future.result()
+    def remove_stale_sentences(self, tasks: List[Task]):
+        if self.config.get("sentence_dir"):
+            # The sentences are shared with another project.
+            return
+        sentence_dir = f"{self.output_dir}/sentences"
+        if not exists(sentence_dir):
+            return
+        used = set(
+            os.path.basename(path) for task in tasks for _, path in task.audio_units()
+        )
+        for file in os.listdir(sentence_dir):
+            if file not in used:
+                os.remove(os.path.join(sentence_dir, file))
+
+    def render_deck(self, tasks: List[Task], video_engine: VideoEngine, output_path):
+        audio_file = f"{self.output_dir}/output.wav"
+        durations = concat_wavs(
+            [(task.audio_file, *task.delays()) for task in tasks], audio_file
+        )
+        video_engine.render_deck(
+            [task.slide.path for task in tasks], durations, audio_file, output_path
+        )
+        os.remove(audio_file)
 
-        cached_script_list = [item.cached for item in self.script_items]
-        cached_slide_list = [item.cached for item in self.slide_items]
+    def assemble(
+        self, video_paths: List[str], video_engine: VideoEngine, output_path, assembly
+    ):
+        index_path = f"{self.output_dir}/output.index.yaml"
+        if assembly == "incremental":
+            try:
+                SegmentAssembler(index_path).assemble(video_paths, output_path)
+                return
+            except IncompatibleSegmentError as e:
+                print(f"Cannot assemble the segments incrementally: {e}")
+        if exists(index_path):
+            os.remove(index_path)
+        video_engine.concatenate_videos(video_paths, output_path)
+
+    def run_pipeline(self, tasks: List[Task], tts_engine: TTSEngine, render_mode):
+        """
+        Rasterize, synthesize and render the slides of `tasks` in a pipeline, so that
+        e.g. the audio of the first slide is synthesized while the next pages are
+        still being rasterized, and videos are encoded during the next syntheses.
+        """
+        cpu_count = os.cpu_count() or 1
+        pages = set(self.pages_to_render)
+        rasterize_workers = min(
+            len(pages), self.config.get("rasterize_workers", cpu_count)
+        )
+        if tts_engine.parallizable():
+            synthesize_workers = self.config.get(
+                "synthesize_workers", tts_engine.max_workers() or min(32, cpu_count + 4)
+            )
+        else:
+            # The engine serializes its calls.
+            synthesize_workers = 1
+        # The waiting scripts are synthesized with a single call to the engine, which
+        # runs up to `synthesize_workers` of them at once.
+        synthesize_batch_size = self.config.get(
+            "synthesize_batch_size", synthesize_workers
+        )
+        render_workers = self.config.get("render_workers", cpu_count)
+
+        renderer = None
+        if pages:
+            renderer = PageRenderer(
+                self.slide,
+                self.config.get("resolution", DEFAULT_RESOLUTION),
+                rasterize_workers,
+            )
 
-        if not all(cached_script_list) or not all(cached_slide_list):
-            video_engine = VideoEngine()
-            video_paths = [
-                f"{self.output_dir}/sub_paragraph_{i+1}.mp4"
-                for i in range(len(self.slide_items))
-            ]
-            final_output = f"{self.output_dir}/output.mp4"
+        def rasterize(task: Task):
+            # There is no renderer when no page needs rendering.
+            if renderer is None or task.id - 1 not in pages:
+                return task
+            seconds = renderer.render(task.id - 1, task.slide.path)
+            self.state.record_artifact(
+                task.id - 1,
+                IMAGE.kind,
+                self.image_input_key(task.slide),
+                task.slide.path,
+                seconds=seconds,
+                metadata={"resolution": renderer.resolution},
+            )
+            return task
+
+        def synthesize(batch: List[Task]):
+            synthesized = [task for task in batch if not task.script.cached]
+            start = time.perf_counter()
+            Task.build_audio_batch(batch, synthesize_workers)
+            seconds = time.perf_counter() - start
+            for task in synthesized:
+                self.state.record_artifact(
+                    task.id - 1,
+                    AUDIO.kind,
+                    task.audio_input_key(),
+                    task.audio_file,
+                    seconds=seconds / len(synthesized),
+                    metadata={
+                        "engine": tts_engine.cache_key(),
+                        "units": len(task.audio_units()),
+                    },
+                )
+            return batch
+
+        def render(task: Task):
+            if task.script.cached and task.slide.cached:
+                return task
+            start = time.perf_counter()
+            task.build_video()
+            self.state.record_artifact(
+                task.id - 1,
+                VIDEO.kind,
+                task.video_input_key(),
+                task.video_file,
+                seconds=time.perf_counter() - start,
+                metadata=task.video_engine.cache_key(),
+            )
+            # The slide is complete: a later run resumes after it.
+            self.state.save_items(
+                task.id - 1,
+                {"slide": task.slide.to_yaml(), "script": task.script.to_yaml()},
+            )
+            return task
+
+        stages = [
+            Stage("rasterize", rasterize, workers=rasterize_workers),
+            Stage(
+                "synthesize",
+                synthesize,
+                batch_size=synthesize_batch_size,
+                batched=True,
+            ),
+        ]
+        # In the single pass mode, the video is rendered at once after all the
+        # audio is ready.
+        if render_mode == "segments":
+            stages.append(Stage("render", render, workers=render_workers))
+        try:
+            Pipeline(stages).run(tasks)
+        finally:
+            if renderer:
+                renderer.close()
+        print(f"Rendered {len(pages)} of {len(tasks)} slides.")
 
-            video_engine.concatenate_videos(video_paths, final_output)
+    def build(self):
+        model = self.config.get("model")
+        assert model
+        tts_engine = self.tts_engine or create_engine(model, self.config)
+        audio_cache = self.audio_cache or AudioCache.from_config(self.config)
+        assembly = self.config.get("assembly", "concat")
+        if assembly not in ASSEMBLY_MODES:
+            raise ValueError(f"Invalid assembly mode: {assembly}")
+        video_engine = VideoEngine(
+            encode_mode=self.config.get("encode_mode", "standard"),
+            framerate=self.config.get("framerate", 30),
+            fragmented=assembly == "incremental",
+            preset=self.config.get("encode_preset", None),
+        )
+        render_mode = self.config.get("render_mode", "segments")
+        if render_mode not in RENDER_MODES:
+            raise ValueError(f"Invalid render mode: {render_mode}")
+        streaming = parse_streaming_formats(self.config.get("streaming", None))
+        if streaming and render_mode != "segments":
+            # Segments are aligned to slides by segmenting each slide video.
+            raise ValueError("Streaming output requires the segments render mode")
+
+        synthesis_unit = self.config.get("synthesis_unit", "sentence")
+        if synthesis_unit not in SYNTHESIS_UNITS:
+            raise ValueError(f"Invalid synthesis unit: {synthesis_unit}")
+        sentence_gap = None
+        if synthesis_unit == "sentence":
+            sentence_gap = self.config.get("sentence_gap", DEFAULT_SENTENCE_GAP)
+
+        tasks = [
+            Task(
+                id=i + 1,
+                slide=self.slide_items[i],
+                script=self.script_items[i],
+                output_dir=self.output_dir,
+                tts_engine=tts_engine,
+                delay=self.config["delay"],
+                audio_cache=audio_cache,
+                video_engine=video_engine,
+                sentence_gap=sentence_gap,
+                sentence_dir=self.config.get("sentence_dir", None),
+            )
+            for i in range(len(self.slide_items))
+        ]
+        # Only the artifacts whose inputs changed are built again, e.g. changing the
+        # delay only renders the videos again.
+        for i, task in enumerate(tasks):
+            task.force_synthesis = i + 1 in self.config.force_reset
+            task.script.cached = (
+                not task.force_synthesis
+                and self.state.artifact_current(i, AUDIO.kind, task.audio_input_key())
+            )
+            # In the single pass mode, the slides have no video of their own.
+            task.slide.cached = task.script.cached and (
+                render_mode == "single_pass"
+                or self.state.artifact_current(i, VIDEO.kind, task.video_input_key())
+            )
+        # Forget the slides that are about to be built, so that they are built
+        # again if the build is interrupted.
+        self.state.save_project(self.to_yaml(built_only=True))
+        try:
+            self.run_pipeline(tasks, tts_engine, render_mode)
+        finally:
+            if tts_engine is not self.tts_engine:
+                tts_engine.close()
+
+        if audio_cache:
+            print(audio_cache.stats())
+        self.remove_stale_sentences(tasks)
+
+        final_output = f"{self.output_dir}/output.mp4"
+        output_key = OUTPUT.key(
+            videos=[task.video_input_key() for task in tasks],
+            render_mode=render_mode,
+            assembly=assembly,
+        )
+        if not all(self.built_slides()) or not self.state.artifact_current(
+            DECK, OUTPUT.kind, output_key
+        ):
+            start = time.perf_counter()
+            if render_mode == "single_pass":
+                self.render_deck(tasks, video_engine, final_output)
+            else:
+                video_paths = [task.video_file for task in tasks]
+                self.assemble(video_paths, video_engine, final_output, assembly)
+            self.state.record_artifact(
+                DECK,
+                OUTPUT.kind,
+                output_key,
+                final_output,
+                seconds=time.perf_counter() - start,
+                metadata={"render_mode": render_mode, "assembly": assembly},
+            )
         else:
             print("All items are cached. No need to build the project.")
+
+        if streaming:
+            StreamPublisher(
+                self.output_dir,
+                video_engine=video_engine,
+                segment_duration=self.config.get(
+                    "segment_duration", DEFAULT_SEGMENT_DURATION
+                ),
+            ).publish(
+                [task.video_file for task in tasks],
+                [task.video_input_key() for task in tasks],
+                streaming,
+            )
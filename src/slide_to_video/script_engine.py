@@ -1,7 +1,14 @@
 from typing import Optional, List, Tuple
-from docx import Document
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from .utils import write_if_changed
+
+
+# Ends of sentences: terminal punctuation, possibly followed by closing quotes or
+# brackets, then whitespace. CJK full stops need no whitespace.
+SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*(?=\s)|[。！？]+")
+# Words ending with a period that do not end a sentence.
+ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "prof."}
 
 
 class ScriptConfig(dict):
@@ -14,6 +21,7 @@ class Script:
     original_text: str
     path: str
     config: Optional[ScriptConfig] = None
+    sentences: List[str] = field(default_factory=list)
 
 
 def extract_text_from_docx(file_path):
@@ -26,6 +34,8 @@ def extract_text_from_docx(file_path):
     Returns:
     str: The extracted text.
     """
+    from docx import Document
+
     doc = Document(file_path)
     full_text = []
     for para in doc.paragraphs:
@@ -70,19 +80,37 @@ class ScriptEngine:
                 output_file = f"{output_path}/sub_paragraph_{len(script_paths)+1}.txt"
                 if script_dict:
                     replaced_text = self.replace_dict(original_text, script_dict)
-                with open(output_file, "w") as f:
-                    f.write(replaced_text)
+                # Unchanged files are not rewritten, so that their stat tells that
+                # they did not change.
+                write_if_changed(output_file, replaced_text)
                 script_paths.append(
                     Script(
                         text=replaced_text,
                         original_text=original_text,
                         path=output_file,
                         config=script_config,
+                        sentences=self.split_sentences(replaced_text),
                     )
                 )
 
         return script_paths
 
+    def split_sentences(self, text: str) -> List[str]:
+        """
+        Split a text into sentences, which are synthesized independently.
+        """
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(text):
+            sentence = text[start : match.end()].strip()
+            if not sentence or sentence.split()[-1].lower() in ABBREVIATIONS:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        if text[start:].strip():
+            sentences.append(text[start:].strip())
+        return sentences
+
     def replace_dict(self, text, replace_dict):
         for original_text, new_text in replace_dict.items():
             # If the orginal text, which is a word, is in the text, replace it with the new text
@@ -0,0 +1,313 @@
+"""
+A long-running render service: an HTTP API that queues render jobs by priority and
+runs them with TTS engines kept loaded across jobs.
+
+- `POST /jobs` with `{"config": {...}, "priority": 0}` queues a job and returns it.
+  The config takes the same keys as the config file of the CLI, and its
+  `output_dir` must be inside the output root of the service. Jobs of higher
+  priority run first.
+- `GET /jobs` returns all the jobs, and `GET /jobs/<id>` a single job, with its
+  status and timings.
+"""
+
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from .lib import is_project_dir, slide_to_video
+from .project import DEFAULT_CONFIG, ProjectConfig
+from .tts_engine import TTSEngine, create_engine, engine_config_key
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+JOB_STATUSES = ["queued", "running", "done", "failed"]
+
+
+class Job(object):
+    def __init__(self, config: ProjectConfig, priority: int = 0):
+        self.id = uuid.uuid4().hex
+        self.config = config
+        self.priority = priority
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_json(self):
+        result = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "output_dir": self.config["output_dir"],
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queued_seconds": (self.started_at or time.time()) - self.created_at,
+            "run_seconds": None,
+        }
+        if self.started_at:
+            result["run_seconds"] = (self.finished_at or time.time()) - self.started_at
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class EnginePool(object):
+    """
+    TTS engines kept loaded across jobs. An engine is used by a single job at a time,
+    and jobs with the same engine config reuse the idle engines.
+
+    :param max_idle: Number of idle engines kept, after which the least recently
+        used ones are closed.
+    """
+
+    def __init__(self, max_idle: int = 2):
+        self.max_idle = max_idle
+        self.idle: "OrderedDict[Tuple[str, int], TTSEngine]" = OrderedDict()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def acquire(self, config: ProjectConfig) -> TTSEngine:
+        key = engine_config_key(config["model"], config)
+        with self.lock:
+            for idle_key in self.idle:
+                if idle_key[0] == key:
+                    return self.idle.pop(idle_key)
+        print(f"Loading the {config['model']} engine")
+        return create_engine(config["model"], config)
+
+    def release(self, config: ProjectConfig, engine: TTSEngine):
+        key = engine_config_key(config["model"], config)
+        closed = []
+        with self.lock:
+            self.idle[(key, next(self.counter))] = engine
+            while len(self.idle) > self.max_idle:
+                closed.append(self.idle.popitem(last=False)[1])
+        for engine in closed:
+            engine.close()
+
+    def close(self):
+        with self.lock:
+            engines = list(self.idle.values())
+            self.idle.clear()
+        for engine in engines:
+            engine.close()
+
+
+class RenderService(object):
+    """
+    Run render jobs on `workers` threads. The CPUs are shared between the jobs
+    running at once, unless their config sets the number of workers of each stage.
+
+    :param output_root: The directory the output directories of the jobs must be in,
+        relative to which they are resolved. Defaults to the working directory.
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: int = 1,
+        max_idle_engines: int = 2,
+        output_root: Optional[str] = None,
+    ):
+        self.workers = max(1, workers)
+        self.output_root = os.path.realpath(output_root or os.getcwd())
+        self.queue: "queue.PriorityQueue[Tuple[int, int, Optional[str]]]" = (
+            queue.PriorityQueue()
+        )
+        self.counter = itertools.count()
+        self.jobs: Dict[str, Job] = {}
+        self.engines = EnginePool(max_idle_engines)
+        # Jobs writing to the same output directory run one after the other.
+        self.output_locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+        self.threads: List[threading.Thread] = []
+
+    def submit(self, config: dict, priority: int = 0) -> Job:
+        """
+        :raises ValueError: If the config is invalid.
+        """
+        if config.get("watch"):
+            raise ValueError("Jobs cannot watch their inputs")
+        project_config = ProjectConfig({**DEFAULT_CONFIG, **config})
+        project_config["output_dir"] = self.resolve_output_dir(
+            project_config["output_dir"]
+        )
+        # Fail early on unknown engines.
+        engine_config_key(project_config["model"], project_config)
+        cpu_share = max(1, (os.cpu_count() or 1) // self.workers)
+        for key in ["rasterize_workers", "render_workers"]:
+            project_config.setdefault(key, cpu_share)
+
+        job = Job(project_config, priority)
+        with self.lock:
+            self.jobs[job.id] = job
+        self.queue.put((-priority, next(self.counter), job.id))
+        return job
+
+    def resolve_output_dir(self, output_dir: str) -> str:
+        """
+        :raises ValueError: If `output_dir` is outside the output root, or is a
+            directory that is not a project, which the build would delete.
+        """
+        path = os.path.realpath(os.path.join(self.output_root, output_dir))
+        if os.path.commonpath([path, self.output_root]) != self.output_root:
+            raise ValueError(f"{output_dir} is outside {self.output_root}")
+        if os.path.isdir(path) and os.listdir(path) and not is_project_dir(path):
+            raise ValueError(f"{output_dir} exists and is not a project directory")
+        return path
+
+    def next_job(self) -> Optional[Job]:
+        """
+        Wait for the queued job of highest priority, or None once the service stops.
+        """
+        _, _, job_id = self.queue.get()
+        if job_id is None:
+            return None
+        with self.lock:
+            return self.jobs[job_id]
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self.work, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        # Stopping comes after all the queued jobs.
+        for _ in self.threads:
+            self.queue.put((sys.maxsize, next(self.counter), None))
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.engines.close()
+
+    def work(self):
+        while True:
+            job = self.next_job()
+            if job is None:
+                return
+            self.run(job)
+
+    def run(self, job: Job):
+        output_dir = os.path.abspath(job.config["output_dir"])
+        with self.lock:
+            output_lock = self.output_locks.setdefault(output_dir, threading.Lock())
+        with output_lock:
+            job.status = "running"
+            job.started_at = time.time()
+            print(f"Running job {job.id} into {job.config['output_dir']}")
+            try:
+                engine = self.engines.acquire(job.config)
+                try:
+                    slide_to_video(project_config=job.config, tts_engine=engine)
+                finally:
+                    self.engines.release(job.config, engine)
+                job.status = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = repr(e)
+                job.status = "failed"
+            job.finished_at = time.time()
+            print(f"Job {job.id} {job.status} in {job.to_json()['run_seconds']:.2f}s")
+
+    def job_list(self) -> List[Job]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+
+class RenderServer(ThreadingHTTPServer):
+    def __init__(self, address: Tuple[str, int], service: RenderService):
+        super().__init__(address, RenderRequestHandler)
+        self.service = service
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @property
+    def service(self) -> RenderService:
+        assert isinstance(self.server, RenderServer)
+        return self.server.service
+
+    def do_GET(self):
+        service = self.service
+        parts = self.path.strip("/").split("/")
+        if parts == ["jobs"]:
+            self.send_json(200, [job.to_json() for job in service.job_list()])
+            return
+        if len(parts) == 2 and parts[0] == "jobs":
+            job = service.get_job(parts[1])
+            if job:
+                self.send_json(200, job.to_json())
+                return
+        self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        service = self.service
+        if self.path.strip("/") != "jobs":
+            self.send_json(404, {"error": "Not found"})
+            return
+        # Browsers send simple cross-site requests with other content types only.
+        if self.headers.get_content_type() != "application/json":
+            self.send_json(415, {"error": "Expected application/json"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            job = service.submit(payload["config"], int(payload.get("priority", 0)))
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        self.send_json(201, job.to_json())
+
+
+def create_server(
+    service: RenderService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> RenderServer:
+    return RenderServer((host, port), service)
+
+
+def serve(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    *,
+    workers: int = 1,
+    max_idle_engines: int = 2,
+    output_root: Optional[str] = None,
+):
+    service = RenderService(
+        workers=workers, max_idle_engines=max_idle_engines, output_root=output_root
+    )
+    server = create_server(service, host, port)
+    service.start()
+    print(f"Serving render jobs on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("Waiting for the queued jobs")
+        service.stop()
@@ -1,34 +1,260 @@
-import fitz  # PyMuPDF
-from .utils import par_execute
+import concurrent.futures
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+
+PDF_REFERENCE = re.compile(rb"(\d+) 0 R")
+# Keys pointing back up the page tree. Following them would pull the whole document
+# into the fingerprint of every page.
+SKIPPED_PDF_KEYS = re.compile(rb"/(Parent|P|StructParent|StructParents) (\d+ 0 R|\d+)")
+
+DEFAULT_RESOLUTION = (1920, 1080)
+
+# The document opened by each rendering process.
+worker_document = None
+
+
+def parse_resolution(resolution: Union[str, List[int], Tuple[int, int]]):
+    """
+    Parse a resolution such as "1920x1080" or [1920, 1080] into a (width, height) tuple.
+    """
+    if isinstance(resolution, str):
+        width, height = resolution.lower().split("x")
+    else:
+        width, height = resolution
+    return int(width), int(height)
+
+
+def open_worker_document(pdf_path):
+    import fitz  # PyMuPDF
+
+    global worker_document
+    worker_document = fitz.open(pdf_path)
+
+
+def render_page(page_num, output_path, resolution, pdf_document=None) -> float:
+    """
+    Render a page of the document, by default the worker's, so that it fits in `resolution`.
+
+    The image dimensions are rounded down to even numbers as required by yuv420p.
+
+    :return: The time spent rendering the page in seconds.
+    """
+    import fitz  # PyMuPDF
+
+    start = time.perf_counter()
+    if pdf_document is None:
+        pdf_document = worker_document
+    assert pdf_document is not None
+    page = pdf_document.load_page(page_num)
+    width, height = resolution
+    zoom = min(width / page.rect.width, height / page.rect.height)
+
+    # Render the page to an image with the specified resolution
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+    if pix.width % 2 or pix.height % 2:
+        even_rect = fitz.IRect(
+            0, 0, pix.width - pix.width % 2, pix.height - pix.height % 2
+        )
+        even_pix = fitz.Pixmap(pix.colorspace, even_rect, pix.alpha)
+        even_pix.copy(pix, even_rect)
+        pix = even_pix
+
+    # Save the image
+    pix.save(output_path)
+    return time.perf_counter() - start
+
+
+class PageRenderer(object):
+    """
+    Render pages of a PDF file on demand, from any thread.
+
+    With more than one worker, pages are rendered by a pool of processes, each with
+    its own handle on the document, since PyMuPDF documents cannot be shared across
+    threads. With a single worker, pages are rendered in this process.
+    """
+
+    def __init__(self, pdf_path, resolution=DEFAULT_RESOLUTION, workers: int = 1):
+        self.resolution = parse_resolution(resolution)
+        self.executor = None
+        self.pdf_document = None
+        self.lock = threading.Lock()
+        if workers > 1:
+            import multiprocessing
+
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=open_worker_document,
+                initargs=(pdf_path,),
+            )
+        else:
+            import fitz  # PyMuPDF
+
+            self.pdf_document = fitz.open(pdf_path)
+
+    def render(self, page_num: int, output_path: str) -> float:
+        if self.executor:
+            return self.executor.submit(
+                render_page, page_num, output_path, self.resolution
+            ).result()
+        with self.lock:
+            return render_page(
+                page_num, output_path, self.resolution, self.pdf_document
+            )
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown()
+        if self.pdf_document:
+            self.pdf_document.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class SlideEngine(object):
-    def slide_to_images(self, slide_path: str, output_path: str):
-        return self.pdf_to_images(slide_path, output_path)
+    def __init__(self):
+        # Rendering time in seconds of each page rendered by the last call to `pdf_to_images`.
+        self.page_timings: Dict[int, float] = {}
 
-    def pdf_to_images(self, pdf_path, output_dir, dpi=300):
-        # Open the PDF file
-        pdf_document = fitz.open(pdf_path)
+    def slide_to_images(
+        self,
+        slide_path: str,
+        output_path: str,
+        pages: Optional[List[int]] = None,
+        resolution=DEFAULT_RESOLUTION,
+    ):
+        return self.pdf_to_images(
+            slide_path, output_path, resolution=resolution, pages=pages
+        )
 
-        pages = list(range(len(pdf_document)))
-        image_paths = [f"{output_dir}/slide_{page_num+1}.png" for page_num in pages]
-        dpis = [dpi] * len(pages)
-        pdf_documents = [pdf_document] * len(pages)
-        par_execute(self.extract_one_page, pdf_documents, pages, image_paths, dpis)
-        # Close the document
-        pdf_document.close()
+    def image_paths(self, pdf_path, output_dir) -> List[str]:
+        """
+        The paths of the images of the pages of a PDF file, rendered or not.
+        """
+        import fitz  # PyMuPDF
+
+        with fitz.open(pdf_path) as pdf_document:
+            page_count = len(pdf_document)
+        return [
+            f"{output_dir}/slide_{page_num + 1}.png" for page_num in range(page_count)
+        ]
+
+    def pdf_to_images(
+        self, pdf_path, output_dir, resolution=DEFAULT_RESOLUTION, pages=None
+    ):
+        """
+        Render the pages of a PDF file to PNG images that fit in `resolution`.
+
+        :param pages: The 0-based page numbers to render. All pages if None.
+        :return: The paths of the images of all pages, rendered or not.
+        """
+        resolution = parse_resolution(resolution)
+        image_paths = self.image_paths(pdf_path, output_dir)
+        if pages is None:
+            pages = list(range(len(image_paths)))
+        self.page_timings = {}
+        if not pages:
+            return image_paths
+
+        start = time.perf_counter()
+        # A single page is not worth starting a process.
+        workers = min(len(pages), os.cpu_count() or 1)
+        with PageRenderer(pdf_path, resolution, workers) as renderer:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    page_num: executor.submit(
+                        renderer.render, page_num, image_paths[page_num]
+                    )
+                    for page_num in pages
+                }
+                for page_num, future in futures.items():
+                    self.page_timings[page_num] = future.result()
+        elapsed = time.perf_counter() - start
+        print(
+            f"Rendered {len(pages)} pages at {resolution[0]}x{resolution[1]} in {elapsed:.2f}s "
+            f"({sum(self.page_timings.values()) / len(pages):.3f}s per page)"
+        )
         return image_paths
 
-    def extract_one_page(self, pdf_document, page_num, output_path, dpi=300):
-        # Get the page
-        page = pdf_document.load_page(page_num)
+    def page_fingerprints(self, pdf_path, resolution=DEFAULT_RESOLUTION) -> List[str]:
+        """
+        Fingerprint each page of a PDF file without rendering it.
+
+        The fingerprint covers the page geometry, the decoded content streams and,
+        recursively, every object referenced by the page resources and annotations,
+        plus the rendering parameters. Objects are hashed by value, so renumbering
+        the objects of an otherwise unchanged page keeps its fingerprint.
+        """
+        import fitz  # PyMuPDF
+
+        resolution = parse_resolution(resolution)
+        pdf_document = fitz.open(pdf_path)
+        memo: Dict[int, str] = {}
+        fingerprints = []
+        for page in pdf_document:
+            hash_md5 = hashlib.md5()
+            hash_md5.update(f"{tuple(page.rect)}:{page.rotation}:{resolution}".encode())
+            hash_md5.update(page.read_contents())
+            for key in ["Resources", "Annots"]:
+                value = self.inherited_key(pdf_document, page.xref, key)
+                hash_md5.update(
+                    self.hash_pdf_value(pdf_document, value.encode(), memo, set())
+                )
+            fingerprints.append(hash_md5.hexdigest())
+        pdf_document.close()
+        return fingerprints
+
+    def inherited_key(self, pdf_document, xref: int, key: str) -> str:
+        # Resources may be inherited from an ancestor in the page tree.
+        while xref:
+            value_type, value = pdf_document.xref_get_key(xref, key)
+            if value_type != "null":
+                return value
+            parent_type, parent = pdf_document.xref_get_key(xref, "Parent")
+            if parent_type != "xref":
+                break
+            xref = int(parent.split()[0])
+        return ""
 
-        zoom = dpi / 72
+    def hash_pdf_value(
+        self, pdf_document, source: bytes, memo: Dict[int, str], visiting: Set[int]
+    ) -> bytes:
+        source = SKIPPED_PDF_KEYS.sub(b"", source)
 
-        mat = fitz.Matrix(zoom, zoom)
+        def replace_reference(match):
+            xref = int(match.group(1))
+            return self.hash_pdf_object(pdf_document, xref, memo, visiting).encode()
 
-        # Render the page to an image with the specified resolution
-        pix = page.get_pixmap(matrix=mat)
+        return hashlib.md5(PDF_REFERENCE.sub(replace_reference, source)).digest()
 
-        # Save the image
-        pix.save(output_path)
+    def hash_pdf_object(
+        self, pdf_document, xref: int, memo: Dict[int, str], visiting: Set[int]
+    ) -> str:
+        if xref in memo:
+            return memo[xref]
+        if xref in visiting or xref >= pdf_document.xref_length():
+            return f"ref:{xref}"
+        visiting.add(xref)
+        hash_md5 = hashlib.md5()
+        hash_md5.update(
+            self.hash_pdf_value(
+                pdf_document,
+                pdf_document.xref_object(xref, compressed=True).encode(),
+                memo,
+                visiting,
+            )
+        )
+        if pdf_document.xref_is_stream(xref):
+            hash_md5.update(pdf_document.xref_stream_raw(xref))
+        visiting.discard(xref)
+        memo[xref] = hash_md5.hexdigest()
+        return memo[xref]
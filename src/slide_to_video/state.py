@@ -0,0 +1,232 @@
+"""
+Persistent state of a project, stored in SQLite next to its artifacts.
+
+Each artifact (image, audio, video) is checkpointed as soon as it is built, in its
+own transaction, so that an interrupted build resumes where it stopped.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# The slide number of the artifacts of the whole deck.
+DECK = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS project (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    type TEXT NOT NULL,
+    slide INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (type, slide)
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    slide INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    input_key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    seconds REAL,
+    metadata TEXT,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (slide, kind)
+);
+"""
+
+
+class ProjectState(object):
+    """
+    :param db_path: The SQLite database, created if needed.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # The connection is shared by the threads of the build pipeline.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def load_project(self) -> Optional[Dict[str, Any]]:
+        """
+        :return: The project as written by `save_project`, or None if never saved.
+            The items of the slides that were not built are None.
+        """
+        with self.lock:
+            rows = self.connection.execute("SELECT key, value FROM project").fetchall()
+            if not rows:
+                return None
+            project = {key: json.loads(value) for key, value in rows}
+            slide_count = project.pop("slide_count")
+            for item_type in ["slide", "script"]:
+                items = [None] * slide_count
+                for slide, data in self.connection.execute(
+                    "SELECT slide, data FROM items WHERE type = ? AND slide < ?",
+                    (item_type, slide_count),
+                ):
+                    items[slide] = json.loads(data)
+                project[f"{item_type}_items"] = items
+        return project
+
+    def save_project(self, project: Dict[str, Any]):
+        """
+        Replace the whole project, in a single transaction. The items that are None
+        are not saved, meaning that their slide is not built.
+        """
+        slide_count = len(project["slide_items"])
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM project")
+            self.connection.execute("DELETE FROM items")
+            for key, value in [*project.items(), ("slide_count", slide_count)]:
+                if key in ["slide_items", "script_items"]:
+                    continue
+                self.connection.execute(
+                    "INSERT INTO project (key, value) VALUES (?, ?)",
+                    (key, json.dumps(value)),
+                )
+            for item_type in ["slide", "script"]:
+                for slide, data in enumerate(project[f"{item_type}_items"]):
+                    if data is None:
+                        continue
+                    self.connection.execute(
+                        "INSERT INTO items (type, slide, data) VALUES (?, ?, ?)",
+                        (item_type, slide, json.dumps(data)),
+                    )
+            # Artifacts of slides that were removed from the deck.
+            self.connection.execute(
+                "DELETE FROM artifacts WHERE slide >= ?", (slide_count,)
+            )
+
+    def save_items(self, slide: int, items: Dict[str, Dict[str, Any]]):
+        """
+        Commit the items of one slide, e.g. once its video is built.
+
+        :param items: The yaml representation of the items, by type.
+        """
+        with self.lock, self.connection:
+            for item_type, data in items.items():
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO items (type, slide, data) VALUES (?, ?, ?)",
+                    (item_type, slide, json.dumps(data)),
+                )
+
+    def record_artifact(
+        self,
+        slide: int,
+        kind: str,
+        input_key: str,
+        path: str,
+        *,
+        seconds: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Checkpoint an artifact built from inputs identified by `input_key`.
+
+        :param slide: The 0-based slide number, or `DECK` for the whole deck.
+        """
+        stat = os.stat(path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO artifacts "
+                "(slide, kind, input_key, path, size, mtime_ns, seconds, metadata, "
+                "completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    slide,
+                    kind,
+                    input_key,
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    seconds,
+                    json.dumps(metadata) if metadata else None,
+                    time.time(),
+                ),
+            )
+
+    def move_artifacts(self, moves: Dict[int, int], renamed: Dict[str, str]):
+        """
+        Move the artifacts of the slides that moved in the deck.
+
+        :param moves: The new 0-based number of each slide that moved.
+        :param renamed: The new path of each file that was renamed.
+        """
+        with self.lock, self.connection:
+            rows = []
+            for slide in moves:
+                rows += self.connection.execute(
+                    "SELECT slide, kind, input_key, path, size, mtime_ns, seconds, "
+                    "metadata, completed_at FROM artifacts WHERE slide = ?",
+                    (slide,),
+                ).fetchall()
+            for slide in {*moves, *moves.values()}:
+                self.connection.execute(
+                    "DELETE FROM artifacts WHERE slide = ?", (slide,)
+                )
+            for slide, kind, input_key, path, *rest in rows:
+                if path not in renamed:
+                    continue
+                self.connection.execute(
+                    "INSERT INTO artifacts "
+                    "(slide, kind, input_key, path, size, mtime_ns, seconds, metadata, "
+                    "completed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (moves[slide], kind, input_key, renamed[path], *rest),
+                )
+
+    def artifact_current(self, slide: int, kind: str, input_key: str) -> bool:
+        """
+        Whether the artifact was built from the same inputs and was not modified since.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT input_key, path, size, mtime_ns FROM artifacts "
+                "WHERE slide = ? AND kind = ?",
+                (slide, kind),
+            ).fetchone()
+        if row is None or row[0] != input_key:
+            return False
+        try:
+            stat = os.stat(row[1])
+        except FileNotFoundError:
+            return False
+        return (stat.st_size, stat.st_mtime_ns) == (row[2], row[3])
+
+    def artifacts(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT slide, kind, input_key, path, size, mtime_ns, seconds, "
+                "metadata, completed_at FROM artifacts ORDER BY slide, kind"
+            )
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for row in rows:
+            row["metadata"] = json.loads(row["metadata"]) if row["metadata"] else None
+        return rows
+
+    def migrate_from_yaml(self, yaml_path: str) -> bool:
+        """
+        Import a project saved by previous versions in `project.yaml`, then remove it.
+
+        :return: Whether a project was imported.
+        """
+        if not os.path.exists(yaml_path):
+            return False
+        import yaml
+
+        with open(yaml_path, "r") as f:
+            project = yaml.safe_load(f)
+        self.save_project(project)
+        os.remove(yaml_path)
+        print(f"Migrated {yaml_path} to {self.db_path}")
+        return True
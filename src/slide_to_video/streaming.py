@@ -0,0 +1,245 @@
+"""
+HLS and DASH output with one group of segments per slide.
+
+Each slide video is segmented on its own into `stream/slide_<id>_<hash>/`, where
+`<hash>` is the input key of the slide video. A slide whose video did not
+change keeps its directory, so only the segments of edited slides are written
+(and need to be uploaded) again, while the top-level playlists are rewritten:
+
+- `output.m3u8` lists the segments of every slide, separated by discontinuities.
+- `output.mpd` has one period per slide.
+"""
+
+import glob
+import math
+import os
+import re
+import shutil
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+from .video_engine import VideoEngine
+
+STREAMING_FORMATS = ["hls", "dash"]
+DEFAULT_SEGMENT_DURATION = 6.0
+HLS_PLAYLIST = "index.m3u8"
+DASH_MANIFEST = "manifest.mpd"
+DASH_NAMESPACE = "urn:mpeg:dash:schema:mpd:2011"
+HLS_MAP_URI = re.compile(r'URI="([^"]*)"')
+
+
+def parse_streaming_formats(formats) -> List[str]:
+    if not formats:
+        return []
+    if isinstance(formats, str):
+        formats = formats.split(",")
+    formats = [f.strip().lower() for f in formats]
+    for f in formats:
+        if f not in STREAMING_FORMATS:
+            raise ValueError(f"Invalid streaming format: {f}")
+    return formats
+
+
+def format_duration(seconds: float) -> str:
+    return f"PT{seconds:.3f}S"
+
+
+class HlsPlaylist(object):
+    def __init__(self, path):
+        self.version = 3
+        self.target_duration = 0
+        # URI of the initialization section of the segments.
+        self.map_uri = None
+        # (duration, uri) of each segment.
+        self.segments = []
+        with open(path, "r") as f:
+            duration = None
+            for line in f:
+                line = line.strip()
+                if line.startswith("#EXT-X-VERSION:"):
+                    self.version = int(line.split(":", 1)[1])
+                elif line.startswith("#EXT-X-TARGETDURATION:"):
+                    self.target_duration = int(line.split(":", 1)[1])
+                elif line.startswith("#EXT-X-MAP:"):
+                    match = HLS_MAP_URI.search(line)
+                    if not match:
+                        raise ValueError(f"Invalid HLS map in {path}: {line}")
+                    self.map_uri = match.group(1)
+                elif line.startswith("#EXTINF:"):
+                    duration = float(line.split(":", 1)[1].split(",")[0])
+                elif line and not line.startswith("#"):
+                    self.segments.append((duration, line))
+
+
+def dash_period_duration(period: ET.Element) -> float:
+    """
+    The duration of a period, from the segment timelines of its representations.
+    Unlike the rounded durations of the manifest, it does not drift once the periods
+    of many slides are chained.
+    """
+    duration = 0.0
+    for template in period.iter(f"{{{DASH_NAMESPACE}}}SegmentTemplate"):
+        timescale = int(template.get("timescale", "1"))
+        end = 0
+        for s in template.iter(f"{{{DASH_NAMESPACE}}}S"):
+            d = s.get("d")
+            if d is None:
+                raise ValueError("DASH segment timeline entry without a duration")
+            start = int(s.get("t", end))
+            end = start + int(d) * (int(s.get("r", "0")) + 1)
+        duration = max(duration, end / timescale)
+    return duration
+
+
+class StreamPublisher(object):
+    """
+    Segment slide videos for HLS and DASH, and write the playlists of the whole deck.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        *,
+        video_engine: Optional[VideoEngine] = None,
+        segment_duration: float = DEFAULT_SEGMENT_DURATION,
+    ):
+        self.output_dir = output_dir
+        self.stream_dir = os.path.join(output_dir, "stream")
+        self.video_engine = video_engine or VideoEngine()
+        self.segment_duration = segment_duration
+
+    def slide_dir(self, slide_id: int, video_key: str) -> str:
+        return os.path.join(self.stream_dir, f"slide_{slide_id}_{video_key[:12]}")
+
+    def publish(
+        self, video_paths: List[str], video_keys: List[str], formats: List[str]
+    ) -> List[str]:
+        """
+        :param video_keys: The input keys of the slide videos, as recorded in the
+            project state, so that the videos are not hashed again.
+        :return: The directories of the slides whose segments were written.
+        """
+        os.makedirs(self.stream_dir, exist_ok=True)
+        slide_dirs = [
+            self.slide_dir(i + 1, video_key) for i, video_key in enumerate(video_keys)
+        ]
+        self.reuse_moved(slide_dirs)
+        written = []
+        for video_path, slide_dir in zip(video_paths, slide_dirs):
+            if self.segment_slide(video_path, slide_dir, formats):
+                written.append(slide_dir)
+        self.remove_stale(slide_dirs)
+
+        if "hls" in formats:
+            self.write_hls_playlist(slide_dirs, f"{self.output_dir}/output.m3u8")
+        if "dash" in formats:
+            self.write_dash_manifest(slide_dirs, f"{self.output_dir}/output.mpd")
+        print(f"Segmented {len(written)} of {len(video_paths)} slides for streaming.")
+        return written
+
+    def segment_slide(self, video_path: str, slide_dir: str, formats: List[str]):
+        missing = []
+        if "hls" in formats and not os.path.exists(f"{slide_dir}/{HLS_PLAYLIST}"):
+            missing.append("hls")
+        if "dash" in formats and not os.path.exists(f"{slide_dir}/{DASH_MANIFEST}"):
+            missing.append("dash")
+        if not missing:
+            return False
+
+        os.makedirs(slide_dir, exist_ok=True)
+        if "hls" in missing:
+            self.video_engine.segment_hls(
+                video_path, f"{slide_dir}/{HLS_PLAYLIST}", self.segment_duration
+            )
+        if "dash" in missing:
+            self.video_engine.segment_dash(
+                video_path, f"{slide_dir}/{DASH_MANIFEST}", self.segment_duration
+            )
+        return True
+
+    def reuse_moved(self, slide_dirs: List[str]):
+        """
+        Rename the segments of the slides that moved in the deck, which are named
+        after the previous number of the slide and the same video.
+        """
+        current = set(os.path.abspath(path) for path in slide_dirs)
+        unused: Dict[str, List[str]] = {}
+        for path in glob.glob(f"{self.stream_dir}/slide_*"):
+            if os.path.abspath(path) not in current:
+                unused.setdefault(path.rsplit("_", 1)[1], []).append(path)
+        for slide_dir in slide_dirs:
+            candidates = unused.get(slide_dir.rsplit("_", 1)[1])
+            if candidates and not os.path.exists(slide_dir):
+                os.rename(candidates.pop(), slide_dir)
+
+    def remove_stale(self, slide_dirs: List[str]):
+        current = set(os.path.abspath(path) for path in slide_dirs)
+        for path in glob.glob(f"{self.stream_dir}/slide_*"):
+            if os.path.abspath(path) not in current:
+                shutil.rmtree(path)
+
+    def write_hls_playlist(self, slide_dirs: List[str], output_path: str):
+        playlists = [HlsPlaylist(f"{path}/{HLS_PLAYLIST}") for path in slide_dirs]
+        target_duration = max(
+            [p.target_duration for p in playlists]
+            + [math.ceil(d) for p in playlists for d, _ in p.segments]
+        )
+        lines = [
+            "#EXTM3U",
+            f"#EXT-X-VERSION:{max(p.version for p in playlists)}",
+            f"#EXT-X-TARGETDURATION:{target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+        ]
+        for i, (slide_dir, playlist) in enumerate(zip(slide_dirs, playlists)):
+            # Timestamps start over in each slide.
+            if i > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            prefix = os.path.relpath(slide_dir, os.path.dirname(output_path))
+            if playlist.map_uri:
+                lines.append(f'#EXT-X-MAP:URI="{prefix}/{playlist.map_uri}"')
+            for duration, uri in playlist.segments:
+                lines.append(f"#EXTINF:{duration:.6f},")
+                lines.append(f"{prefix}/{uri}")
+        lines.append("#EXT-X-ENDLIST")
+        self.write_atomic(output_path, "\n".join(lines) + "\n")
+
+    def write_dash_manifest(self, slide_dirs: List[str], output_path: str):
+        ET.register_namespace("", DASH_NAMESPACE)
+        mpd: Optional[ET.Element] = None
+        start = 0.0
+        for i, slide_dir in enumerate(slide_dirs):
+            root = ET.parse(f"{slide_dir}/{DASH_MANIFEST}").getroot()
+            periods = root.findall(f"{{{DASH_NAMESPACE}}}Period")
+            if mpd is None:
+                mpd = root
+                for period in periods:
+                    mpd.remove(period)
+            prefix = os.path.relpath(slide_dir, os.path.dirname(output_path))
+            for period in periods:
+                duration = dash_period_duration(period)
+                period.set("id", f"slide_{i + 1}")
+                period.set("start", format_duration(start))
+                period.set("duration", format_duration(duration))
+                # The segment templates are relative to the directory of the slide.
+                base_url = ET.Element(f"{{{DASH_NAMESPACE}}}BaseURL")
+                base_url.text = f"{prefix}/"
+                base_url.tail = period.text
+                period.insert(0, base_url)
+                period.tail = "\n\t"
+                mpd.append(period)
+                start += duration
+        if mpd is None:
+            raise ValueError("No slide to write in the DASH manifest")
+        mpd[-1].tail = "\n"
+        mpd.set("mediaPresentationDuration", format_duration(start))
+        self.write_atomic(
+            output_path,
+            ET.tostring(mpd, encoding="unicode", xml_declaration=True) + "\n",
+        )
+
+    @staticmethod
+    def write_atomic(path: str, content: str):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, path)
@@ -1,12 +1,31 @@
-from .registery import create_engine, get_all_engine_names
+from .registery import (
+    create_engine,
+    engine_config_key,
+    get_all_engine_names,
+    get_engine_class,
+)
 from .base_engine import TTSEngine
-from .playht import PlayHTEngine
-from .local import LocalTTSEngine
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .local import LocalTTSEngine
+    from .playht import PlayHTEngine
 
 __all__ = [
     "TTSEngine",
     "create_engine",
+    "engine_config_key",
+    "get_engine_class",
     "PlayHTEngine",
     "LocalTTSEngine",
     "get_all_engine_names",
 ]
+
+
+def __getattr__(name):
+    # The engines are imported on first use, along with their dependencies.
+    if name == "PlayHTEngine":
+        return get_engine_class("playht")
+    if name == "LocalTTSEngine":
+        return get_engine_class("local")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,17 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 import concurrent.futures
 
 
 class TTSEngine(ABC):
+    # Name under which the engine is registered.
+    name = ""
+    # Bump when the underlying model changes so that cached audio is not reused.
+    version = "1"
+    # The config keys read by the engine, so that engines created from configs that
+    # agree on them are interchangeable. None if the engine may read any key.
+    config_keys: Optional[List[str]] = None
+
     def __init__(self, *, speech_speed=1.0, language="en", **kwargs):
         self.speed = speech_speed
         self.language = language
@@ -16,21 +24,74 @@ class TTSEngine(ABC):
     def parallizable(self) -> bool:
         pass
 
-    def par_synthesize(
+    def max_workers(self) -> Optional[int]:
+        """
+        The number of texts worth synthesizing concurrently, if the engine has a limit.
+        """
+        return None
+
+    def close(self):
+        """
+        Release the resources of the engine, e.g. its worker processes.
+        """
+        pass
+
+    @abstractmethod
+    def voice_fingerprint(self) -> str:
+        """
+        Identify the voice used by the engine, e.g. a hash of the voice sample or a voice ID.
+        """
+        pass
+
+    def cache_key(self) -> dict:
+        """
+        Parameters that, together with the text, determine the synthesized audio.
+        """
+        return {
+            "engine": self.name,
+            "version": self.version,
+            "voice": self.voice_fingerprint(),
+            "language": self.language,
+            "speed": self.speed,
+        }
+
+    def synthesize_batch(
         self,
         texts: List[str],
         output_paths: List[str],
         *,
         format: str = "wav",
+        max_workers: Optional[int] = None,
     ):
-        if self.parallizable():
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = []
-                for text, output_path in zip(texts, output_paths):
-                    future = executor.submit(self.synthesize, text, output_path)
-                    futures.append(future)
-
-                    concurrent.futures.wait(futures)
-        else:
+        """
+        Synthesize several texts. Engines can override it to amortize the cost of each
+        call, e.g. by submitting all the texts at once.
+
+        By default, texts are synthesized by at most `max_workers` threads if the engine
+        is parallelizable, and one after the other otherwise.
+        """
+        if not self.parallizable():
             for text, output_path in zip(texts, output_paths):
-                self.synthesize(text, output_path)
+                self.synthesize(text, output_path, format)
+            return
+
+        max_workers = max_workers or self.max_workers() or min(32, len(texts))
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, max_workers)
+        ) as executor:
+            futures = [
+                executor.submit(self.synthesize, text, output_path, format)
+                for text, output_path in zip(texts, output_paths)
+            ]
+            concurrent.futures.wait(futures)
+        for future in futures:
+            future.result()
+
+    def par_synthesize(
+        self,
+        texts: List[str],
+        output_paths: List[str],
+        *,
+        format: str = "wav",
+    ):
+        self.synthesize_batch(texts, output_paths, format=format)
@@ -1,8 +1,210 @@
+import concurrent.futures
+import multiprocessing
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
 from .base_engine import TTSEngine
 from .registery import register_engine
+from ..audio_cache import default_cache_dir
+from ..utils import md5sum_of_file, md5sum_of_json
+
+XTTS_MODEL = "tts_models/multilingual/multi-dataset/xtts_v2"
+# Samples of silence between two sentences, as added by `TTS.tts_to_file`.
+SENTENCE_GAP = 10000
+
+# The model loaded by each worker process.
+worker_tts = None
+# Speaker conditioning of each voice sample, by path of its cache file.
+conditioning_memo: Dict[str, Tuple] = {}
+conditioning_lock = threading.Lock()
+
+
+def load_tts():
+    import torch
+    from TTS.api import TTS
+
+    # Get device
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # List available 🐸TTS models
+    # print(TTS().list_models())
+
+    # Init TTS
+    return TTS(XTTS_MODEL).to(device)
+
+
+def conditioning_settings(model) -> dict:
+    """
+    The arguments of `get_conditioning_latents` besides the audio, taken from the
+    config of the model as `Xtts.synthesize` and `Xtts.full_inference` do in TTS
+    0.22.0 when `tts_to_file` is given a `speaker_wav`.
+    """
+    return {
+        "gpt_cond_len": model.config.gpt_cond_len,
+        "gpt_cond_chunk_len": model.config.gpt_cond_chunk_len,
+        "max_ref_length": model.config.max_ref_len,
+        "sound_norm_refs": model.config.sound_norm_refs,
+    }
+
+
+def get_conditioning(tts, voice_sample_path: str, cache_path: str):
+    """
+    The GPT conditioning latents and speaker embedding of a voice sample, computed
+    once and then kept in memory and in a file named after `cache_path` and the
+    conditioning settings.
+    """
+    model = tts.synthesizer.tts_model
+    settings = conditioning_settings(model)
+    cache_path = conditioning_cache_path(cache_path, settings)
+    with conditioning_lock:
+        if cache_path in conditioning_memo:
+            return conditioning_memo[cache_path]
+
+        if os.path.exists(cache_path):
+            import torch
+
+            data = torch.load(cache_path, map_location=model.device)
+            conditioning = (data["gpt_cond_latent"], data["speaker_embedding"])
+        else:
+            print(f"Computing the speaker conditioning of {voice_sample_path}")
+            conditioning = model.get_conditioning_latents(
+                audio_path=[voice_sample_path], **settings
+            )
+            save_conditioning(conditioning, cache_path)
+        conditioning_memo[cache_path] = conditioning
+        return conditioning
+
+
+def conditioning_cache_path(cache_path: str, settings: dict) -> str:
+    """
+    The file the conditioning computed with `settings` is cached in: `cache_path`
+    with the hash of the settings before its extension.
+    """
+    return f"{os.path.splitext(cache_path)[0]}.{md5sum_of_json(settings)[:8]}.pth"
+
+
+def save_conditioning(conditioning: Tuple, cache_path: str):
+    import torch
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Written atomically, since several worker processes may compute it.
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(cache_path), suffix=".pth", delete=False
+    ) as temp_file:
+        try:
+            torch.save(
+                {
+                    "gpt_cond_latent": conditioning[0].cpu(),
+                    "speaker_embedding": conditioning[1].cpu(),
+                },
+                temp_file,
+            )
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+    os.replace(temp_file.name, cache_path)
+
+
+def synthesize_with_tts(
+    tts,
+    text: str,
+    language: str,
+    voice_sample_path: str,
+    conditioning_path: str,
+    output_path: str,
+):
+    """
+    Synthesize `text` like `TTS.tts_to_file`, but with the cached speaker conditioning
+    instead of encoding the voice sample again.
+    """
+    gpt_cond_latent, speaker_embedding = get_conditioning(
+        tts, voice_sample_path, conditioning_path
+    )
+    model = tts.synthesizer.tts_model
+    # The sampling settings `Xtts.synthesize` takes from the config in TTS 0.22.0.
+    settings = {
+        "temperature": model.config.temperature,
+        "length_penalty": model.config.length_penalty,
+        "repetition_penalty": model.config.repetition_penalty,
+        "top_k": model.config.top_k,
+        "top_p": model.config.top_p,
+    }
+    wav = []
+    for sentence in tts.synthesizer.split_into_sentences(text):
+        outputs = model.inference(
+            sentence, language, gpt_cond_latent, speaker_embedding, **settings
+        )
+        wav += list(outputs["wav"])
+        wav += [0] * SENTENCE_GAP
+    tts.synthesizer.save_wav(wav=wav, path=output_path)
+
+
+def init_tts_worker(worker_counter, workers: int):
+    """
+    Pin the worker process to its own slice of the CPUs, then load the model once.
+    """
+    global worker_tts
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+
+    import torch
+
+    if hasattr(os, "sched_setaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+        per_worker = max(1, len(cpus) // workers)
+        start = (worker_index * per_worker) % len(cpus)
+        cpus = cpus[start : start + per_worker]
+        os.sched_setaffinity(0, cpus)
+        torch.set_num_threads(len(cpus))
+    else:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+    worker_tts = load_tts()
+
+
+def synthesize_in_worker(
+    text: str,
+    language: str,
+    voice_sample_path: str,
+    conditioning_path: str,
+    output_path: str,
+):
+    # Loaded by `init_tts_worker` when the process started.
+    assert worker_tts is not None
+    synthesize_with_tts(
+        worker_tts,
+        text,
+        language,
+        voice_sample_path,
+        conditioning_path,
+        output_path,
+    )
 
 
 class LocalTTSEngine(TTSEngine):
+    """
+    XTTS v2 running locally.
+
+    With `tts_workers` greater than 1, texts are synthesized by a pool of processes,
+    each loading the model once and using its own slice of the CPUs.
+
+    The speaker conditioning of the voice sample is computed once and stored in
+    `speaker_cache_dir`, keyed by the hash of the sample and the conditioning
+    settings of the model, so later runs only run inference.
+    """
+
+    name = "local"
+    version = "xtts_v2"
+    config_keys = [
+        "speech_speed",
+        "language",
+        "voice",
+        "tts_workers",
+        "speaker_cache_dir",
+    ]
+
     def __init__(self, config: dict):
         super().__init__(**config)
         must_have_keys = ["voice"]
@@ -11,36 +213,119 @@ class LocalTTSEngine(TTSEngine):
                 raise ValueError(f"Missing required key: {key}")
         self.tts = None
         self.voice_sample_path = config["voice"]
+        self.voice_sample_md5sum = None
+        self.workers = max(1, int(config.get("tts_workers", 1)))
+        self.speaker_cache_dir = config.get("speaker_cache_dir") or default_cache_dir(
+            "speakers"
+        )
+        self.pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.pool_lock = threading.Lock()
 
     def synthesize(self, text: str, output_path: str, format: str = "wav"):
         print(f"Generating audio file for text: {text} at speed {self.speed}")
-        self.get_tts().tts_to_file(
-            text=text.strip(),
-            speaker_wav=self.voice_sample_path,
-            language=self.language,
-            file_path=output_path,
-        )
+        if self.workers > 1:
+            self.get_pool().submit(
+                synthesize_in_worker,
+                text.strip(),
+                self.language,
+                self.voice_sample_path,
+                self.conditioning_path(),
+                output_path,
+            ).result()
+        else:
+            synthesize_with_tts(
+                self.get_tts(),
+                text.strip(),
+                self.language,
+                self.voice_sample_path,
+                self.conditioning_path(),
+                output_path,
+            )
         print(f"Audio file generated and saved as {output_path}")
 
+    def synthesize_batch(
+        self,
+        texts: List[str],
+        output_paths: List[str],
+        *,
+        format: str = "wav",
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Synthesize several texts with the model and speaker conditioning loaded once,
+        spreading them over all the worker processes.
+        """
+        if self.workers == 1:
+            tts = self.get_tts()
+            conditioning_path = self.conditioning_path()
+            for text, output_path in zip(texts, output_paths):
+                print(f"Generating audio file for text: {text} at speed {self.speed}")
+                synthesize_with_tts(
+                    tts,
+                    text.strip(),
+                    self.language,
+                    self.voice_sample_path,
+                    conditioning_path,
+                    output_path,
+                )
+            return
+
+        pool = self.get_pool()
+        futures = [
+            pool.submit(
+                synthesize_in_worker,
+                text.strip(),
+                self.language,
+                self.voice_sample_path,
+                self.conditioning_path(),
+                output_path,
+            )
+            for text, output_path in zip(texts, output_paths)
+        ]
+        concurrent.futures.wait(futures)
+        for future in futures:
+            future.result()
+        print(f"Generated {len(futures)} audio files with {self.workers} workers")
+
     def parallizable(self):
-        return False
+        return self.workers > 1
+
+    def max_workers(self) -> Optional[int]:
+        return self.workers
+
+    def voice_fingerprint(self):
+        if not self.voice_sample_md5sum:
+            self.voice_sample_md5sum = md5sum_of_file(self.voice_sample_path)
+        return self.voice_sample_md5sum
+
+    def conditioning_path(self) -> str:
+        return os.path.join(
+            self.speaker_cache_dir, f"{self.voice_fingerprint()}.{self.version}.pth"
+        )
 
     def get_tts(self):
         if self.tts:
             return self.tts
-        import torch
-        from TTS.api import TTS
-
-        # Get device
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.tts = load_tts()
+        return self.tts
 
-        # List available 🐸TTS models
-        # print(TTS().list_models())
+    def get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self.pool_lock:
+            if self.pool is None:
+                context = multiprocessing.get_context("spawn")
+                self.pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=init_tts_worker,
+                    initargs=(context.Value("i", 0), self.workers),
+                )
+            return self.pool
 
-        # Init TTS
-        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-        self.tts = tts
-        return tts
+    def close(self):
+        with self.pool_lock:
+            if self.pool:
+                self.pool.shutdown()
+                self.pool = None
 
 
 register_engine("local", LocalTTSEngine)
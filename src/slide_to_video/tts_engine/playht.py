@@ -1,11 +1,89 @@
+import asyncio
+import concurrent.futures
+import email.utils
+import os
+import tempfile
 import time
+from typing import List, Optional
 import requests
+from requests.adapters import HTTPAdapter
 from .base_engine import TTSEngine
 from .registery import register_engine
 
+DEFAULT_BASE_URL = "https://api.play.ht/api/v2"
+# Statuses after which a request is sent again.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PlayHTError(Exception):
+    pass
+
+
+class PlayHTPermanentError(PlayHTError):
+    """
+    An error that submitting the job again would not fix, or that could create a
+    duplicate job.
+    """
+
+    pass
+
+
+def status_error(response: requests.Response, message: str) -> PlayHTError:
+    """
+    The error for an unexpected status. Client errors other than rate limiting are
+    permanent.
+    """
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        return PlayHTPermanentError(message)
+    return PlayHTError(message)
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """
+    The delay in seconds requested by the Retry-After header of a response, if any.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
 
 class PlayHTEngine(TTSEngine):
-    # TODO: Check whether the audio is correctly genereated.
+    """
+    Play.ht API client.
+
+    Jobs run concurrently on an asyncio event loop, at most `playht_max_in_flight` at
+    a time, and share a pool of HTTP connections. Jobs are polled with an increasing
+    interval. Rate-limited and failed requests are retried, after the delay requested
+    by the server if any, and failed jobs are submitted again.
+    """
+
+    name = "playht"
+    version = "PlayHT2.0"
+    config_keys = [
+        "speech_speed",
+        "language",
+        "PLAY_HT_USER_ID",
+        "PLAY_HT_API_KEY",
+        "voice",
+        "playht_base_url",
+        "playht_max_in_flight",
+        "playht_retries",
+        "playht_job_timeout",
+        "playht_request_timeout",
+        "playht_poll_interval",
+        "playht_max_poll_interval",
+        "playht_backoff",
+    ]
+
     def __init__(self, config: dict):
         super().__init__(**config)
         must_have_keys = ["PLAY_HT_USER_ID", "PLAY_HT_API_KEY", "voice"]
@@ -15,94 +93,220 @@ class PlayHTEngine(TTSEngine):
         self.user_id = config.get("PLAY_HT_USER_ID")
         self.api_key = config.get("PLAY_HT_API_KEY")
         self.voice = config.get("voice")
+        self.base_url = config.get("playht_base_url", DEFAULT_BASE_URL).rstrip("/")
+        self.max_in_flight = int(config.get("playht_max_in_flight", 8))
+        # Attempts after the first one, for each request and for each job.
+        self.retries = int(config.get("playht_retries", 3))
+        # Seconds before giving up on a job.
+        self.job_timeout = float(config.get("playht_job_timeout", 300))
+        self.request_timeout = float(config.get("playht_request_timeout", 30))
+        self.poll_interval = float(config.get("playht_poll_interval", 0.5))
+        self.max_poll_interval = float(config.get("playht_max_poll_interval", 5))
+        self.backoff = float(config.get("playht_backoff", 1))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def parallizable(self):
         return True
 
-    def generate_audio_job(self, text, voice, headers):
+    def max_workers(self) -> Optional[int]:
+        return self.max_in_flight
+
+    def voice_fingerprint(self) -> str:
+        return self.voice or ""
+
+    def close(self):
+        self.session.close()
+
+    def headers(self):
+        return {
+            "accept": "application/json",
+            "content-type": "application/json",
+            "AUTHORIZATION": self.api_key,
+            "X-USER-ID": self.user_id,
+        }
+
+    def synthesize(self, text: str, output_path: str, format: str = "wav"):
+        self.synthesize_batch([text], [output_path], format=format)
+
+    def synthesize_batch(
+        self,
+        texts: List[str],
+        output_paths: List[str],
+        *,
+        format: str = "wav",
+        max_workers: Optional[int] = None,
+    ):
+        asyncio.run(
+            self.synthesize_all(texts, output_paths, max_workers or self.max_in_flight)
+        )
+
+    async def synthesize_all(
+        self, texts: List[str], output_paths: List[str], max_in_flight: int
+    ):
+        """
+        Run a job for each text, at most `max_in_flight` at a time. All the jobs are
+        run to completion before the first error, if any, is raised.
+        """
+        semaphore = asyncio.Semaphore(max_in_flight)
+        # The blocking HTTP calls run in these threads.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight
+        ) as executor:
+            results = await asyncio.gather(
+                *[
+                    self.run_job(text, output_path, semaphore, executor)
+                    for text, output_path in zip(texts, output_paths)
+                ],
+                return_exceptions=True,
+            )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def run_job(self, text, output_path, semaphore, executor):
+        async with semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    print(f"Generating audio job for text: {text}")
+                    poll_url = await self.create_job(text, executor)
+                    output_url = await self.wait_for_job(poll_url, executor)
+                    await self.download(output_url, output_path, executor)
+                    return
+                except PlayHTPermanentError:
+                    raise
+                except (PlayHTError, requests.RequestException) as e:
+                    if attempt == self.retries:
+                        raise
+                    delay = self.backoff * 2**attempt
+                    print(f"Audio job failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def request(
+        self, executor, method: str, url: str, **kwargs
+    ) -> requests.Response:
         """
-        Send a POST request to generate an audio job with the provided text and voice.
+        Send a request, again on connection errors, timeouts and retryable statuses.
+        A POST is only sent again if the connection could not be opened, since the
+        server may have received it otherwise.
+
+        :return: The response of the last attempt, which may have a retryable status.
+        :raises PlayHTPermanentError: If a POST failed after it may have been sent.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await loop.run_in_executor(
+                    executor,
+                    lambda: self.session.request(
+                        method, url, timeout=self.request_timeout, **kwargs
+                    ),
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if method == "POST" and not isinstance(e, requests.ConnectTimeout):
+                    raise PlayHTPermanentError(
+                        f"{method} {url} failed and may have been received: {e}"
+                    ) from e
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2**attempt)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            delay = retry_after(response)
+            if delay is None:
+                delay = self.backoff * 2**attempt
+            print(f"Play.ht returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            await asyncio.sleep(delay)
+        # Every attempt either returns or raises.
+        raise AssertionError("unreachable")
+
+    async def create_job(self, text: str, executor) -> str:
+        """
+        Create a job generating the audio of `text`.
 
-        :param text: The text to be converted to speech.
-        :param voice: The voice to use for the speech.
-        :param headers: The headers to use for the request.
         :return: The URL to poll for the status of the job.
         """
-        url = "https://api.play.ht/api/v2/tts"
         payload = {
             "text": text,
-            "voice": voice,
-            "voice_engine": "PlayHT2.0",
+            "voice": self.voice,
+            "voice_engine": self.version,
             "quality": "medium",
             "sample_rate": 44100,
             "output_format": "wav",
             "speed": self.speed,
         }
-
-        response = requests.post(url, json=payload, headers=headers)
+        response = await self.request(
+            executor,
+            "POST",
+            f"{self.base_url}/tts",
+            json=payload,
+            headers=self.headers(),
+        )
         if response.status_code != 201:
-            print(response)
-            raise Exception("Failed to generate audio job.")
-        data = response.json()
-        poll_url = data["_links"][0]["href"]
-        return poll_url
+            raise status_error(
+                response,
+                f"Failed to generate audio job: {response.status_code} {response.text}",
+            )
+        return response.json()["_links"][0]["href"]
 
-    def poll_status_and_get_url(self, poll_url, headers, polling_interval=0.5):
+    async def wait_for_job(self, poll_url: str, executor) -> str:
         """
-        Poll the given URL until the status becomes 'complete' and then fetch the URL from the response.
+        Poll a job, less and less often, until it is complete.
 
-        :param poll_url: The URL to poll for the status.
-        :param headers: The headers to use for the request.
-        :param polling_interval: The interval in seconds between each poll request.
-        :return: The URL from the response when the status is 'complete'.
+        :return: The URL of the generated audio.
         """
+        interval = self.poll_interval
+        deadline = time.monotonic() + self.job_timeout
         while True:
-            response = requests.get(poll_url, headers=headers)
+            response = await self.request(
+                executor, "GET", poll_url, headers=self.headers()
+            )
+            if response.status_code != 200:
+                raise status_error(
+                    response, f"Failed to poll audio job: {response.status_code}"
+                )
             data = response.json()
-
             status = data.get("status")
             if status == "complete":
-                output_url = data["output"]["url"]
-                return output_url
+                return data["output"]["url"]
             elif status == "failed":
-                raise Exception("The job failed.")
+                raise PlayHTError("The job failed.")
 
-            # Wait before polling again
-            time.sleep(polling_interval)
+            if time.monotonic() + interval > deadline:
+                raise PlayHTError(f"The job timed out after {self.job_timeout}s.")
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, self.max_poll_interval)
 
-    def download_file(self, url, local_filename):
-        """
-        Download a file from a URL to a local file.
+    async def download(self, url: str, output_path: str, executor):
+        # The audio may be on another host, so the credentials are not sent.
+        response = await self.request(executor, "GET", url, stream=True)
+        if response.status_code != 200:
+            raise status_error(
+                response, f"Failed to download audio: {response.status_code}"
+            )
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self.write_response, response, output_path)
+        print(f"File downloaded successfully and saved as {output_path}")
 
-        :param url: The URL of the file to download.
-        :param local_filename: The local file path to save the downloaded file.
-        """
-        with requests.get(url, stream=True) as r:
-            r.raise_for_status()
-            with open(local_filename, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        print(f"File downloaded successfully and saved as {local_filename}")
-
-    def playht_tts(self, text, output_path):
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "AUTHORIZATION": self.api_key,
-            "X-USER-ID": self.user_id,
-        }
-        print(f"Generating audio job for text: {text}")
-        poll_url = self.generate_audio_job(text, self.voice, headers)
-
-        # Poll the status and get the final URL
-        final_url = self.poll_status_and_get_url(poll_url, headers)
-
-        # Download the file
-        local_filename = output_path
-        self.download_file(final_url, local_filename)
-
-    def synthesize(self, text: str, output_path: str, format: str = "wav"):
-        self.playht_tts(text, output_path)
+    @staticmethod
+    def write_response(response: requests.Response, output_path: str):
+        # Written to a temporary file first, so that a failed download leaves no
+        # partial file behind.
+        with response, tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(output_path)), delete=False
+        ) as temp_file:
+            try:
+                for chunk in response.iter_content(chunk_size=8192):
+                    temp_file.write(chunk)
+            except BaseException:
+                temp_file.close()
+                os.remove(temp_file.name)
+                raise
+        os.replace(temp_file.name, output_path)
 
 
 register_engine("playht", PlayHTEngine)
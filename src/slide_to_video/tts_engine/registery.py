@@ -1,7 +1,31 @@
-from typing import Type
+import importlib
+import json
+import sys
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Type, Union, cast
 from .base_engine import TTSEngine
 
-__all_engine_classes_dict__ = {}
+if TYPE_CHECKING:
+    from importlib.metadata import EntryPoint
+
+# The engines of this package, as "module:class". They are only imported when used,
+# so that e.g. listing the engine names does not import their dependencies.
+BUILTIN_ENGINES = {
+    "local": "slide_to_video.tts_engine.local:LocalTTSEngine",
+    "playht": "slide_to_video.tts_engine.playht:PlayHTEngine",
+}
+# The entry point group under which other packages declare their engines, e.g. in
+# their pyproject.toml:
+#
+#     [project.entry-points."slide_to_video.tts_engines"]
+#     my_engine = "my_package.engine:MyEngine"
+ENTRY_POINT_GROUP = "slide_to_video.tts_engines"
+
+# Engines are created from the project config.
+EngineFactory = Callable[[dict], TTSEngine]
+
+__all_engine_classes_dict__: Dict[str, Type[TTSEngine]] = {}
+# The engines that are not imported yet, as "module:class" or entry points.
+__lazy_engines_dict__: Optional[Dict[str, Union[str, "EntryPoint"]]] = None
 
 
 def register_engine(engine_name: str, engine_class: Type[TTSEngine]):
@@ -9,14 +33,68 @@ def register_engine(engine_name: str, engine_class: Type[TTSEngine]):
     __all_engine_classes_dict__[engine_name] = engine_class
 
 
+def lazy_engines() -> Dict[str, Union[str, "EntryPoint"]]:
+    global __lazy_engines_dict__
+    if __lazy_engines_dict__ is None:
+        engines: Dict[str, Union[str, "EntryPoint"]] = dict(BUILTIN_ENGINES)
+        from importlib.metadata import entry_points
+
+        if sys.version_info >= (3, 10):
+            group = entry_points(group=ENTRY_POINT_GROUP)
+        else:
+            group = entry_points().get(ENTRY_POINT_GROUP, [])
+        for entry_point in group:
+            engines.setdefault(entry_point.name, entry_point)
+        __lazy_engines_dict__ = engines
+    return __lazy_engines_dict__
+
+
 def get_all_engine_names():
     global __all_engine_classes_dict__
-    return list(__all_engine_classes_dict__.keys())
+    names = list(__all_engine_classes_dict__.keys())
+    return names + [name for name in lazy_engines() if name not in names]
 
 
-def create_engine(engine_name: str, config: dict) -> TTSEngine:
+def get_engine_class(engine_name: str) -> Type[TTSEngine]:
+    """
+    The class of an engine, imported on first use.
+
+    :raises ValueError: If no engine has this name.
+    """
     global __all_engine_classes_dict__
     engine_class = __all_engine_classes_dict__.get(engine_name)
-    if engine_class is None:
+    if engine_class is not None:
+        return engine_class
+    target = lazy_engines().get(engine_name)
+    if target is None:
         raise ValueError(f"Unknown engine: {engine_name}")
-    return engine_class(config)
+    if isinstance(target, str):
+        module_name, class_name = target.split(":")
+        engine_class = getattr(importlib.import_module(module_name), class_name)
+    else:
+        engine_class = target.load()
+    register_engine(engine_name, engine_class)
+    return engine_class
+
+
+def engine_config_key(engine_name: str, config: dict) -> str:
+    """
+    Identify the engine created from `config`, e.g. to reuse a loaded engine for
+    another project.
+    """
+    engine_class = get_engine_class(engine_name)
+    keys = engine_class.config_keys
+    if keys is None:
+        keys = list(config.keys())
+    return json.dumps(
+        [engine_name, {key: config[key] for key in keys if key in config}],
+        sort_keys=True,
+        default=str,
+    )
+
+
+def create_engine(engine_name: str, config: dict) -> TTSEngine:
+    # The constructor of the base class takes keywords, but every engine takes the
+    # config.
+    factory = cast(EngineFactory, get_engine_class(engine_name))
+    return factory(config)
@@ -1,8 +1,10 @@
 import concurrent.futures
 from typing import List
 import hashlib
+import json
+import mmap
 import os
-from pydub import AudioSegment
+from .audio import wav_duration
 
 
 def par_execute(func, *args) -> List[concurrent.futures.Future]:
@@ -27,11 +29,54 @@ def md5sum_of_file(filename) -> str:
     return hash_md5.hexdigest()
 
 
+def digest_of_file(filename) -> str:
+    """
+    A fast digest of the content of a file, read through a memory map.
+    """
+    hash_blake2b = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as f:
+        # Empty files cannot be mapped.
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                hash_blake2b.update(data)
+
+    return hash_blake2b.hexdigest()
+
+
+def file_stat(path) -> List[int]:
+    """
+    The size, modification time and inode of a file, which change whenever the file
+    is written or replaced.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def write_if_changed(path, text: str) -> bool:
+    """
+    Write `text` to `path` unless the file already holds it, keeping its stat.
+
+    :return: Whether the file was written.
+    """
+    try:
+        with open(path, "r") as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, "w") as f:
+        f.write(text)
+    return True
+
+
+def md5sum_of_json(value) -> str:
+    return hashlib.md5(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
 def exists(path) -> bool:
     return os.path.exists(path)
 
 
 def get_audio_duration(audio_file):
-    audio = AudioSegment.from_wav(audio_file)
-    duration_seconds = len(audio) / 1000.0  # pydub calculates duration in milliseconds
-    return duration_seconds
+    # Only the WAV header is read.
+    return wav_duration(audio_file)
@@ -1,11 +1,30 @@
+import math
 import os
+import struct
 import tempfile
-from typing import List
-import ffmpeg
-from .utils import par_execute
+from fractions import Fraction
+from typing import List, Optional, Tuple
+from .utils import par_execute, get_audio_duration
+
+
+ENCODE_MODES = ["standard", "still"]
+# Seconds between two frames of a still slide segment.
+STILL_FRAME_INTERVAL = 1.0
+# Seconds between two keyframes of a still slide segment, which bounds seeking cost.
+STILL_KEYFRAME_INTERVAL = 10.0
+
+
+def png_size(path) -> Tuple[int, int]:
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"Not a PNG file: {path}")
+    return struct.unpack(">II", header[16:24])
 
 
 def run_ffmpeg_command(command):
+    import ffmpeg
+
     command = command.global_args("-loglevel", "error")
     ffmpeg.run(command, overwrite_output=True)
 
@@ -13,18 +32,253 @@ def run_ffmpeg_command(command):
 class VideoEngine(object):
     """
     FFMPEG-based video utils.
+
+    In the "standard" encode mode, slides are encoded at `framerate` frames per second.
+    In the "still" mode, a slide is encoded with as few frames as possible, spread
+    evenly over its duration, and with still-image tuning.
+
+    `preset` is the libx264 preset, e.g. "ultrafast" for previews. The encoder
+    default if None.
     """
 
+    def __init__(
+        self,
+        *,
+        encode_mode: str = "standard",
+        framerate: int = 30,
+        fragmented: bool = False,
+        preset: Optional[str] = None,
+    ):
+        if encode_mode not in ENCODE_MODES:
+            raise ValueError(f"Invalid encode mode: {encode_mode}")
+        self.encode_mode = encode_mode
+        self.framerate = framerate
+        # Whether slide segments are written as fragmented MP4, see `SegmentAssembler`.
+        self.fragmented = fragmented
+        self.preset = preset
+
+    def cache_key(self) -> dict:
+        """
+        Parameters that, together with the inputs, determine the rendered videos.
+        """
+        key = {
+            "encode_mode": self.encode_mode,
+            "framerate": self.framerate,
+            "fragmented": self.fragmented,
+        }
+        if self.preset:
+            key["preset"] = self.preset
+        return key
+
+    def encoder_options(self, options: dict) -> dict:
+        if self.preset:
+            options["preset"] = self.preset
+        return options
+
+    def min_duration(self, duration: float) -> float:
+        """
+        `duration`, or the duration of one frame if shorter, e.g. for a slide without
+        audio or delays.
+        """
+        return max(duration, 1 / self.framerate)
+
+    def image_input(self, image_path: str, duration: float):
+        """
+        Loop a slide image for `duration` seconds, or at least one frame.
+
+        :return: The video stream and the options to encode it with.
+        """
+        import ffmpeg
+
+        duration = self.min_duration(duration)
+        if self.encode_mode == "still":
+            # Frames are not 1 / STILL_FRAME_INTERVAL apart exactly, so that the
+            # segment lasts exactly `duration` and segments stay in sync once
+            # concatenated. The fixed timescale keeps segments concatenable.
+            frames = max(1, math.ceil(duration / STILL_FRAME_INTERVAL))
+            framerate = Fraction(frames) / Fraction(duration).limit_denominator(1000)
+            input_image = ffmpeg.input(
+                image_path,
+                loop=1,
+                t=duration,
+                framerate=f"{framerate.numerator}/{framerate.denominator}",
+            )
+            options = {
+                "vcodec": "libx264",
+                "pix_fmt": "yuv420p",
+                "tune": "stillimage",
+                "g": math.ceil(STILL_KEYFRAME_INTERVAL / STILL_FRAME_INTERVAL),
+                "video_track_timescale": 90000,
+            }
+            return input_image, self.encoder_options(options)
+
+        input_image = ffmpeg.input(
+            image_path, loop=1, t=duration, framerate=self.framerate
+        )
+        return input_image, self.encoder_options(
+            {"vcodec": "libx264", "pix_fmt": "yuv420p"}
+        )
+
     def generate_video_from_image(
         self, image_path: str, video_path: str, duration: float
     ):
+        import ffmpeg
+
         print(f"Generating video from {image_path} with duration {duration}")
         # Load the image and set the duration
-        input_image = ffmpeg.input(image_path, loop=1, t=duration, framerate=30)
+        input_image, options = self.image_input(image_path, duration)
 
         # Set the output file and parameters
+        output = ffmpeg.output(input_image, video_path, **options)
+        run_ffmpeg_command(output)
+
+    def render_segment(
+        self,
+        image_path: str,
+        audio_path: str,
+        output_path: str,
+        *,
+        lead: float = 0,
+        tail: float = 0,
+    ):
+        """
+        Render the video of a slide, with `lead` and `tail` seconds of silence around
+        its audio, in a single ffmpeg invocation without intermediate files.
+        """
+        import ffmpeg
+
+        duration = self.min_duration(lead + get_audio_duration(audio_path) + tail)
+        print(f"Rendering {output_path} from {image_path} with duration {duration}")
+        input_image, options = self.image_input(image_path, duration)
+
+        audio = ffmpeg.input(audio_path).audio
+        if lead > 0:
+            audio = audio.filter("adelay", delays=round(lead * 1000), all=1)
+        audio = audio.filter("apad", whole_dur=duration)
+
+        if self.fragmented:
+            options["movflags"] = (
+                "frag_keyframe+empty_moov+default_base_moof+delay_moov"
+            )
         output = ffmpeg.output(
-            input_image, video_path, vcodec="libx264", pix_fmt="yuv420p"
+            input_image,
+            audio,
+            output_path,
+            acodec="aac",
+            strict="experimental",
+            t=duration,
+            **options,
+        )
+        run_ffmpeg_command(output)
+
+    def render_deck(
+        self,
+        image_paths: List[str],
+        durations: List[float],
+        audio_path: str,
+        output_path: str,
+    ):
+        """
+        Render a whole deck in a single pass: each image is shown for its duration
+        over one continuous audio track, and video and audio are encoded only once.
+        """
+        import ffmpeg
+
+        print(f"Rendering {len(image_paths)} slides into {output_path}")
+        total_duration = sum(durations)
+        with tempfile.NamedTemporaryFile(
+            delete=False, mode="w", suffix=".txt"
+        ) as temp_file:
+            temp_file.write("ffconcat version 1.0\n")
+            for image_path, duration in zip(image_paths, durations):
+                temp_file.write(f"file '{os.path.abspath(image_path)}'\n")
+                temp_file.write(f"duration {duration}\n")
+            # The duration of the last entry is only honored if it is followed by another one.
+            temp_file.write(f"file '{os.path.abspath(image_paths[-1])}'\n")
+            temp_file_path = temp_file.name
+
+        try:
+            video = ffmpeg.input(temp_file_path, format="concat", safe=0).video
+            width, height = png_size(image_paths[0])
+            if any(
+                png_size(image_path) != (width, height) for image_path in image_paths
+            ):
+                # The encoder needs a constant frame size.
+                video = video.filter(
+                    "scale", width, height, force_original_aspect_ratio="decrease"
+                ).filter("pad", width, height, "(ow-iw)/2", "(oh-ih)/2", color="white")
+
+            if self.encode_mode == "still":
+                # One frame per slide, held for the slide duration.
+                options = {
+                    "vcodec": "libx264",
+                    "pix_fmt": "yuv420p",
+                    "tune": "stillimage",
+                    "fps_mode": "vfr",
+                    "video_track_timescale": 90000,
+                }
+            else:
+                # The framerate is set on the output rather than with a filter, since
+                # the filters are reset when the page size changes.
+                options = {
+                    "vcodec": "libx264",
+                    "pix_fmt": "yuv420p",
+                    "r": self.framerate,
+                    "fps_mode": "cfr",
+                }
+
+            audio = ffmpeg.input(audio_path).audio
+            output = ffmpeg.output(
+                video,
+                audio,
+                output_path,
+                acodec="aac",
+                strict="experimental",
+                t=total_duration,
+                **self.encoder_options(options),
+            )
+            run_ffmpeg_command(output)
+        finally:
+            os.remove(temp_file_path)
+
+    def segment_hls(self, video_path: str, playlist_path: str, segment_duration: float):
+        """
+        Split a video into fragmented MP4 HLS segments next to `playlist_path`,
+        without re-encoding.
+        Segments are cut at keyframes, so they last at least `segment_duration` seconds.
+        """
+        import ffmpeg
+
+        segment_dir = os.path.dirname(os.path.abspath(playlist_path))
+        output = ffmpeg.input(video_path).output(
+            playlist_path,
+            c="copy",
+            f="hls",
+            hls_time=segment_duration,
+            hls_playlist_type="vod",
+            hls_segment_type="fmp4",
+            hls_fmp4_init_filename="init.mp4",
+            hls_segment_filename=os.path.join(segment_dir, "segment_%05d.m4s"),
+        )
+        run_ffmpeg_command(output)
+
+    def segment_dash(
+        self, video_path: str, manifest_path: str, segment_duration: float
+    ):
+        """
+        Split a video into DASH segments next to `manifest_path`, without re-encoding.
+        """
+        import ffmpeg
+
+        output = ffmpeg.input(video_path).output(
+            manifest_path,
+            c="copy",
+            f="dash",
+            seg_duration=segment_duration,
+            use_template=1,
+            use_timeline=1,
+            init_seg_name="init_$RepresentationID$.m4s",
+            media_seg_name="segment_$RepresentationID$_$Number%05d$.m4s",
         )
         run_ffmpeg_command(output)
 
@@ -34,6 +288,8 @@ class VideoEngine(object):
         par_execute(self.generate_video_from_image, image_paths, video_paths, durations)
 
     def concatenate_videos(self, video_paths: List[str], output_path: str):
+        import ffmpeg
+
         print(f"Concatenating videos {video_paths} into {output_path}")
 
         # Create a temporary file listing all video files
@@ -74,6 +330,8 @@ class VideoEngine(object):
         # run_ffmpeg_command(output)
 
     def add_audio_to_video(self, video_path, audio_path, output_path):
+        import ffmpeg
+
         input_video = ffmpeg.input(video_path)
         input_audio = ffmpeg.input(audio_path)
 
@@ -87,41 +345,3 @@ class VideoEngine(object):
         )
 
         run_ffmpeg_command(output)
-
-    def add_silence(self, input_file, duration: float = 2, direction="end"):
-        # Get the suffix of the input file
-        _, input_file_suffix = os.path.splitext(input_file)
-        # Create a temporary file for the output
-        with tempfile.NamedTemporaryFile(
-            delete=False, suffix=input_file_suffix
-        ) as temp_output_file:
-            temp_output_file_name = temp_output_file.name
-
-        try:
-            # Generate 2 seconds of silence
-            silence = ffmpeg.input(
-                "anullsrc=channel_layout=5.1:sample_rate=48000", f="lavfi", t=duration
-            )
-
-            # Input audio file
-            audio = ffmpeg.input(input_file)
-
-            if direction == "end":
-                output = ffmpeg.concat(audio, silence, v=0, a=1).output(
-                    temp_output_file_name
-                )
-            elif direction == "start":
-                output = ffmpeg.concat(silence, audio, v=0, a=1).output(
-                    temp_output_file_name
-                )
-            else:
-                raise ValueError(f"Invalid direction: {direction}")
-            run_ffmpeg_command(output)
-
-            os.replace(temp_output_file_name, input_file)
-            print(f"Successfully added {duration} seconds of silence to {input_file}.")
-
-        finally:
-            # Clean up the temporary file if it still exists
-            if os.path.exists(temp_output_file_name):
-                os.remove(temp_output_file_name)
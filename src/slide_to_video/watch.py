@@ -0,0 +1,64 @@
+"""
+Rebuild a project whenever its inputs change.
+"""
+
+import time
+from typing import Dict, List, Optional
+from .utils import file_stat
+
+DEFAULT_WATCH_INTERVAL = 0.5
+DEFAULT_WATCH_DEBOUNCE = 1.0
+
+
+class FileWatcher(object):
+    """
+    Poll files for changes, which needs no dependency and works on any filesystem.
+
+    :param interval: Seconds between two polls.
+    :param debounce: Seconds the files must stay unchanged before a change is
+        reported, e.g. while an editor is still saving them.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        *,
+        interval: float = DEFAULT_WATCH_INTERVAL,
+        debounce: float = DEFAULT_WATCH_DEBOUNCE,
+    ):
+        self.paths = list(paths)
+        self.interval = interval
+        self.debounce = debounce
+        self.stats = self.snapshot()
+
+    def snapshot(self) -> Dict[str, Optional[List[int]]]:
+        stats = {}
+        for path in self.paths:
+            try:
+                stats[path] = file_stat(path)
+            except FileNotFoundError:
+                stats[path] = None
+        return stats
+
+    def wait(self) -> List[str]:
+        """
+        Block until some files change, then stay unchanged for `debounce` seconds.
+
+        :return: The files that changed since the previous call.
+        """
+        snapshot = self.snapshot()
+        while snapshot == self.stats:
+            time.sleep(self.interval)
+            snapshot = self.snapshot()
+
+        quiet_since = time.monotonic()
+        while time.monotonic() - quiet_since < self.debounce:
+            time.sleep(self.interval)
+            latest = self.snapshot()
+            if latest != snapshot:
+                snapshot = latest
+                quiet_since = time.monotonic()
+
+        changed = [path for path in self.paths if snapshot[path] != self.stats[path]]
+        self.stats = snapshot
+        return changed
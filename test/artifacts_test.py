@@ -0,0 +1,18 @@
+import pytest
+from slide_to_video.artifacts import Artifact, AUDIO
+
+
+def test_key_depends_on_inputs():
+    key = AUDIO.key(script="a", engine={"speed": 1.0}, sentence_gap=0.4)
+    assert key == AUDIO.key(sentence_gap=0.4, engine={"speed": 1.0}, script="a")
+    assert key != AUDIO.key(script="a", engine={"speed": 1.5}, sentence_gap=0.4)
+    assert key != Artifact("other", AUDIO.inputs).key(
+        script="a", engine={"speed": 1.0}, sentence_gap=0.4
+    )
+
+
+def test_key_requires_declared_inputs():
+    with pytest.raises(ValueError):
+        AUDIO.key(script="a", engine={})
+    with pytest.raises(ValueError):
+        AUDIO.key(script="a", engine={}, sentence_gap=None, delay=1)
@@ -0,0 +1,78 @@
+import math
+import shutil
+import struct
+import wave
+import fitz
+import pytest
+from slide_to_video.assembly import (
+    SegmentAssembler,
+    free_box,
+    iter_boxes,
+    normalize_sps,
+)
+from slide_to_video.video_engine import VideoEngine
+
+# Two SPS of the same stream encoded at different rational framerates.
+SPS_A = bytes.fromhex("67640028acd9405802279a5c044000000e8000002583c60c6580")
+SPS_B = bytes.fromhex("67640028acd9405802279a5c0440000072400000fa03c60c6580")
+
+
+def write_wav(path, seconds):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(24000)
+        f.writeframes(
+            b"".join(
+                struct.pack("<h", int(3000 * math.sin(i / 10)))
+                for i in range(int(24000 * seconds))
+            )
+        )
+
+
+def write_image(path):
+    pdf_document = fitz.open()
+    page = pdf_document.new_page(width=64, height=36)
+    page.get_pixmap().save(str(path))
+    pdf_document.close()
+
+
+def test_normalize_sps_ignores_timing():
+    assert SPS_A != SPS_B
+    assert normalize_sps(SPS_A) == normalize_sps(SPS_B)
+
+
+def test_free_box():
+    box = free_box(16)
+    assert [(b.type, b.size) for b in iter_boxes(box)] == [(b"free", 16)]
+    assert free_box(0) == b""
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_update_rewrites_changed_slot(tmp_path):
+    video_engine = VideoEngine(encode_mode="still", fragmented=True)
+    write_image(tmp_path / "slide.png")
+    video_paths = []
+    for i, seconds in enumerate([1.0, 1.5, 1.0]):
+        write_wav(tmp_path / f"{i}.wav", seconds)
+        video_paths.append(str(tmp_path / f"{i}.mp4"))
+        video_engine.render_segment(
+            str(tmp_path / "slide.png"), str(tmp_path / f"{i}.wav"), video_paths[-1]
+        )
+
+    output_path = str(tmp_path / "output.mp4")
+    assembler = SegmentAssembler(str(tmp_path / "output.index.yaml"))
+    assembler.assemble(video_paths, output_path)
+    full_size = assembler.bytes_written
+
+    write_wav(tmp_path / "1.wav", 1.25)
+    video_engine.render_segment(
+        str(tmp_path / "slide.png"), str(tmp_path / "1.wav"), video_paths[1]
+    )
+    assembler.assemble(video_paths, output_path)
+    assert 0 < assembler.bytes_written < full_size
+
+    index = assembler.load_index()
+    assert float(sum(slot.duration for slot in index.slots)) == pytest.approx(
+        3.25, abs=0.25
+    )
@@ -0,0 +1,65 @@
+import os
+import pytest
+from slide_to_video.audio_cache import AudioCache
+
+
+ENGINE_KEY = {
+    "engine": "local",
+    "version": "xtts_v2",
+    "voice": "abc",
+    "language": "en",
+    "speed": 1.0,
+}
+
+
+@pytest.fixture
+def audio_cache(tmp_path):
+    return AudioCache(str(tmp_path / "cache"))
+
+
+def test_key_normalizes_text(audio_cache):
+    assert audio_cache.key(ENGINE_KEY, " Hello \n world ") == audio_cache.key(
+        ENGINE_KEY, "Hello world"
+    )
+    assert audio_cache.key(ENGINE_KEY, "Hello") != audio_cache.key(
+        dict(ENGINE_KEY, speed=1.5), "Hello"
+    )
+
+
+def test_get_and_put(audio_cache, tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    audio_path.write_bytes(b"audio")
+    output_path = tmp_path / "output.wav"
+    key = audio_cache.key(ENGINE_KEY, "Hello")
+
+    assert not audio_cache.get(key, str(output_path))
+    audio_cache.put(key, str(audio_path))
+    assert audio_cache.get(key, str(output_path))
+    assert output_path.read_bytes() == b"audio"
+    assert (audio_cache.hits, audio_cache.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    audio_cache = AudioCache(str(tmp_path / "cache"), max_size_mb=2.5 / 1024 / 1024)
+    audio_path = tmp_path / "audio.wav"
+    audio_path.write_bytes(b"a")
+    keys = [audio_cache.key(ENGINE_KEY, text) for text in ["one", "two", "three"]]
+    for i, key in enumerate(keys[:2]):
+        audio_cache.put(key, str(audio_path))
+        os.utime(audio_cache.entry_path(key), ns=(i, i))
+
+    audio_cache.put(keys[2], str(audio_path))
+
+    assert not os.path.exists(audio_cache.entry_path(keys[0]))
+    assert os.path.exists(audio_cache.entry_path(keys[1]))
+    assert os.path.exists(audio_cache.entry_path(keys[2]))
+    assert audio_cache.evictions == 1
+
+
+def test_put_again_replaces_the_entry_size(audio_cache, tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    key = audio_cache.key(ENGINE_KEY, "Hello")
+    for content in [b"a", b"audio", b"longer audio"]:
+        audio_path.write_bytes(content)
+        audio_cache.put(key, str(audio_path))
+    assert audio_cache.total_size == len(b"longer audio")
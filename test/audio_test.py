@@ -0,0 +1,74 @@
+import struct
+import wave
+import pytest
+from slide_to_video.audio import concat_wavs, read_wav_info, wav_duration
+
+
+def write_wav(path, *, channels=1, sample_width=2, sample_rate=8000, frames=800):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(sample_width)
+        f.setframerate(sample_rate)
+        f.writeframes(b"\x01" * (frames * channels * sample_width))
+
+
+def write_float_wav(path, samples, sample_rate=8000):
+    data = struct.pack(f"<{len(samples)}f", *samples)
+    fmt_chunk = struct.pack("<HHIIHH", 3, 1, sample_rate, sample_rate * 4, 4, 32)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sI4s", b"RIFF", 4 + 8 + 16 + 8 + len(data), b"WAVE"))
+        f.write(struct.pack("<4sI", b"fmt ", 16) + fmt_chunk)
+        f.write(struct.pack("<4sI", b"LIST", 4) + b"INFO")
+        f.write(struct.pack("<4sI", b"data", len(data)) + data)
+
+
+def test_wav_duration(tmp_path):
+    write_wav(tmp_path / "a.wav", channels=2, sample_rate=8000, frames=12000)
+    assert wav_duration(tmp_path / "a.wav") == pytest.approx(1.5)
+
+
+def test_wav_duration_skips_unknown_chunks(tmp_path):
+    write_float_wav(tmp_path / "a.wav", [0.5] * 4000)
+    info = read_wav_info(tmp_path / "a.wav")
+    assert (info.channels, info.bits_per_sample) == (1, 32)
+    assert info.duration == pytest.approx(0.5)
+
+
+def test_concat_wavs_keeps_format(tmp_path):
+    write_wav(tmp_path / "a.wav", channels=1, sample_width=2, frames=800)
+    concat_wavs([(tmp_path / "a.wav", 0.5, 0.25)], tmp_path / "b.wav")
+
+    with wave.open(str(tmp_path / "b.wav"), "rb") as f:
+        assert (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (1, 2, 8000)
+        assert f.getnframes() == 4000 + 800 + 2000
+        frames = f.readframes(f.getnframes())
+    assert frames == b"\x00" * 8000 + b"\x01" * 1600 + b"\x00" * 4000
+
+
+def test_concat_wavs_in_place_unsigned(tmp_path):
+    write_wav(tmp_path / "a.wav", channels=2, sample_width=1, frames=3)
+    concat_wavs([(tmp_path / "a.wav", 0, 1 / 8000)], tmp_path / "a.wav")
+
+    with wave.open(str(tmp_path / "a.wav"), "rb") as f:
+        assert f.readframes(f.getnframes()) == b"\x01" * 6 + b"\x80" * 2
+
+
+def test_concat_wavs(tmp_path):
+    write_wav(tmp_path / "a.wav", frames=800)
+    write_wav(tmp_path / "b.wav", frames=400)
+    durations = concat_wavs(
+        [(tmp_path / "a.wav", 0, 0.5), (tmp_path / "b.wav", 0.25, 0)],
+        tmp_path / "c.wav",
+    )
+    assert durations == pytest.approx([0.6, 0.3])
+    assert wav_duration(tmp_path / "c.wav") == pytest.approx(0.9)
+
+
+def test_concat_wavs_rejects_different_formats(tmp_path):
+    write_wav(tmp_path / "a.wav", sample_rate=8000)
+    write_wav(tmp_path / "b.wav", sample_rate=16000)
+    with pytest.raises(ValueError):
+        concat_wavs(
+            [(tmp_path / "a.wav", 0, 0), (tmp_path / "b.wav", 0, 0)],
+            tmp_path / "c.wav",
+        )
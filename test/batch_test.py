@@ -0,0 +1,85 @@
+import threading
+import time
+import pytest
+from slide_to_video.batch import SharedEngine, load_manifest
+from slide_to_video.tts_engine import TTSEngine
+
+
+class SlowEngine(TTSEngine):
+    name = "slow"
+
+    def __init__(self, parallel: bool):
+        super().__init__()
+        self.parallel = parallel
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def synthesize(self, text, output_path, format="wav"):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+
+    def parallizable(self):
+        return self.parallel
+
+    def voice_fingerprint(self):
+        return "slow"
+
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path / "manifest.yaml"
+    manifest.write_text(
+        """
+defaults:
+  model: local
+  voice: voice.wav
+  delay: 1.0
+projects:
+  - slide: a.pdf
+    script: a.txt
+    output_dir: output/a
+  - slide: b.pdf
+    script: b.txt
+    output_dir: output/b
+    delay: 0.5
+    force_reset: 2
+"""
+    )
+    first, second = load_manifest(manifest)
+    assert first["voice"] == "voice.wav"
+    assert first["delay"] == 1.0
+    assert first["speech_speed"] == 1.0
+    assert second["delay"] == 0.5
+    assert second.force_reset == {2}
+
+    manifest.write_text(
+        """
+defaults:
+  model: local
+projects:
+  - {slide: a.pdf, script: a.txt, output_dir: output}
+  - {slide: b.pdf, script: b.txt, output_dir: ./output}
+"""
+    )
+    with pytest.raises(ValueError):
+        load_manifest(manifest)
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_shared_engine_serializes_calls(parallel):
+    engine = SlowEngine(parallel)
+    shared = SharedEngine(engine)
+    threads = [
+        threading.Thread(target=shared.synthesize, args=("Hello.", "out.wav"))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert engine.max_running == (3 if parallel else 1)
+    assert shared.cache_key() == engine.cache_key()
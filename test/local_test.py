@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+import pytest
+from slide_to_video.tts_engine import local
+from slide_to_video.utils import md5sum_of_json
+
+
+class StubModel(object):
+    """
+    Stands in for the XTTS model, recording the arguments the conditioning is
+    computed with.
+    """
+
+    def __init__(self, **config):
+        self.config = SimpleNamespace(
+            **{
+                "gpt_cond_len": 12,
+                "gpt_cond_chunk_len": 4,
+                "max_ref_len": 10,
+                "sound_norm_refs": False,
+                **config,
+            }
+        )
+        self.device = "cpu"
+        self.calls = []
+
+    def get_conditioning_latents(self, **kwargs):
+        self.calls.append(kwargs)
+        return ("gpt_cond_latent", "speaker_embedding")
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = []
+    monkeypatch.setattr(local, "conditioning_memo", {})
+    monkeypatch.setattr(
+        local, "save_conditioning", lambda conditioning, path: saved.append(path)
+    )
+    return saved
+
+
+def stub_tts(model):
+    return SimpleNamespace(synthesizer=SimpleNamespace(tts_model=model))
+
+
+def test_conditioning_is_computed_with_the_model_settings(tmp_path, saved):
+    model = StubModel(gpt_cond_len=30, sound_norm_refs=True)
+    conditioning = local.get_conditioning(
+        stub_tts(model), "voice.wav", str(tmp_path / "voice.xtts_v2.pth")
+    )
+    assert conditioning == ("gpt_cond_latent", "speaker_embedding")
+    settings = {
+        "gpt_cond_len": 30,
+        "gpt_cond_chunk_len": 4,
+        "max_ref_length": 10,
+        "sound_norm_refs": True,
+    }
+    assert model.calls == [{"audio_path": ["voice.wav"], **settings}]
+    assert saved == [
+        str(tmp_path / f"voice.xtts_v2.{md5sum_of_json(settings)[:8]}.pth")
+    ]
+
+
+def test_conditioning_is_cached_by_settings(tmp_path, saved):
+    cache_path = str(tmp_path / "voice.xtts_v2.pth")
+    model = StubModel()
+    local.get_conditioning(stub_tts(model), "voice.wav", cache_path)
+    local.get_conditioning(stub_tts(model), "voice.wav", cache_path)
+    assert len(model.calls) == 1
+
+    other_model = StubModel(max_ref_len=20)
+    local.get_conditioning(stub_tts(other_model), "voice.wav", cache_path)
+    assert other_model.calls[0]["max_ref_length"] == 20
+    assert len(saved) == 2 and saved[0] != saved[1]
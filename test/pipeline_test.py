@@ -0,0 +1,68 @@
+import threading
+import time
+import pytest
+from slide_to_video.pipeline import Pipeline, Stage
+
+
+def test_pipeline_runs_every_stage():
+    results = Pipeline(
+        [
+            Stage("double", lambda x: x * 2, workers=3),
+            Stage("increment", lambda x: x + 1),
+        ]
+    ).run(range(10))
+    assert sorted(results) == [x * 2 + 1 for x in range(10)]
+
+
+def test_pipeline_limits_stage_concurrency():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def slow(x):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return x
+
+    Pipeline(
+        [Stage("fast", lambda x: x, workers=4), Stage("slow", slow, workers=2)]
+    ).run(range(20))
+    assert running[1] == 2
+
+
+def test_pipeline_raises_first_error():
+    def fail(x):
+        if x == 3:
+            raise ValueError("stage failed")
+        return x
+
+    with pytest.raises(ValueError, match="stage failed"):
+        Pipeline([Stage("fail", fail), Stage("identity", lambda x: x)]).run(range(100))
+
+
+def test_pipeline_batches_waiting_items():
+    batches = []
+
+    def record(items):
+        batches.append(len(items))
+        return items
+
+    results = Pipeline([Stage("batch", record, batch_size=4)]).run(range(10))
+    assert sorted(results) == list(range(10))
+    assert max(batches) <= 4
+    assert sum(batches) == 10
+
+
+def test_batched_stage_takes_lists_of_one_item():
+    batches = []
+
+    def record(items):
+        batches.append(list(items))
+        return items
+
+    results = Pipeline([Stage("batch", record, batched=True)]).run(range(3))
+    assert sorted(results) == [0, 1, 2]
+    assert all(len(batch) == 1 for batch in batches)
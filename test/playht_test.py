@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from slide_to_video.tts_engine import PlayHTEngine
+from slide_to_video.tts_engine.playht import PlayHTError, PlayHTPermanentError
+
+
+class PlayHTStandIn(BaseHTTPRequestHandler):
+    """
+    A local stand-in for the Play.ht API. The first job request is rate limited and
+    each job is pending on its first poll. The jobs of some texts are rejected, fail,
+    or are slow to create or poll.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def record_credentials(self, kind):
+        with self.server.state["lock"]:
+            credentials = self.server.state["credentials"].setdefault(kind, set())
+            credentials.add(self.headers.get("AUTHORIZATION"))
+
+    def do_POST(self):
+        state = self.server.state
+        self.record_credentials("tts")
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with state["lock"]:
+            state["posts"] += 1
+            if state["posts"] == 1:
+                self.send_json(429, {}, {"Retry-After": "0"})
+                return
+            job = len(state["jobs"])
+            state["jobs"].append({"text": payload["text"], "polls": 0})
+        if payload["text"] == "invalid":
+            self.send_json(400, {"error": "bad text"})
+            return
+        if payload["text"] == "slow to create":
+            # Longer than the request timeout of the engine.
+            time.sleep(0.3)
+        url = f"http://{self.server.server_address[0]}:{self.server.server_port}"
+        self.send_json(201, {"_links": [{"href": f"{url}/jobs/{job}"}]})
+
+    def do_GET(self):
+        state = self.server.state
+        kind, job = self.path.strip("/").split("/")
+        self.record_credentials(kind)
+        job = state["jobs"][int(job)]
+        if kind == "jobs":
+            job["polls"] += 1
+            if job["text"] == "fail":
+                self.send_json(200, {"status": "failed"})
+                return
+            if job["polls"] == 1:
+                if job["text"] == "slow":
+                    # Longer than the request timeout of the engine.
+                    time.sleep(0.3)
+                self.send_json(200, {"status": "pending"})
+                return
+            url = f"http://{self.server.server_address[0]}:{self.server.server_port}"
+            self.send_json(
+                200,
+                {
+                    "status": "complete",
+                    "output": {"url": f"{url}/audio/{self.path.split('/')[-1]}"},
+                },
+            )
+        else:
+            body = job["text"].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PlayHTStandIn)
+    server.state = {
+        "lock": threading.Lock(),
+        "posts": 0,
+        "jobs": [],
+        "credentials": {},
+    }
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def create_engine(server, **config):
+    return PlayHTEngine(
+        {
+            "PLAY_HT_USER_ID": "user",
+            "PLAY_HT_API_KEY": "key",
+            "voice": "voice",
+            "playht_base_url": f"http://127.0.0.1:{server.server_port}",
+            "playht_poll_interval": 0.01,
+            "playht_backoff": 0.01,
+            **config,
+        }
+    )
+
+
+def test_synthesize_batch(server, tmp_path):
+    engine = create_engine(server, playht_max_in_flight=2)
+    texts = [f"text {i}" for i in range(5)]
+    paths = [str(tmp_path / f"{i}.wav") for i in range(5)]
+    engine.synthesize_batch(texts, paths)
+    assert [open(path).read() for path in paths] == texts
+    # The rate-limited request was sent again.
+    assert server.state["posts"] == 6
+
+
+def test_failed_job_is_retried_then_raised(server, tmp_path):
+    engine = create_engine(server, playht_retries=1)
+    with pytest.raises(PlayHTError):
+        engine.synthesize("fail", str(tmp_path / "fail.wav"))
+    assert [job["text"] for job in server.state["jobs"]] == ["fail", "fail"]
+    assert not (tmp_path / "fail.wav").exists()
+
+
+def test_rejected_job_is_not_retried(server, tmp_path):
+    engine = create_engine(server, playht_retries=2)
+    with pytest.raises(PlayHTPermanentError):
+        engine.synthesize("invalid", str(tmp_path / "invalid.wav"))
+    assert [job["text"] for job in server.state["jobs"]] == ["invalid"]
+
+
+def test_timed_out_job_creation_is_not_sent_again(server, tmp_path):
+    engine = create_engine(server, playht_request_timeout=0.1)
+    with pytest.raises(PlayHTPermanentError):
+        engine.synthesize("slow to create", str(tmp_path / "slow.wav"))
+    assert [job["text"] for job in server.state["jobs"]] == ["slow to create"]
+
+
+def test_timed_out_request_is_sent_again(server, tmp_path):
+    engine = create_engine(server, playht_request_timeout=0.1)
+    engine.synthesize("slow", str(tmp_path / "slow.wav"))
+    assert (tmp_path / "slow.wav").read_text() == "slow"
+    # The poll was sent again, without creating another job.
+    assert [job["text"] for job in server.state["jobs"]] == ["slow"]
+
+
+def test_audio_is_downloaded_without_credentials(server, tmp_path):
+    engine = create_engine(server)
+    engine.synthesize("text", str(tmp_path / "text.wav"))
+    assert server.state["credentials"] == {
+        "tts": {"key"},
+        "jobs": {"key"},
+        "audio": {None},
+    }
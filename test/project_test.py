@@ -0,0 +1,150 @@
+import wave
+import pytest
+from slide_to_video.audio import wav_duration
+from slide_to_video.project import Item, ItemType, Project, ProjectConfig, Task
+from slide_to_video.state import ProjectState
+from slide_to_video.tts_engine import TTSEngine
+
+
+class CountingEngine(TTSEngine):
+    name = "counting"
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def synthesize(self, text, output_path, format="wav"):
+        self.texts.append(text)
+        with wave.open(output_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(1000)
+            f.writeframes(b"\x00\x00" * 100 * len(text.split()))
+
+    def parallizable(self):
+        return False
+
+    def voice_fingerprint(self):
+        return "counting"
+
+
+def create_task(tmp_path, engine, text):
+    (tmp_path / "script.txt").write_text(text)
+    return Task(
+        id=1,
+        slide=Item(path="slide.png", type=ItemType.SLIDE, md5sum="slide"),
+        script=Item(path=str(tmp_path / "script.txt"), type=ItemType.SCRIPT),
+        output_dir=str(tmp_path),
+        tts_engine=engine,
+        delay=0,
+        sentence_gap=0.5,
+    )
+
+
+def test_only_changed_sentences_are_synthesized(tmp_path):
+    engine = CountingEngine()
+    task = create_task(tmp_path, engine, "One two. Three.")
+    task.build_audio()
+    assert engine.texts == ["One two.", "Three."]
+    assert wav_duration(task.audio_file) == pytest.approx(0.8)
+
+    task = create_task(tmp_path, engine, "One two. Four five six.")
+    task.build_audio()
+    assert engine.texts == ["One two.", "Three.", "Four five six."]
+    assert wav_duration(task.audio_file) == pytest.approx(1.0)
+
+
+def test_run_pipeline_with_an_engine_that_is_not_parallelizable(tmp_path):
+    engine = CountingEngine()
+    task = create_task(tmp_path, engine, "One two. Three.")
+    project = Project(
+        name="project",
+        config=ProjectConfig(
+            {
+                "model": "counting",
+                "slide": "slide.pdf",
+                "script": "script.txt",
+                "output_dir": str(tmp_path),
+                "speech_speed": 1.0,
+                "delay": 0,
+            }
+        ),
+        from_file=True,
+    )
+    project.state = ProjectState(str(tmp_path / "project.db"))
+    try:
+        # The synthesize stage takes batches of a single task.
+        project.run_pipeline([task], engine, "single_pass")
+    finally:
+        project.close()
+    assert engine.texts == ["One two.", "Three."]
+    assert wav_duration(task.audio_file) == pytest.approx(0.8)
+
+
+def test_item_digest_is_reused_if_file_unchanged(tmp_path):
+    path = tmp_path / "script.txt"
+    path.write_text("One two.")
+    item = Item(path=str(path), type=ItemType.SCRIPT)
+    previous = Item.from_yaml({**item.to_yaml(), "md5sum": "previous"})
+    assert Item(path=str(path), type=ItemType.SCRIPT, previous=previous).md5sum == (
+        "previous"
+    )
+
+    path.write_text("One two three.")
+    changed = Item(path=str(path), type=ItemType.SCRIPT, previous=previous)
+    assert changed.md5sum not in ["previous", item.md5sum]
+
+
+def create_project(keys):
+    config = ProjectConfig(
+        {
+            "model": "counting",
+            "slide": "slide.pdf",
+            "script": "script.txt",
+            "output_dir": "output",
+            "speech_speed": 1.0,
+            "delay": 0,
+        }
+    )
+    project = Project(name="project", config=config, from_file=True)
+    project.slide_items = [
+        Item(path=f"slide_{key}.png", type=ItemType.SLIDE, md5sum=key) for key in keys
+    ]
+    project.script_items = [
+        Item(path=f"script_{key}.txt", type=ItemType.SCRIPT, md5sum=key) for key in keys
+    ]
+    return project
+
+
+def test_align_inserted_and_removed_slides():
+    previous = create_project(["a", "b", "c", "d"])
+    project = create_project(["a", "new", "b", "d"])
+    assert project.align(previous) == [0, None, 1, 3]
+
+    # Edited slides are matched by position.
+    project = create_project(["a", "edited", "c", "d"])
+    assert project.align(previous) == [0, 1, 2, 3]
+
+    previous.slide_items[2] = None
+    assert create_project(["a", "b", "c"]).align(previous) == [0, 1, 2]
+
+
+def test_preview_config():
+    config = ProjectConfig(
+        {
+            "model": "counting",
+            "slide": "slide.pdf",
+            "script": "script.txt",
+            "output_dir": "output",
+            "speech_speed": 1.0,
+            "delay": 0,
+            "resolution": "1920x1080",
+            "force_reset": "2",
+        }
+    )
+    preview = config.for_preview()
+    assert preview["output_dir"] == "output/preview"
+    assert preview["sentence_dir"] == "output/sentences"
+    assert preview["resolution"] == "640x360"
+    assert preview.force_reset == {2}
+    assert config["resolution"] == "1920x1080"
@@ -1,3 +1,4 @@
+import os
 import pytest
 from slide_to_video.script_engine import ScriptEngine, Script, ScriptConfig
 from slide_to_video.script_engine import extract_text_from_docx
@@ -61,3 +62,36 @@ def test_split_script(script_engine, tmp_path):
     assert len(result) == 2
     assert result[0].text == "Part1"
     assert result[1].text == "Part2"
+
+
+def test_split_sentences(script_engine):
+    result = script_engine.split_sentences(
+        'Hello world. This is e.g. a test! "Is it?"  Yes 你好。世界'
+    )
+    assert result == [
+        "Hello world.",
+        "This is e.g. a test!",
+        '"Is it?"',
+        "Yes 你好。",
+        "世界",
+    ]
+
+
+def test_split_script_sentences(script_engine, tmp_path):
+    script_path = tmp_path / "test.txt"
+    script_path.write_text("One. Two.NEWSLIDEThree")
+    result = script_engine.split_script(script_path, str(tmp_path))
+    assert [script.sentences for script in result] == [["One.", "Two."], ["Three"]]
+
+
+def test_split_script_keeps_unchanged_files(script_engine, tmp_path):
+    script_path = tmp_path / "test.txt"
+    script_path.write_text("Part1NEWSLIDEPart2")
+    result = script_engine.split_script(script_path, str(tmp_path))
+    stats = [os.stat(script.path) for script in result]
+
+    script_path.write_text("Part1NEWSLIDEPart2 edited")
+    result = script_engine.split_script(script_path, str(tmp_path))
+    assert os.stat(result[0].path).st_mtime_ns == stats[0].st_mtime_ns
+    assert result[1].text == "Part2 edited"
+    assert open(result[1].path).read() == "Part2 edited"
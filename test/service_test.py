@@ -0,0 +1,136 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from slide_to_video.service import EnginePool, RenderService, create_server
+from slide_to_video.tts_engine import TTSEngine
+from slide_to_video.tts_engine.registery import register_engine
+
+
+class IdleEngine(TTSEngine):
+    name = "idle"
+    config_keys = ["voice"]
+
+    def __init__(self, config):
+        super().__init__(**config)
+        self.closed = False
+
+    def synthesize(self, text, output_path, format="wav"):
+        pass
+
+    def parallizable(self):
+        return False
+
+    def voice_fingerprint(self):
+        return "idle"
+
+    def close(self):
+        self.closed = True
+
+
+register_engine("idle", IdleEngine)
+
+
+def job_config(**config):
+    return {
+        "model": "idle",
+        "slide": "slide.pdf",
+        "script": "script.txt",
+        "output_dir": "output",
+        **config,
+    }
+
+
+def test_engine_pool_reuses_engines():
+    pool = EnginePool(max_idle=1)
+    config = job_config(voice="a")
+    engine = pool.acquire(config)
+    pool.release(config, engine)
+    # Only the config keys of the engine matter.
+    assert pool.acquire(job_config(voice="a", output_dir="other")) is engine
+    assert pool.acquire(job_config(voice="b")) is not engine
+
+    pool.release(config, engine)
+    pool.release(config, IdleEngine(config))
+    assert engine.closed
+
+
+def test_jobs_run_by_priority():
+    service = RenderService()
+    low = service.submit(job_config(), priority=0)
+    high = service.submit(job_config(), priority=5)
+    later = service.submit(job_config(), priority=0)
+    assert [service.next_job() for _ in range(3)] == [high, low, later]
+    assert low.config["delay"] == 2.0
+
+    with pytest.raises(ValueError):
+        service.submit(job_config(model="unknown"))
+
+
+def test_output_dir_is_inside_the_output_root(tmp_path):
+    service = RenderService(output_root=str(tmp_path))
+    job = service.submit(job_config(output_dir="deck"))
+    assert job.config["output_dir"] == str(tmp_path / "deck")
+
+    for output_dir in ["..", "../other", "/tmp", "deck/../../other"]:
+        with pytest.raises(ValueError, match="outside"):
+            service.submit(job_config(output_dir=output_dir))
+
+
+def test_existing_directory_that_is_not_a_project_is_refused(tmp_path):
+    service = RenderService(output_root=str(tmp_path))
+    (tmp_path / "documents").mkdir()
+    (tmp_path / "documents" / "notes.txt").write_text("notes")
+    with pytest.raises(ValueError, match="not a project"):
+        service.submit(job_config(output_dir="documents"))
+    assert (tmp_path / "documents" / "notes.txt").exists()
+
+    (tmp_path / "documents" / "project.db").write_text("")
+    service.submit(job_config(output_dir="documents"))
+
+
+def request(url, payload=None, content_type="application/json"):
+    data = json.dumps(payload).encode() if payload is not None else None
+    headers = {"Content-Type": content_type} if data is not None else {}
+    try:
+        with urllib.request.urlopen(
+            urllib.request.Request(url, data, headers)
+        ) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    service = RenderService(output_root=str(tmp_path))
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/jobs"
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_http_api(server_url):
+    url = server_url
+    status, job = request(url, {"config": job_config(), "priority": 1})
+    assert status == 201
+    assert job["status"] == "queued"
+    status, data = request(f"{url}/{job['id']}")
+    assert status == 200
+    assert data["priority"] == 1
+    assert data["queued_seconds"] >= 0
+    assert request(url)[1][0]["id"] == job["id"]
+    assert request(url, {"config": {"model": "idle"}})[0] == 400
+    assert request(f"{url}/unknown")[0] == 404
+    assert request(url, {"config": job_config(output_dir="/tmp")})[0] == 400
+
+
+def test_http_api_only_accepts_json(server_url):
+    # A web page can send this request to the service without a preflight.
+    status, _ = request(server_url, {"config": job_config()}, content_type="text/plain")
+    assert status == 415
+    assert request(server_url)[1] == []
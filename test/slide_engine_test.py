@@ -0,0 +1,61 @@
+import os
+import fitz
+import pytest
+from slide_to_video.slide_engine import SlideEngine
+
+
+@pytest.fixture
+def slide_engine():
+    return SlideEngine()
+
+
+def create_pdf(path, texts):
+    pdf_document = fitz.open()
+    for text in texts:
+        page = pdf_document.new_page(width=640, height=360)
+        page.insert_text((72, 72), text)
+    pdf_document.save(path)
+    pdf_document.close()
+
+
+def test_page_fingerprints_detect_changed_page(slide_engine, tmp_path):
+    create_pdf(tmp_path / "a.pdf", ["One", "Two", "Three"])
+    create_pdf(tmp_path / "b.pdf", ["One", "Changed", "Three"])
+
+    before = slide_engine.page_fingerprints(str(tmp_path / "a.pdf"))
+    after = slide_engine.page_fingerprints(str(tmp_path / "b.pdf"))
+
+    assert before == slide_engine.page_fingerprints(str(tmp_path / "a.pdf"))
+    assert len(set(before)) == 3
+    assert [x == y for x, y in zip(before, after)] == [True, False, True]
+
+
+def test_page_fingerprints_include_resolution(slide_engine, tmp_path):
+    create_pdf(tmp_path / "a.pdf", ["One"])
+    assert slide_engine.page_fingerprints(
+        str(tmp_path / "a.pdf"), resolution="320x180"
+    ) != slide_engine.page_fingerprints(str(tmp_path / "a.pdf"))
+
+
+def test_pdf_to_images_renders_selected_pages(slide_engine, tmp_path):
+    create_pdf(tmp_path / "a.pdf", ["One", "Two", "Three"])
+    image_paths = slide_engine.pdf_to_images(
+        str(tmp_path / "a.pdf"), str(tmp_path), resolution="320x180", pages=[1]
+    )
+    assert [os.path.basename(path) for path in image_paths] == [
+        "slide_1.png",
+        "slide_2.png",
+        "slide_3.png",
+    ]
+    assert [os.path.exists(path) for path in image_paths] == [False, True, False]
+
+
+def test_pdf_to_images_fits_even_resolution(slide_engine, tmp_path):
+    create_pdf(tmp_path / "a.pdf", ["One", "Two"])
+    image_paths = slide_engine.pdf_to_images(
+        str(tmp_path / "a.pdf"), str(tmp_path), resolution="641x361"
+    )
+    for image_path in image_paths:
+        pix = fitz.Pixmap(image_path)
+        assert (pix.width, pix.height) == (640, 360)
+    assert sorted(slide_engine.page_timings) == [0, 1]
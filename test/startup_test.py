@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+import pytest
+import slide_to_video
+from slide_to_video import tts_engine
+from slide_to_video.tts_engine import get_all_engine_names, get_engine_class
+
+HEAVY_MODULES = {"fitz", "docx", "ffmpeg", "requests", "torch", "TTS", "yaml"}
+
+
+def imported_modules(code: str):
+    src_dir = os.path.dirname(os.path.dirname(slide_to_video.__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        env={**os.environ, "PYTHONPATH": src_dir},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_imports_are_lazy():
+    modules = imported_modules(
+        "import slide_to_video.lib\n"
+        "from slide_to_video.tts_engine import get_all_engine_names\n"
+        "assert 'local' in get_all_engine_names()"
+    )
+    assert not modules & HEAVY_MODULES
+    assert "slide_to_video.tts_engine.playht" not in modules
+
+
+def test_cli_does_not_import_the_pipeline():
+    pytest.importorskip("click")
+    pytest.importorskip("typer")
+    modules = imported_modules("import script")
+    assert "slide_to_video.project" not in modules
+    assert not modules & HEAVY_MODULES
+
+
+def test_engines_are_imported_on_first_use():
+    assert {"local", "playht"} <= set(get_all_engine_names())
+    engine_class = get_engine_class("local")
+    assert engine_class.name == "local"
+    assert tts_engine.LocalTTSEngine is engine_class
+    with pytest.raises(ValueError):
+        get_engine_class("unknown")
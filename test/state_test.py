@@ -0,0 +1,58 @@
+import os
+import yaml
+from slide_to_video.state import ProjectState, DECK
+
+
+def project_data(slide_items):
+    return {
+        "name": "project",
+        "config": {"model": "dummy"},
+        "slide_items": slide_items,
+        "script_items": slide_items,
+    }
+
+
+def test_save_and_load_project(tmp_path):
+    state = ProjectState(str(tmp_path / "project.db"))
+    assert state.load_project() is None
+
+    state.save_project(project_data([{"md5sum": "a"}, None, {"md5sum": "c"}]))
+    project = state.load_project()
+    assert project["config"] == {"model": "dummy"}
+    assert project["slide_items"] == [{"md5sum": "a"}, None, {"md5sum": "c"}]
+
+    state.save_items(1, {"slide": {"md5sum": "b"}, "script": {"md5sum": "b"}})
+    state.close()
+    project = ProjectState(str(tmp_path / "project.db")).load_project()
+    assert project["script_items"][1] == {"md5sum": "b"}
+
+
+def test_artifact_current(tmp_path):
+    state = ProjectState(str(tmp_path / "project.db"))
+    path = tmp_path / "output.mp4"
+    path.write_bytes(b"video")
+    state.record_artifact(DECK, "output", "key", str(path), seconds=1.5)
+    assert state.artifact_current(DECK, "output", "key")
+    assert not state.artifact_current(DECK, "output", "other key")
+    assert state.artifacts()[0]["seconds"] == 1.5
+
+    path.write_bytes(b"modified video")
+    assert not state.artifact_current(DECK, "output", "key")
+    os.remove(path)
+    assert not state.artifact_current(DECK, "output", "key")
+
+    # Removing a slide removes its artifacts.
+    state.record_artifact(1, "image", "key", str(tmp_path / "project.db"))
+    state.save_project(project_data([{"md5sum": "a"}]))
+    assert [row["kind"] for row in state.artifacts()] == ["output"]
+
+
+def test_migrate_from_yaml(tmp_path):
+    yaml_path = tmp_path / "project.yaml"
+    with open(yaml_path, "w") as f:
+        yaml.dump(project_data([{"md5sum": "a"}]), f)
+    state = ProjectState(str(tmp_path / "project.db"))
+    assert state.migrate_from_yaml(str(yaml_path))
+    assert not yaml_path.exists()
+    assert state.load_project()["slide_items"] == [{"md5sum": "a"}]
+    assert not state.migrate_from_yaml(str(yaml_path))
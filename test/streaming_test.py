@@ -0,0 +1,89 @@
+import xml.etree.ElementTree as ET
+import pytest
+from slide_to_video.streaming import (
+    DASH_NAMESPACE,
+    StreamPublisher,
+    parse_streaming_formats,
+)
+
+SLIDE_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:{target}
+#EXT-X-MEDIA-SEQUENCE:0
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:{duration},
+segment_00000.m4s
+#EXT-X-ENDLIST
+"""
+
+SLIDE_MANIFEST = """<?xml version="1.0" encoding="utf-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{duration:.1f}S">
+	<Period id="0" start="PT0.0S">
+		<AdaptationSet id="0" contentType="audio">
+			<Representation id="0">
+				<SegmentTemplate timescale="1000" initialization="init_$RepresentationID$.m4s" media="segment_$RepresentationID$_$Number%05d$.m4s">
+					<SegmentTimeline>
+						<S t="0" d="{ms}" />
+					</SegmentTimeline>
+				</SegmentTemplate>
+			</Representation>
+		</AdaptationSet>
+	</Period>
+</MPD>
+"""
+
+
+@pytest.fixture
+def slide_dirs(tmp_path):
+    slide_dirs = []
+    for i, duration in enumerate([2.02, 4.06]):
+        slide_dir = tmp_path / "stream" / f"slide_{i + 1}_0"
+        slide_dir.mkdir(parents=True)
+        (slide_dir / "index.m3u8").write_text(
+            SLIDE_PLAYLIST.format(target=round(duration), duration=duration)
+        )
+        (slide_dir / "manifest.mpd").write_text(
+            SLIDE_MANIFEST.format(duration=duration, ms=round(duration * 1000))
+        )
+        slide_dirs.append(str(slide_dir))
+    return slide_dirs
+
+
+def test_parse_streaming_formats():
+    assert parse_streaming_formats(None) == []
+    assert parse_streaming_formats("hls, DASH") == ["hls", "dash"]
+    with pytest.raises(ValueError):
+        parse_streaming_formats("rtmp")
+
+
+def test_hls_playlist_has_a_discontinuity_per_slide(tmp_path, slide_dirs):
+    StreamPublisher(str(tmp_path)).write_hls_playlist(
+        slide_dirs, str(tmp_path / "output.m3u8")
+    )
+    lines = (tmp_path / "output.m3u8").read_text().splitlines()
+    assert "#EXT-X-TARGETDURATION:5" in lines
+    assert lines.count("#EXT-X-DISCONTINUITY") == 1
+    assert '#EXT-X-MAP:URI="stream/slide_2_0/init.mp4"' in lines
+    assert "stream/slide_2_0/segment_00000.m4s" in lines
+    assert lines[-1] == "#EXT-X-ENDLIST"
+
+
+def test_dash_manifest_has_a_period_per_slide(tmp_path, slide_dirs):
+    StreamPublisher(str(tmp_path)).write_dash_manifest(
+        slide_dirs, str(tmp_path / "output.mpd")
+    )
+    mpd = ET.parse(tmp_path / "output.mpd").getroot()
+    periods = mpd.findall(f"{{{DASH_NAMESPACE}}}Period")
+    assert [p.get("start") for p in periods] == ["PT0.000S", "PT2.020S"]
+    assert periods[1].find(f"{{{DASH_NAMESPACE}}}BaseURL").text == "stream/slide_2_0/"
+    assert mpd.get("mediaPresentationDuration") == "PT6.080S"
+
+
+def test_dash_manifest_without_segment_duration_is_rejected(tmp_path, slide_dirs):
+    manifest = tmp_path / "stream" / "slide_2_0" / "manifest.mpd"
+    manifest.write_text(manifest.read_text().replace(' d="4060"', ""))
+    with pytest.raises(ValueError):
+        StreamPublisher(str(tmp_path)).write_dash_manifest(
+            slide_dirs, str(tmp_path / "output.mpd")
+        )
@@ -0,0 +1,45 @@
+import threading
+import time
+from slide_to_video.tts_engine import TTSEngine
+
+
+class RecordingEngine(TTSEngine):
+    name = "recording"
+
+    def __init__(self, parallizable):
+        super().__init__()
+        self.is_parallizable = parallizable
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def synthesize(self, text, output_path, format="wav"):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with open(output_path, "w") as f:
+            f.write(text)
+        with self.lock:
+            self.running -= 1
+
+    def parallizable(self):
+        return self.is_parallizable
+
+    def voice_fingerprint(self):
+        return "recording"
+
+
+def test_synthesize_batch_bounds_concurrency(tmp_path):
+    engine = RecordingEngine(parallizable=True)
+    paths = [str(tmp_path / f"{i}.txt") for i in range(12)]
+    engine.synthesize_batch([f"text {i}" for i in range(12)], paths, max_workers=3)
+    assert engine.max_running == 3
+    assert [open(path).read() for path in paths] == [f"text {i}" for i in range(12)]
+
+
+def test_synthesize_batch_is_sequential_if_not_parallizable(tmp_path):
+    engine = RecordingEngine(parallizable=False)
+    paths = [str(tmp_path / f"{i}.txt") for i in range(4)]
+    engine.synthesize_batch(["text"] * 4, paths, max_workers=4)
+    assert engine.max_running == 1
@@ -0,0 +1,157 @@
+import math
+import shutil
+import wave
+from fractions import Fraction
+import fitz
+import pytest
+from slide_to_video.video_engine import ENCODE_MODES, VideoEngine
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None, reason="ffmpeg is not installed"
+)
+
+RED = "R"
+BLUE = "B"
+
+
+def write_wav(path, seconds):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(24000)
+        f.writeframes(b"\x00\x00" * int(24000 * seconds))
+
+
+def write_image(path, color, width=64, height=36):
+    rgb = (1, 0, 0) if color == RED else (0, 0, 1)
+    pdf_document = fitz.open()
+    page = pdf_document.new_page(width=width, height=height)
+    page.draw_rect(page.rect, color=rgb, fill=rgb)
+    page.get_pixmap().save(str(path))
+    pdf_document.close()
+
+
+def stream_end(path, stream):
+    """
+    The end time of the last packet of the video ("v") or audio ("a") stream.
+    """
+    import ffmpeg
+
+    output = ffmpeg.input(str(path)).output(
+        "pipe:", map=f"0:{stream}", c="copy", format="framecrc"
+    )
+    lines, _ = ffmpeg.run(output, capture_stdout=True, quiet=True)
+    timebase = Fraction(1)
+    end = 0
+    for line in lines.decode().splitlines():
+        if line.startswith("#tb"):
+            timebase = Fraction(line.split(":")[1].strip())
+        elif not line.startswith("#"):
+            _, _, pts, duration = [int(value) for value in line.split(",")[:4]]
+            end = max(end, pts + duration)
+    return float(end * timebase)
+
+
+def colors(path):
+    """
+    The dominant color of the center of the video every tenth of a second, "R" or
+    "B". The last frame is shown for another second.
+    """
+    import ffmpeg
+
+    stream = (
+        ffmpeg.input(str(path))
+        .filter("tpad", stop_mode="clone", stop_duration=1)
+        .filter("fps", 10)
+        .filter("scale", 16, 16)
+        .output("pipe:", format="rawvideo", pix_fmt="rgb24")
+    )
+    frames, _ = ffmpeg.run(stream, capture_stdout=True, quiet=True)
+    center = 3 * (8 * 16 + 8)
+    return "".join(
+        "B" if frames[i + center + 2] > frames[i + center] else "R"
+        for i in range(0, len(frames), 16 * 16 * 3)
+    )
+
+
+def assert_shows(path, slides):
+    """
+    Check that the video shows each (color, seconds) of `slides` in turn, away from
+    the frames around the start of each slide.
+    """
+    shown = colors(path)
+    start = 0.0
+    for color, seconds in slides:
+        for i in range(math.ceil((start + 0.05) * 10), int((start + seconds) * 10)):
+            assert shown[i] == color, f"{shown} at {i / 10}s"
+        start += seconds
+
+
+@pytest.mark.parametrize("encode_mode", ENCODE_MODES)
+def test_render_segment_lasts_lead_audio_and_tail(tmp_path, encode_mode):
+    write_image(tmp_path / "slide.png", RED)
+    write_wav(tmp_path / "audio.wav", 1.3)
+    VideoEngine(encode_mode=encode_mode).render_segment(
+        str(tmp_path / "slide.png"),
+        str(tmp_path / "audio.wav"),
+        str(tmp_path / "slide.mp4"),
+        lead=0.5,
+        tail=0.7,
+    )
+    for stream in ["v", "a"]:
+        assert stream_end(tmp_path / "slide.mp4", stream) == pytest.approx(
+            2.5, abs=0.05
+        )
+
+
+@pytest.mark.parametrize("encode_mode", ENCODE_MODES)
+def test_render_segment_without_audio(tmp_path, encode_mode):
+    write_image(tmp_path / "slide.png", RED)
+    write_wav(tmp_path / "audio.wav", 0)
+    VideoEngine(encode_mode=encode_mode).render_segment(
+        str(tmp_path / "slide.png"),
+        str(tmp_path / "audio.wav"),
+        str(tmp_path / "slide.mp4"),
+    )
+    assert colors(tmp_path / "slide.mp4")[0] == RED
+
+
+@pytest.mark.parametrize("encode_mode", ENCODE_MODES)
+def test_concatenated_segments_stay_in_sync(tmp_path, encode_mode):
+    video_engine = VideoEngine(encode_mode=encode_mode)
+    video_paths = []
+    for i, (color, seconds) in enumerate([(RED, 1.3), (BLUE, 1.1), (RED, 1.2)]):
+        write_image(tmp_path / f"{i}.png", color)
+        write_wav(tmp_path / f"{i}.wav", seconds)
+        video_paths.append(str(tmp_path / f"{i}.mp4"))
+        video_engine.render_segment(
+            str(tmp_path / f"{i}.png"),
+            str(tmp_path / f"{i}.wav"),
+            video_paths[-1],
+            lead=0.2,
+            tail=0.2,
+        )
+
+    output_path = tmp_path / "output.mp4"
+    video_engine.concatenate_videos(video_paths, str(output_path))
+    for stream in ["v", "a"]:
+        assert stream_end(output_path, stream) == pytest.approx(4.8, abs=0.1)
+    assert_shows(output_path, [(RED, 1.7), (BLUE, 1.5), (RED, 1.6)])
+
+
+@pytest.mark.parametrize("encode_mode", ENCODE_MODES)
+def test_render_deck_with_mixed_page_sizes(tmp_path, encode_mode):
+    write_image(tmp_path / "0.png", RED)
+    write_image(tmp_path / "1.png", BLUE, width=36, height=64)
+    write_image(tmp_path / "2.png", RED, width=128, height=72)
+    write_wav(tmp_path / "audio.wav", 3.6)
+
+    output_path = tmp_path / "output.mp4"
+    VideoEngine(encode_mode=encode_mode).render_deck(
+        [str(tmp_path / f"{i}.png") for i in range(3)],
+        [1.7, 1.5, 0.4],
+        str(tmp_path / "audio.wav"),
+        str(output_path),
+    )
+    assert stream_end(output_path, "a") == pytest.approx(3.6, abs=0.1)
+    assert_shows(output_path, [(RED, 1.7), (BLUE, 1.5), (RED, 0.4)])
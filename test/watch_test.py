@@ -0,0 +1,27 @@
+import threading
+import time
+from slide_to_video.watch import FileWatcher
+
+
+def test_wait_reports_changes_after_debounce(tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text("One.")
+    slide = tmp_path / "slide.pdf"
+    watcher = FileWatcher([str(script), str(slide)], interval=0.01, debounce=0.2)
+
+    def edit():
+        time.sleep(0.05)
+        script.write_text("One. Two.")
+        time.sleep(0.05)
+        script.write_text("One. Two. Three.")
+        slide.write_bytes(b"%PDF")
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    start = time.monotonic()
+    changed = watcher.wait()
+    thread.join()
+    assert changed == [str(script), str(slide)]
+    assert time.monotonic() - start >= 0.3
+    # The edits were reported at once.
+    assert watcher.snapshot() == watcher.stats